@@ -7,7 +7,9 @@ from config_models.admin import ConfigurationModelAdmin
 
 from VEDA_OS01.models import (
     Course, Video, Encode, URL, Destination, Institution, VedaUpload,
-    TranscriptCredentials, TranscriptProcessMetadata, EncodeVideosForHlsConfiguration
+    TranscriptCredentials, TranscriptProcessMetadata, EncodeVideosForHlsConfiguration,
+    InFlightEncode, HlsBackfillCheckpoint, SkippedEncode, ScheduledJob, HealWorkItem,
+    VideoStatusTransition, VideoStatusSummary
 )
 
 
@@ -47,6 +49,7 @@ class VideoAdmin(admin.ModelAdmin):
         'studio_id',
         'video_trans_start',
         'video_trans_status',
+        'video_status_changed',
         'transcript_status',
         'video_active',
         'process_transcription',
@@ -170,6 +173,73 @@ class TranscriptProcessMetadataAdmin(admin.ModelAdmin):
     model = TranscriptProcessMetadata
 
 
+class InFlightEncodeAdmin(admin.ModelAdmin):
+    """
+    Admin for InFlightEncode model.
+    """
+    model = InFlightEncode
+    list_display = ('veda_id', 'encode_profile', 'job_id', 'modified')
+    search_fields = ['veda_id', 'job_id']
+
+
+
+class SkippedEncodeAdmin(admin.ModelAdmin):
+    """
+    Admin for SkippedEncode model, deleting a skipped encode lets heal enqueue it.
+    """
+    model = SkippedEncode
+    list_display = ('video', 'encode_profile', 'reason', 'created')
+    search_fields = ['video__edx_id', 'encode_profile']
+
+
+class HealWorkItemAdmin(admin.ModelAdmin):
+    """
+    Admin for HealWorkItem model, setting `next_check` makes heal check an encode it gave up on.
+    """
+    model = HealWorkItem
+    list_display = ('video', 'encode_profile', 'attempts', 'next_check', 'modified')
+    search_fields = ['video__edx_id', 'encode_profile']
+
+
+class VideoStatusTransitionAdmin(admin.ModelAdmin):
+    """
+    Admin for VideoStatusTransition model.
+    """
+    model = VideoStatusTransition
+    list_display = ('video', 'from_status', 'to_status', 'source', 'seconds_in_status', 'created')
+    search_fields = ['video__edx_id']
+    raw_id_fields = ['video']
+
+
+class VideoStatusSummaryAdmin(admin.ModelAdmin):
+    """
+    Admin for VideoStatusSummary model.
+    """
+    model = VideoStatusSummary
+    list_display = (
+        'status', 'videos', 'stuck_videos', 'oldest_change', 'transitions_in',
+        'p50_seconds', 'p90_seconds', 'p99_seconds', 'modified'
+    )
+
+
+class HlsBackfillCheckpointAdmin(admin.ModelAdmin):
+    """
+    Admin for HlsBackfillCheckpoint model.
+    """
+    model = HlsBackfillCheckpoint
+    list_display = ('start_offset', 'position', 'total', 'processed', 'enqueued', 'val_updated', 'modified')
+
+
+class ScheduledJobAdmin(admin.ModelAdmin):
+    """
+    Admin for ScheduledJob model, clearing `running_since` releases a job left running by a dead scheduler.
+    """
+    model = ScheduledJob
+    list_display = (
+        'name', 'running_since', 'last_started', 'last_duration', 'total_duration', 'runs', 'failures'
+    )
+
+
 admin.site.register(Course, CourseAdmin)
 admin.site.register(Video, VideoAdmin)
 admin.site.register(Encode, EncodeAdmin)
@@ -179,4 +249,11 @@ admin.site.register(Institution, InstitutionAdmin)
 admin.site.register(VedaUpload, VideoUploadAdmin)
 admin.site.register(TranscriptCredentials, TranscriptCredentialsAdmin)
 admin.site.register(TranscriptProcessMetadata, TranscriptProcessMetadataAdmin)
+admin.site.register(InFlightEncode, InFlightEncodeAdmin)
 admin.site.register(EncodeVideosForHlsConfiguration, ConfigurationModelAdmin)
+admin.site.register(HlsBackfillCheckpoint, HlsBackfillCheckpointAdmin)
+admin.site.register(SkippedEncode, SkippedEncodeAdmin)
+admin.site.register(ScheduledJob, ScheduledJobAdmin)
+admin.site.register(HealWorkItem, HealWorkItemAdmin)
+admin.site.register(VideoStatusTransition, VideoStatusTransitionAdmin)
+admin.site.register(VideoStatusSummary, VideoStatusSummaryAdmin)
@@ -0,0 +1,53 @@
+"""
+Management command used to ingest studio uploads announced on an SQS queue.
+
+This is an alternative to the SNS HTTP endpoint (`api/ingest_from_s3`), see `control.veda_sqs_ingest`.
+"""
+
+import logging
+
+import boto.sqs
+from django.core.management.base import BaseCommand, CommandError
+
+from VEDA.utils import get_config
+from control.veda_sqs_ingest import DEFAULT_VISIBILITY_TIMEOUT, DEFAULT_WORKERS, SqsIngestConsumer
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Consume SQS ingest queue command class
+    """
+    help = 'Long-poll the SQS ingest queue and ingest the uploaded videos'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help="Number of videos ingested concurrently"
+        )
+
+    def handle(self, *args, **options):
+        """
+        handle method for command class.
+        """
+        settings = get_config()
+        queue_name = settings.get('ingest_sqs_queue')
+        if not queue_name:
+            raise CommandError('ingest_sqs_queue is not configured.')
+
+        connection = boto.sqs.connect_to_region(settings.get('ingest_sqs_region') or 'us-east-1')
+        queue = connection.get_queue(queue_name)
+        if queue is None:
+            raise CommandError('SQS queue "{}" does not exist.'.format(queue_name))
+
+        LOGGER.info('[SQS INGEST] Consuming %s', queue_name)
+        SqsIngestConsumer(
+            queue,
+            settings['edx_s3_ingest_bucket'],
+            max_workers=options.get('workers') or settings.get('ingest_sqs_workers') or DEFAULT_WORKERS,
+            visibility_timeout=settings.get('ingest_sqs_visibility_timeout') or DEFAULT_VISIBILITY_TIMEOUT,
+        ).run()
@@ -0,0 +1,44 @@
+"""
+Management command used to dispatch the encodes held for fair share scheduling.
+
+Enqueues dispatch held encodes as they come in, this command keeps the worker queues
+topped up as the encode workers drain them.
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from control.encode_worker_tasks import dispatch_encodes
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Dispatch held encodes command class
+    """
+    help = 'Dispatch the encodes held for fair share scheduling to the worker queues'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep dispatching every this many seconds, dispatches once if not given.'
+        )
+
+    def handle(self, *args, **options):
+        """
+        handle method for command class.
+        """
+        interval = options.get('interval')
+        while True:
+            dispatched = dispatch_encodes()
+            LOGGER.info('[ENQUEUE] Dispatched %s held encodes', dispatched)
+            if not interval:
+                return
+            time.sleep(interval)
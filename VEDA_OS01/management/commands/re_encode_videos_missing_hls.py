@@ -8,12 +8,17 @@ Management command used to re-encode video for HLS profiles.
    kick off encoding task (a.k.a worker_tasks_fire) with veda_id and encode_profile=HLS.
  - Encode worker generates the HLS encode, push it S3 and initiate a delivery task
  - Deliver worker process the delivery task and delivers the successful HLS encode profile to edxval
+ - With `all_videos`, batches are streamed from edxval until none are left. Progress is checkpointed after
+   every video in `HlsBackfillCheckpoint`, so a new run resumes where the previous one stopped.
 
 """
 
 import ast
 import logging
-import uuid
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
 import boto
 
@@ -24,12 +29,14 @@ from opaque_keys.edx.keys import CourseKey
 from requests import post, put
 from six import text_type
 
-from VEDA_OS01.models import Video, EncodeVideosForHlsConfiguration, URL, Encode
+from VEDA_OS01.models import Video, EncodeVideosForHlsConfiguration, HlsBackfillCheckpoint, URL, Encode
 from VEDA.utils import get_config
-from control.encode_worker_tasks import enqueue_encode
+from control.encode_worker_tasks import EncodeJob, EncodePriority, get_encode_queue, get_queue_depth
 
 LOGGER = logging.getLogger(__name__)
 BUCKET_NAME = 'veda-hotstore'
+# Seconds to wait before measuring the backfill queue depth again.
+QUEUE_POLL_INTERVAL = 30
 
 
 def get_auth_token(settings):
@@ -71,6 +78,24 @@ def get_api_url_and_auth_headers():
     return settings['val_api_url'], headers
 
 
+def fetch_videos_wo_hls(api_url, headers, params):
+    """
+    Request edxval for videos which are missing HLS profiles.
+
+    Returns the decoded response or None on failure.
+    """
+    val_videos_url = '/'.join([api_url, 'missing-hls/'])
+    response = post(val_videos_url, json=params, headers=headers)
+    if response.status_code != 200:
+        LOGGER.error(
+            u"Error while getting Videos for re-encode: %s",
+            response.text,
+        )
+        return None
+
+    return response.json()
+
+
 def get_videos_wo_hls(courses=None, batch_size=None, offset=None):
     """
     Get videos from edxval which are missing HLS profiles.
@@ -95,12 +120,10 @@ def get_videos_wo_hls(courses=None, batch_size=None, offset=None):
         }
 
     # Make request to edxval for videos
-    val_videos_url = '/'.join([api_url, 'missing-hls/'])
-    response = post(val_videos_url, json=params, headers=headers)
+    response = fetch_videos_wo_hls(api_url, headers, params)
 
     videos = None
-    if response.status_code == 200:
-        response = response.json()
+    if response is not None:
         videos = response['videos']
         if courses:
             videos_done = 0
@@ -116,11 +139,6 @@ def get_videos_wo_hls(courses=None, batch_size=None, offset=None):
             videos_done,
             videos_total,
         )
-    else:
-        LOGGER.error(
-            u"Error while getting Videos for re-encode: %s",
-            response.text,
-        )
 
     return videos
 
@@ -139,12 +157,232 @@ def update_hls_profile_in_val(api_url, headers, edx_video_id, profile, encode_da
     return response
 
 
-def enqueue_video_for_hls_encode(veda_id, encode_queue):
+def enqueue_video_for_hls_encode(veda_id):
+    """
+    Enqueue HLS encoding task on the rate limited backfill lane.
+    """
+    return EncodeJob(veda_id, 'hls', priority=EncodePriority.BACKFILL, update_val_status=False).enqueue()
+
+
+def is_valid_video_encode(video_encode):
     """
-    Enqueue HLS encoding task.
+    Validate video encode object for
+    number of attributes.
     """
-    task_id = uuid.uuid1().hex[0:10]
-    enqueue_encode(veda_id, 'hls', task_id, encode_queue, update_val_status=False)
+    is_valid = True
+    required_attrs = ('encode_size', 'encode_bitdepth', 'encode_url')
+    for attr in required_attrs:
+        if getattr(video_encode, attr) is None:
+            is_valid = False
+            LOGGER.info('Validation Error: video=%s - missing=%s', video_encode.videoID.edx_id, attr)
+            break
+
+    return is_valid
+
+
+class HlsBackfill(object):
+    """
+    Backfills HLS encodes for the videos edxval reports as missing them.
+
+     - Batches are streamed from edxval, the next batch is fetched while the current one is processed.
+     - VEDA videos and their HLS encodes are resolved with one query each per batch.
+     - Enqueues are held back while the backfill worker queue is deeper than `max_queue_depth`.
+     - The checkpoint is advanced after every video, so an interrupted run resumes where it stopped.
+    """
+    def __init__(self, api_url, headers, hls_profile, run, batch_size=None, courses=None, checkpoint=None,
+                 max_queue_depth=None, clock=time.time, sleep=time.sleep):
+        self.api_url = api_url
+        self.headers = headers
+        self.hls_profile = hls_profile
+        self.run = run
+        self.batch_size = batch_size
+        self.courses = courses
+        self.checkpoint = checkpoint
+        self.max_queue_depth = max_queue_depth
+        self.clock = clock
+        self.sleep = sleep
+        self.queue = get_encode_queue(EncodePriority.BACKFILL)
+        self.started = None
+        self.processed = 0
+
+    def fetch_batch(self, offset):
+        """
+        Fetch a batch of videos starting at `offset`.
+        """
+        if self.courses:
+            params = {'courses': self.courses}
+        else:
+            params = {'batch_size': self.batch_size, 'offset': offset}
+        return fetch_videos_wo_hls(self.api_url, self.headers, params)
+
+    def iter_batches(self, offset):
+        """
+        Yield (offset, edx_video_ids, total) for every batch, prefetching the next batch.
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self.fetch_batch, offset)
+            while future is not None:
+                response = future.result()
+                if not response or not response['videos']:
+                    return
+
+                videos = response['videos']
+                total = response.get('total', len(videos))
+                next_offset = offset + len(videos)
+                future = None
+                if not self.courses and next_offset < total:
+                    future = executor.submit(self.fetch_batch, next_offset)
+
+                yield offset, videos, total
+                offset = next_offset
+
+    def resolve_batch(self, edx_video_ids):
+        """
+        Resolve the VEDA videos and their latest HLS encodes for a batch.
+
+        Returns:
+            OrderedDict mapping every edxval id to its VEDA videos (latest per VEDA id)
+            and a dict mapping VEDA video pks to their latest HLS `URL`.
+        """
+        videos_by_val_id = OrderedDict((edx_video_id, OrderedDict()) for edx_video_id in edx_video_ids)
+        veda_videos = (Video.objects
+                       .filter(Q(studio_id__in=edx_video_ids) | Q(edx_id__in=edx_video_ids))
+                       .order_by('video_trans_start'))
+        for video in veda_videos:
+            for val_id in (video.studio_id, video.edx_id):
+                if val_id in videos_by_val_id:
+                    # Later videos override earlier ones, leaving the latest per VEDA id.
+                    videos_by_val_id[val_id][video.edx_id] = video
+
+        hls_urls = {}
+        video_pks = [video.pk for videos in videos_by_val_id.values() for video in videos.values()]
+        for url in URL.objects.filter(encode_profile=self.hls_profile, videoID__in=video_pks).order_by('url_date'):
+            hls_urls[url.videoID_id] = url
+
+        return videos_by_val_id, hls_urls
+
+    def wait_for_queue(self):
+        """
+        Hold back enqueues while the backfill worker queue is too deep.
+        """
+        if not self.max_queue_depth:
+            return
+
+        depth = get_queue_depth(self.queue)
+        while depth is not None and depth >= self.max_queue_depth:
+            LOGGER.info(
+                '[run=%s] queue=%s depth=%s - waiting %ss before enqueueing more videos.',
+                self.run, self.queue, depth, QUEUE_POLL_INTERVAL
+            )
+            self.sleep(QUEUE_POLL_INTERVAL)
+            depth = get_queue_depth(self.queue)
+
+    def process_video(self, video, hls_url):
+        """
+        Update edxval with an existing HLS encode or enqueue the video for an HLS encode.
+
+        Returns:
+            'val_updated', 'enqueued' or None.
+        """
+        veda_id = video.edx_id
+        LOGGER.info('Processing veda_id %s', veda_id)
+        if hls_url is not None:
+            if is_valid_video_encode(hls_url):
+                # Update the URL's value in edxval directly
+                LOGGER.warning('[run=%s] HLS encode is present for video=%s in VEDA.', self.run, veda_id)
+                edx_video_id = video.studio_id or video.edx_id
+                response = update_hls_profile_in_val(self.api_url, self.headers, edx_video_id, 'hls', encode_data={
+                    'file_size': hls_url.encode_size,
+                    'bitrate': int(hls_url.encode_bitdepth.split(' ')[0]),
+                    'url': hls_url.encode_url
+                })
+                if response.status_code == 200:
+                    LOGGER.info("[run=%s] Success for video=%s.", self.run, veda_id)
+                    return 'val_updated'
+
+                LOGGER.warning(
+                    "[run=%s] Failure on VAL update - status_code=%s, video=%s, traceback=%s.",
+                    self.run,
+                    response.status_code,
+                    veda_id,
+                    response.text
+                )
+                return None
+
+            # After this clause, veda_id will be re-enqueued for HLS encoding since the
+            # encode data is corrupt.
+            LOGGER.warning(
+                '[run=%s] HLS encode data was corrupt for video=%s in VEDA - Re-enqueueing..',
+                self.run,
+                veda_id
+            )
+
+        # Disable transcription
+        if video.process_transcription:
+            Video.objects.filter(pk=video.pk).update(process_transcription=False)
+
+        # Enqueue video for HLS re-encode.
+        self.wait_for_queue()
+        LOGGER.info('Enqueueing id %s for hls encode', veda_id)
+        return 'enqueued' if enqueue_video_for_hls_encode(veda_id=veda_id) else None
+
+    def report_progress(self, position, total):
+        """
+        Log the progress of the backfill along with its rate and ETA.
+        """
+        elapsed = self.clock() - self.started
+        rate = self.processed / elapsed if elapsed > 0 else 0
+        remaining = max(total - position, 0)
+        eta = timedelta(seconds=int(remaining / rate)) if rate else 'unknown'
+        LOGGER.info(
+            '[run=%s] progress=%s/%s - rate=%.2f videos/s - eta=%s',
+            self.run, position, total, rate, eta
+        )
+
+    def checkpoint_video(self, position, total, result):
+        """
+        Record that the video at VAL offset `position` - 1 is done.
+        """
+        if self.checkpoint is None:
+            return
+
+        self.checkpoint.position = position
+        self.checkpoint.total = total
+        self.checkpoint.processed += 1
+        if result == 'enqueued':
+            self.checkpoint.enqueued += 1
+        elif result == 'val_updated':
+            self.checkpoint.val_updated += 1
+        self.checkpoint.save()
+
+    def run_backfill(self):
+        """
+        Backfill every batch, resuming from the checkpoint.
+
+        Returns:
+            number of processed edxval videos.
+        """
+        self.started = self.clock()
+        offset = self.checkpoint.position if self.checkpoint else 0
+        for batch_offset, edx_video_ids, total in self.iter_batches(offset):
+            videos_by_val_id, hls_urls = self.resolve_batch(edx_video_ids)
+            LOGGER.info(
+                '[run=%s] offset=%s - videos(in batch)=%s - videos(not found in veda)=%s - videos(hls present)=%s.',
+                self.run,
+                batch_offset,
+                len(edx_video_ids),
+                sum(1 for videos in videos_by_val_id.values() if not videos),
+                len(hls_urls),
+            )
+            for index, videos in enumerate(videos_by_val_id.values()):
+                results = [self.process_video(video, hls_urls.get(video.pk)) for video in videos.values()]
+                result = 'enqueued' if 'enqueued' in results else (results[0] if results else None)
+                self.processed += 1
+                self.checkpoint_video(batch_offset + index + 1, total, result)
+
+            self.report_progress(batch_offset + len(edx_video_ids), total)
+
+        return self.processed
 
 
 class Command(BaseCommand):
@@ -174,26 +412,10 @@ class Command(BaseCommand):
         except InvalidKeyError as error:
             raise CommandError('Invalid key specified: {}'.format(text_type(error)))
 
-    def _validate_video_encode(self, video_encode):
-        """
-        Validate video encode object for
-        number of attributes.
-        """
-        is_valid = True
-        required_attrs = ('encode_size', 'encode_bitdepth', 'encode_url')
-        for attr in required_attrs:
-            if getattr(video_encode, attr) is None:
-                is_valid = False
-                LOGGER.info('Validation Error: video=%s - missing=%s', video_encode.videoID.edx_id, attr)
-                break
-
-        return is_valid
-
     def handle(self, *args, **options):
         """
         handle method for command class.
         """
-        settings = get_config()
         hls_profile = Encode.objects.get(product_spec='hls')
 
         LOGGER.info('[Re-encode for HLS] Process started.')
@@ -202,10 +424,7 @@ class Command(BaseCommand):
         if veda_id:
             try:
                 video = Video.objects.filter(edx_id=veda_id).latest()
-                enqueue_video_for_hls_encode(
-                    veda_id=video.edx_id,
-                    encode_queue=settings['celery_worker_low_queue']
-                )
+                enqueue_video_for_hls_encode(veda_id=video.edx_id)
             except Video.DoesNotExist:
                 LOGGER.warning('Video "%s" not found.', veda_id)
         else:
@@ -213,130 +432,96 @@ class Command(BaseCommand):
             all_videos = config.all_videos
             courses = self._validate_course_ids(course_ids=config.course_ids.split())
             commit = config.commit
-
             if all_videos:
-                edx_video_ids = get_videos_wo_hls(batch_size=config.batch_size, offset=config.offset)
-            elif courses:
-                edx_video_ids = get_videos_wo_hls(courses=courses)
-            else:
+                courses = None
+
+            if not all_videos and not courses:
                 LOGGER.info('Missing job configuration.')
                 return
 
-            # Result will be None if we are Unable
-            # to retrieve edxval Token.
-            if edx_video_ids is None:
-                LOGGER.error('Unable to get edxval Token.')
-                return
+            if commit:
+                self._backfill(config, hls_profile, courses)
+            else:
+                self._dry_run(config, hls_profile, courses)
 
-            veda_videos = Video.objects.filter(Q(studio_id__in=edx_video_ids) | Q(edx_id__in=edx_video_ids))
-            veda_video_ids = veda_videos.values_list('edx_id', flat=True)
-            videos_with_hls_encodes = (URL.objects
-                                       .filter(encode_profile=hls_profile, videoID__edx_id__in=veda_video_ids)
-                                       .values_list('videoID__edx_id', flat=True)
-                                       .distinct())
-
-            # Log stats about VEDA vs VAL videos.
-            num_videos_found_in_veda = veda_videos.count()
-            num_videos_not_found_in_veda = len(edx_video_ids) - veda_videos.count()
-            num_videos_hls_profile_found_in_veda = videos_with_hls_encodes.count()
-            num_videos_actually_needing_hls_encode = veda_videos.count() - num_videos_hls_profile_found_in_veda
-            LOGGER.info(
-                (u"[run=%s] videos(found in VEDA)=%s - "
-                 u"videos(not found in veda)=%s - "
-                 u"videos(hls profile present)=%s - "
-                 u"videos(hls profile not present)=%s."),
-                config.command_run,
-                num_videos_found_in_veda,
-                num_videos_not_found_in_veda,
-                num_videos_hls_profile_found_in_veda,
-                num_videos_actually_needing_hls_encode,
+    def _backfill(self, config, hls_profile, courses):
+        """
+        Run the HLS backfill, resuming from the checkpoint of the configured offset.
+        """
+        api_url, headers = get_api_url_and_auth_headers()
+        if not headers:
+            LOGGER.error('No headers. Unable to get VAL token.')
+            return
+
+        checkpoint = None
+        if not courses:
+            checkpoint, created = HlsBackfillCheckpoint.objects.get_or_create(
+                start_offset=config.offset,
+                defaults={'position': config.offset}
             )
+            if not created:
+                LOGGER.info('[run=%s] Resuming backfill at offset=%s.', config.command_run, checkpoint.position)
+
+        backfill = HlsBackfill(
+            api_url,
+            headers,
+            hls_profile,
+            config.command_run,
+            batch_size=config.batch_size,
+            courses=courses,
+            checkpoint=checkpoint,
+            max_queue_depth=get_config().get('hls_backfill_max_queue_depth'),
+        )
+        processed = backfill.run_backfill()
+        LOGGER.info('[run=%s] Backfill is complete, processed %s videos.', config.command_run, processed)
+        config.increment_run()
 
-            # Check if this job is configured for dry run.
-            if commit:
-                api_url, headers = get_api_url_and_auth_headers()
-                if not headers:
-                    LOGGER.error('No headers. Unable to get VAL token.')
-                    return
+    def _dry_run(self, config, hls_profile, courses):
+        """
+        Log stats about VEDA vs VAL videos for a single batch without changing anything.
+        """
+        if courses:
+            edx_video_ids = get_videos_wo_hls(courses=courses)
+        else:
+            edx_video_ids = get_videos_wo_hls(batch_size=config.batch_size, offset=config.offset)
+
+        # Result will be None if we are Unable
+        # to retrieve edxval Token.
+        if edx_video_ids is None:
+            LOGGER.error('Unable to get edxval Token.')
+            return
+
+        veda_videos = Video.objects.filter(Q(studio_id__in=edx_video_ids) | Q(edx_id__in=edx_video_ids))
+        veda_video_ids = veda_videos.values_list('edx_id', flat=True)
+        videos_with_hls_encodes = (URL.objects
+                                   .filter(encode_profile=hls_profile, videoID__edx_id__in=veda_video_ids)
+                                   .values_list('videoID__edx_id', flat=True)
+                                   .distinct())
+
+        # Log stats about VEDA vs VAL videos.
+        num_videos_found_in_veda = veda_videos.count()
+        num_videos_not_found_in_veda = len(edx_video_ids) - num_videos_found_in_veda
+        num_videos_hls_profile_found_in_veda = videos_with_hls_encodes.count()
+        num_videos_actually_needing_hls_encode = num_videos_found_in_veda - num_videos_hls_profile_found_in_veda
+        LOGGER.info(
+            (u"[run=%s] videos(found in VEDA)=%s - "
+             u"videos(not found in veda)=%s - "
+             u"videos(hls profile present)=%s - "
+             u"videos(hls profile not present)=%s."),
+            config.command_run,
+            num_videos_found_in_veda,
+            num_videos_not_found_in_veda,
+            num_videos_hls_profile_found_in_veda,
+            num_videos_actually_needing_hls_encode,
+        )
 
-                for veda_id in veda_video_ids:
-                    LOGGER.info('Processing veda_id %s', veda_id)
-                    video = veda_videos.filter(edx_id=veda_id).latest()
-                    if veda_id in videos_with_hls_encodes:
-                        # Update the URL's value in edxval directly
-                        LOGGER.warning(
-                            '[run=%s] HLS encode is present for video=%s in VEDA.',
-                            config.command_run,
-                            veda_id
-                        )
-                        try:
-                            video_encode = URL.objects.filter(
-                                videoID=video,
-                                encode_profile=hls_profile
-                            ).latest()
-                        except URL.DoesNotExist:
-                            LOGGER.warning(
-                                '[run=%s] HLS encode not found for video=%s in VEDA.',
-                                config.command_run,
-                                veda_id
-                            )
-                            continue
-
-                        if self._validate_video_encode(video_encode):
-                            edx_video_id = video.studio_id or video.edx_id
-                            response = update_hls_profile_in_val(api_url, headers, edx_video_id, 'hls', encode_data={
-                                'file_size': video_encode.encode_size,
-                                'bitrate': int(video_encode.encode_bitdepth.split(' ')[0]),
-                                'url': video_encode.encode_url
-                            })
-
-                            # Response will be None if we are Unable to get edxval Token.
-                            if response is None:
-                                LOGGER.info('Unable to get edxval Token.')
-                                continue
-
-                            if response.status_code == 200:
-                                LOGGER.info("[run=%s] Success for video=%s.", config.command_run, veda_id)
-                            else:
-                                LOGGER.warning(
-                                    "[run=%s] Failure on VAL update - status_code=%s, video=%s, traceback=%s.",
-                                    config.command_run,
-                                    response.status_code,
-                                    veda_id,
-                                    response.text
-                                )
-                            continue
-                        else:
-                            # After this clause, veda_id will be re-enqueued for HLS encoding since the
-                            # encode data is corrupt.
-                            LOGGER.warning(
-                                '[run=%s] HLS encode data was corrupt for video=%s in VEDA - Re-enqueueing..',
-                                config.command_run,
-                                veda_id
-                            )
-
-                    # Disable transcription
-
-                    video.process_transcription = False
-                    video.save()
-
-                    # Enqueue video for HLS re-encode.
-                    LOGGER.info('Enqueueing id %s for hls encode', veda_id)
-                    enqueue_video_for_hls_encode(
-                        veda_id=veda_id,
-                        encode_queue=settings['celery_worker_low_queue']
-                    )
-
-                config.increment_run()
-                config.update_offset()
-            else:
-                videos_not_in_hotstore = 0
-                for veda_id in veda_video_ids:
-                    if source_video_not_in_hotstore(veda_id):
-                        videos_not_in_hotstore += 1
-                        LOGGER.info('VEDA ID %s not found in hotstore', veda_id)
-                LOGGER.info('Number of videos missing source: %d', videos_not_in_hotstore)
-                LOGGER.info('[run=%s] Dry run is complete.', config.command_run)
+        videos_not_in_hotstore = 0
+        for veda_id in veda_video_ids:
+            if source_video_not_in_hotstore(veda_id):
+                videos_not_in_hotstore += 1
+                LOGGER.info('VEDA ID %s not found in hotstore', veda_id)
+        LOGGER.info('Number of videos missing source: %d', videos_not_in_hotstore)
+        LOGGER.info('[run=%s] Dry run is complete.', config.command_run)
 
 
 def source_video_not_in_hotstore(video_id):
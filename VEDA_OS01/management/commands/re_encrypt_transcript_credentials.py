@@ -1,12 +1,25 @@
 """
 Management command used to re-encrypt transcript credentials data with new fernet key.
+
+Credentials are streamed in chunks of rows, the chunks are re-encrypted in a pool of
+processes and every chunk is written back in its own transaction, so a rotation can be
+interrupted and resumed with `--resume`, which skips the rows already encrypted with
+the new key. `--verify` only reports the rows that can't be decrypted or are still
+encrypted with an old key.
 """
 
 import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from operator import or_
 
-from cryptography.fernet import InvalidToken
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import models, transaction
+from django.db.models import Case, ExpressionWrapper, F, Q, Value, When
+from django.utils import timezone
 
 from VEDA_OS01.models import TranscriptCredentials
 from VEDA_OS01.utils import invalidate_fernet_cached_properties
@@ -14,6 +27,111 @@ from VEDA_OS01.utils import invalidate_fernet_cached_properties
 
 LOGGER = logging.getLogger(__name__)
 
+ENCRYPTED_FIELDS = ['api_key', 'api_secret']
+DEFAULT_CHUNK_SIZE = 100
+
+
+def is_primary_token(primary_fernet, token):
+    """
+    Returns True if a token is encrypted with the primary fernet key.
+    """
+    try:
+        primary_fernet.decrypt(token)
+    except InvalidToken:
+        return False
+    return True
+
+
+def rotate_tokens(fernet_keys, rows, skip_rotated=False):
+    """
+    Re-encrypts the tokens of a chunk of rows with the primary fernet key.
+
+    Arguments:
+        fernet_keys (list): fernet keys, the primary key first.
+        rows (list): (pk, modified, token, ...) tuples.
+        skip_rotated (bool): leave out the rows whose tokens are all encrypted with the primary key.
+
+    Returns:
+        (pk, modified, token, ...) tuples of the re-encrypted rows.
+
+    Raises:
+        InvalidToken: if a token can't be decrypted with any of the keys.
+    """
+    multi_fernet = MultiFernet([Fernet(key) for key in fernet_keys])
+    primary_fernet = Fernet(fernet_keys[0])
+    rotated_rows = []
+    for pk, modified, *tokens in rows:
+        if skip_rotated and all(is_primary_token(primary_fernet, token) for token in tokens):
+            continue
+        rotated_rows.append((pk, modified) + tuple(multi_fernet.rotate(token) for token in tokens))
+    return rotated_rows
+
+
+def verify_tokens(fernet_keys, rows):
+    """
+    Checks the tokens of a chunk of rows.
+
+    Returns:
+        A tuple of the pks of the rows that can't be decrypted and of those encrypted with an old key.
+    """
+    multi_fernet = MultiFernet([Fernet(key) for key in fernet_keys])
+    primary_fernet = Fernet(fernet_keys[0])
+    unreadable, stale = [], []
+    for pk, __, *tokens in rows:
+        try:
+            for token in tokens:
+                multi_fernet.decrypt(token)
+        except InvalidToken:
+            unreadable.append(pk)
+            continue
+        if not all(is_primary_token(primary_fernet, token) for token in tokens):
+            stale.append(pk)
+    return unreadable, stale
+
+
+def iter_chunks(chunk_size):
+    """
+    Yields the encrypted tokens of the transcript credentials in chunks of (pk, modified, token, ...) rows.
+    """
+    tokens = {
+        '{}_token'.format(field_name): ExpressionWrapper(F(field_name), output_field=models.BinaryField())
+        for field_name in ENCRYPTED_FIELDS
+    }
+    queryset = TranscriptCredentials.objects.annotate(**tokens).order_by('pk')
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', 'modified', *tokens)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield [(pk, modified) + tuple(bytes(token) for token in row_tokens) for pk, modified, *row_tokens in rows]
+
+
+def write_chunk(rotated_rows):
+    """
+    Writes the re-encrypted tokens of a chunk back in a single statement.
+
+    `Model.bulk_update` would encrypt the tokens again, so the equivalent CASE expressions are
+    built with binary values. Rows modified since they were read already have been saved with
+    the new key and are left alone.
+
+    Returns:
+        The number of rows written.
+    """
+    if not rotated_rows:
+        return 0
+
+    updates = {
+        field_name: Case(
+            *[When(pk=row[0], then=Value(row[index], output_field=models.BinaryField())) for row in rotated_rows],
+            output_field=models.BinaryField()
+        )
+        for index, field_name in enumerate(ENCRYPTED_FIELDS, start=2)
+    }
+    unchanged = reduce(or_, [Q(pk=pk, modified=modified) for pk, modified, *__ in rotated_rows])
+    with transaction.atomic():
+        return TranscriptCredentials.objects.filter(unchanged).update(modified=timezone.now(), **updates)
+
 
 class Command(BaseCommand):
     """
@@ -21,6 +139,24 @@ class Command(BaseCommand):
     """
     help = 'Re-encrypts transcript credentials with new fernet key.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help='Number of credentials read, re-encrypted and written at a time.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of processes re-encrypting the credentials, defaults to the number of CPUs.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Skip the credentials that are already encrypted with the new key.'
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report the credentials that can\'t be decrypted or are encrypted with an old key.'
+        )
+
     def handle(self, *args, **options):
         """
         handle method for command class.
@@ -29,17 +165,56 @@ class Command(BaseCommand):
         LOGGER.info('[Transcript credentials re-encryption] Process started.')
 
         # Invalidate cached properties so that we get the latest keys
-        invalidate_fernet_cached_properties(TranscriptCredentials, ['api_key', 'api_secret'])
+        invalidate_fernet_cached_properties(TranscriptCredentials, ENCRYPTED_FIELDS)
+        fernet_keys = TranscriptCredentials._meta.get_field('api_key').fernet_keys
 
-        try:
-            with transaction.atomic():
-                # Call save on each credentials record so that re-encryption can be be performed on fernet fields.
-                for transcript_credential in TranscriptCredentials.objects.all():
-                    transcript_credential.save()
+        workers = options['workers'] or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            if options['verify']:
+                self.verify(executor, fernet_keys, options['chunk_size'])
+                return
 
-            LOGGER.info('[Transcript credentials re-encryption] Process completed.')
+            try:
+                self.re_encrypt(executor, workers, fernet_keys, options['chunk_size'], options['resume'])
+                LOGGER.info('[Transcript credentials re-encryption] Process completed.')
 
-        except InvalidToken:
-            LOGGER.exception(
-                '[Transcript credentials re-encryption] No valid fernet key present to decrypt. Process halted.'
-            )
+            except InvalidToken:
+                LOGGER.exception(
+                    '[Transcript credentials re-encryption] No valid fernet key present to decrypt. Process halted.'
+                )
+
+    def re_encrypt(self, executor, workers, fernet_keys, chunk_size, resume):
+        """
+        Re-encrypts the credentials chunk by chunk, with at most a chunk per worker in flight.
+        """
+        in_flight = deque()
+        written = 0
+        for rows in iter_chunks(chunk_size):
+            in_flight.append(executor.submit(rotate_tokens, fernet_keys, rows, skip_rotated=resume))
+            if len(in_flight) >= workers:
+                written += write_chunk(in_flight.popleft().result())
+        while in_flight:
+            written += write_chunk(in_flight.popleft().result())
+
+        LOGGER.info('[Transcript credentials re-encryption] Re-encrypted %s credentials.', written)
+
+    def verify(self, executor, fernet_keys, chunk_size):
+        """
+        Reports the credentials that can't be decrypted or are still encrypted with an old key.
+        """
+        futures = [executor.submit(verify_tokens, fernet_keys, rows) for rows in iter_chunks(chunk_size)]
+        unreadable, stale = [], []
+        for future in futures:
+            chunk_unreadable, chunk_stale = future.result()
+            unreadable += chunk_unreadable
+            stale += chunk_stale
+
+        if unreadable:
+            LOGGER.error('[Transcript credentials re-encryption] Credentials that cannot be decrypted: %s', unreadable)
+        if stale:
+            LOGGER.warning('[Transcript credentials re-encryption] Credentials encrypted with an old key: %s', stale)
+        LOGGER.info(
+            '[Transcript credentials re-encryption] Verification completed, %s unreadable and %s stale credentials.',
+            len(unreadable),
+            len(stale),
+        )
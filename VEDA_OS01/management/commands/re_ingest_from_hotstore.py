@@ -1,16 +1,25 @@
 """
 Management command used to re-ingest video from hotstore based on the params provided.
+
+ - The hotstore is listed once per course of the requested videos instead of looking every key up separately.
+ - Videos are downloaded and ingested (probe, hotstore upload, encode enqueue) by separate worker pools.
+ - Completed videos are recorded in the `--resume` file, re-running with the same file skips them.
 """
 
 import logging
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
 import boto
 import boto.s3
-import os
-import subprocess
 
 from django.core.management.base import BaseCommand
+from django.db import connection
 
 from VEDA_OS01.models import Video
+from control.encode_worker_tasks import LaneRateLimiter
 from control.veda_file_discovery import FileDiscovery
 
 try:
@@ -20,6 +29,142 @@ except Exception:
 
 LOGGER = logging.getLogger(__name__)
 BUCKET_NAME = 'veda-hotstore'
+# Keys sharing a shorter prefix are looked up one by one rather than listing most of the hotstore.
+MIN_LIST_PREFIX_LENGTH = 6
+
+
+def list_hotstore_keys(bucket, key_names):
+    """
+    List the hotstore once per course for the given key names.
+
+    VEDA ids start with the institution, class and semester of their course, keys are
+    grouped by that prefix and each group is listed by its common prefix. Groups whose
+    common prefix is too short to list are looked up with a HEAD request per key.
+
+    Returns:
+        dict mapping the key names found in the hotstore to their keys.
+    """
+    course_key_names = defaultdict(set)
+    for key_name in set(key_names):
+        course_key_names[key_name.rpartition('-V')[0]].add(key_name)
+
+    hotstore_keys = {}
+    for names in course_key_names.values():
+        prefix = os.path.commonprefix(list(names))
+        if len(prefix) < MIN_LIST_PREFIX_LENGTH:
+            for key_name in names:
+                key = bucket.get_key(key_name)
+                if key is not None:
+                    hotstore_keys[key_name] = key
+        else:
+            hotstore_keys.update((key.name, key) for key in bucket.list(prefix=prefix) if key.name in names)
+    return hotstore_keys
+
+
+def read_resume_file(resume_file):
+    """
+    Returns the VEDA ids already recorded in the resume file.
+    """
+    if not resume_file or not os.path.exists(resume_file):
+        return set()
+
+    with open(resume_file) as completed:
+        return set(line.strip() for line in completed if line.strip())
+
+
+class HotstoreReIngest(object):
+    """
+    Re-ingests hotstore videos with separate download and ingest worker pools.
+
+    At most `download_workers + 2 * ingest_workers` videos are held in the
+    working directory at a time, so downloads never run far ahead of ingests.
+    """
+    def __init__(self, download_workers=4, ingest_workers=2, rate_limiter=None, resume_file=None):
+        self.download_workers = download_workers
+        self.ingest_workers = ingest_workers
+        self.rate_limiter = rate_limiter
+        self.resume_file = resume_file
+        self.slots = threading.BoundedSemaphore(download_workers + 2 * ingest_workers)
+        self._local = threading.local()
+
+    @property
+    def file_discovery(self):
+        """
+        Returns the `FileDiscovery` of the current worker thread.
+        """
+        file_discovery = getattr(self._local, 'file_discovery', None)
+        if file_discovery is None:
+            file_discovery = FileDiscovery()
+            self._local.file_discovery = file_discovery
+        return file_discovery
+
+    def _download(self, ingest_pool, video, key):
+        """
+        Download a video and hand it off to the ingest pool.
+        """
+        try:
+            # Downloading populates the key metadata needed by the ingest.
+            reservation = self.file_discovery.download_video_to_working_directory(key, os.path.basename(key.name))
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('Download failed for %s', video.edx_id)
+            reservation = None
+
+        if not reservation:
+            self.slots.release()
+            return None
+
+        return ingest_pool.submit(self._ingest, video, key, reservation)
+
+    def _ingest(self, video, key, reservation):
+        """
+        Ingest a downloaded video, its working storage stays reserved until the ingest ends.
+        """
+        try:
+            return self.file_discovery.validate_metadata_and_feed_to_ingest(
+                key, file_downloaded=True, work_directory=reservation.volume, reservation=reservation
+            )
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('Ingest failed for %s', video.edx_id)
+            return False
+        finally:
+            reservation.release()
+            self.slots.release()
+            # Worker threads hold their own database connection.
+            connection.close()
+
+    def _record(self, video):
+        if self.resume_file:
+            with open(self.resume_file, 'a') as completed:
+                completed.write(video.edx_id + '\n')
+
+    def run(self, videos_and_keys):
+        """
+        Re-ingest (video, hotstore key) pairs.
+
+        Returns:
+            number of ingested and failed videos.
+        """
+        ingested = failed = 0
+        with ThreadPoolExecutor(max_workers=self.ingest_workers) as ingest_pool, \
+                ThreadPoolExecutor(max_workers=self.download_workers) as download_pool:
+            downloads = []
+            for video, key in videos_and_keys:
+                self.slots.acquire()
+                if self.rate_limiter:
+                    self.rate_limiter.acquire()
+                downloads.append((video, download_pool.submit(self._download, ingest_pool, video, key)))
+
+            for video, download in downloads:
+                ingest = download.result()
+                if ingest is not None and ingest.result():
+                    ingested += 1
+                    self._record(video)
+                    LOGGER.info('Ingest completed for {}'.format(video.edx_id))
+                else:
+                    failed += 1
+                    LOGGER.error('Ingest failed for {}'.format(video.edx_id))
+
+        return ingested, failed
 
 
 class Command(BaseCommand):
@@ -41,6 +186,34 @@ class Command(BaseCommand):
             help="The bigger video id for the list"
         )
 
+        # Optional arguments.
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report which videos would be re-ingested"
+        )
+        parser.add_argument(
+            '--resume',
+            help="File recording re-ingested VEDA ids, videos already recorded in it are skipped"
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            help="Maximum number of videos started per second"
+        )
+        parser.add_argument(
+            '--download-workers',
+            type=int,
+            default=4,
+            help="Number of concurrent downloads"
+        )
+        parser.add_argument(
+            '--ingest-workers',
+            type=int,
+            default=2,
+            help="Number of concurrent ingests"
+        )
+
     def handle(self, *args, **options):
         """
         handle method for command class.
@@ -50,14 +223,44 @@ class Command(BaseCommand):
 
         start_id = options.get('start_video_id')
         end_id = options.get('end_video_id')
-        query = Video.objects.filter(id__range=(start_id, end_id))
+        completed = read_resume_file(options.get('resume'))
 
+        videos = []
+        for vd in Video.objects.filter(id__range=(start_id, end_id)).order_by('id'):
+            if vd.edx_id in completed:
+                continue
+            if not vd.video_orig_extension:
+                LOGGER.warning('Cannot look up %s, unknown extension', vd.edx_id)
+                continue
+            videos.append(vd)
+
+        key_names = [vd.edx_id + '.' + vd.video_orig_extension for vd in videos]
         conn = boto.connect_s3()
         bucket = conn.get_bucket(BUCKET_NAME)
-        for vd in query:
-            keyname = vd.edx_id + '.' + vd.video_orig_extension
-            filename = './' + keyname
-            vd_key = bucket.get_key(keyname)
-            file_discovery = FileDiscovery()
-            file_discovery.validate_metadata_and_feed_to_ingest(vd_key)
-            LOGGER.info('Ingest completed for {}'.format(vd.edx_id))
+        hotstore_keys = list_hotstore_keys(bucket, key_names)
+
+        videos_and_keys = []
+        for vd, keyname in zip(videos, key_names):
+            if keyname in hotstore_keys:
+                videos_and_keys.append((vd, hotstore_keys[keyname]))
+            else:
+                LOGGER.warning('VEDA ID %s not found in hotstore', vd.edx_id)
+
+        LOGGER.info(
+            '[Re-ingest from hotstore] videos(to ingest)=%s - videos(not in hotstore)=%s - videos(resumed)=%s',
+            len(videos_and_keys),
+            len(videos) - len(videos_and_keys),
+            len(completed),
+        )
+        if options.get('dry_run'):
+            return
+
+        rate_limit = options.get('rate_limit')
+        re_ingest = HotstoreReIngest(
+            download_workers=options['download_workers'],
+            ingest_workers=options['ingest_workers'],
+            rate_limiter=LaneRateLimiter(rate_limit) if rate_limit else None,
+            resume_file=options.get('resume'),
+        )
+        ingested, failed = re_ingest.run(videos_and_keys)
+        LOGGER.info('[Re-ingest from hotstore] videos(ingested)=%s - videos(failed)=%s', ingested, failed)
@@ -8,20 +8,37 @@ Takes either a studio upload ID (a valid key in s3) and just
 processes that video, or a date (in the format year-month-day)
 and processes all videos that were last modified before that date.
 
+Dates are replayed by paging through the ingest prefix listing. Notifications are
+sent concurrently, or enqueued straight to the ingest Celery queue with --celery.
+With --resume, the listing marker is checkpointed after every page and a new run
+continues after it. The checkpoint never moves past a notification that failed, failed
+notifications are sent once more at the end of the run.
+
 Usage:
 python manage.py re_send_sns_notification --date=2018-08-03
+python manage.py re_send_sns_notification --date=2018-08-03 --workers=16 --rate-limit=50 --resume=/tmp/sns.marker
+python manage.py re_send_sns_notification --date=2018-08-03 --celery
 python manage.py re_send_sns_notification --key=12345678-1234-1234-1234-123456789abc
 """
 
+import json
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
 import boto
 import boto.s3
-from datetime import datetime
 import requests
+from boto.utils import parse_ts
 
 from django.core.management.base import BaseCommand, CommandError
 
 from VEDA.utils import get_config
+from control.encode_worker_tasks import LaneRateLimiter
+from control.http_ingest_celeryapp import enqueue_ingests
 
 try:
     boto.config.add_section('Boto')
@@ -30,6 +47,27 @@ except Exception:
 
 LOGGER = logging.getLogger(__name__)
 CONFIG_DATA = get_config()
+INGEST_URL = 'https://veda.edx.org/api/ingest_from_s3/'
+
+
+def read_marker(resume_file):
+    """
+    Returns the listing marker stored in the resume file, if any.
+    """
+    if not resume_file or not os.path.exists(resume_file):
+        return ''
+
+    with open(resume_file) as marker_file:
+        return marker_file.read().strip()
+
+
+def write_marker(resume_file, marker):
+    """
+    Store the listing marker in the resume file.
+    """
+    if resume_file:
+        with open(resume_file, 'w') as marker_file:
+            marker_file.write(marker)
 
 
 class Command(BaseCommand):
@@ -38,6 +76,11 @@ class Command(BaseCommand):
     """
     help = 'Re-send SNS notification to api/ingest_from_s3. Takes either a studio upload ID or a date.'
 
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self._local = threading.local()
+        self.rate_limiter = None
+
     def add_arguments(self, parser):
         super(Command, self).add_arguments(parser)
 
@@ -53,6 +96,37 @@ class Command(BaseCommand):
             help="Process just the video with this s3 key (a studio upload ID)."
         )
 
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help="Number of notifications sent concurrently."
+        )
+
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            help="Maximum number of notifications sent per second."
+        )
+
+        parser.add_argument(
+            '--celery',
+            action='store_true',
+            help="Enqueue the videos straight to the ingest Celery queue instead of sending notifications."
+        )
+
+        parser.add_argument(
+            '--resume',
+            help="File checkpointing the listing marker, a new run continues after it."
+        )
+
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=1000,
+            help="Number of keys listed per request."
+        )
+
     def handle(self, *args, **options):
         """
         handle method for command class.
@@ -76,19 +150,126 @@ class Command(BaseCommand):
 
             try:
                 cutoff_date = datetime.strptime(date, '%Y-%m-%d')
-            except AttributeError:
+            except (AttributeError, ValueError):
                 raise CommandError('Incorrect formatting. Date should be formatted like year-month-day.')
 
-            keys = list(bucket.list(CONFIG_DATA['edx_s3_ingest_prefix']))
+            rate_limit = options.get('rate_limit')
+            self.rate_limiter = LaneRateLimiter(rate_limit) if rate_limit else None
+            self.replay(
+                bucket,
+                cutoff_date,
+                workers=options.get('workers') or 1,
+                use_celery=options.get('celery'),
+                resume_file=options.get('resume'),
+                page_size=options.get('page_size'),
+            )
 
-            for key in keys:
-                last_modified_date = datetime.strptime(key.last_modified, '%Y-%m-%dT%X.000Z')
-                if last_modified_date < cutoff_date:
-                    self.send_http_request(key.name)
+    def iter_pages(self, bucket, marker, page_size):
+        """
+        Page through the ingest prefix listing, starting after `marker`.
+        """
+        while True:
+            page = bucket.get_all_keys(prefix=CONFIG_DATA['edx_s3_ingest_prefix'], marker=marker, max_keys=page_size)
+            if not page:
+                return
+
+            yield page
+            if not page.is_truncated:
+                return
+            marker = page[-1].name
+
+    def replay(self, bucket, cutoff_date, workers=8, use_celery=False, resume_file=None, page_size=1000):
+        """
+        Replay the ingest of every video last modified before `cutoff_date`.
+        """
+        marker = read_marker(resume_file)
+        if marker:
+            LOGGER.info('[Re-send SNS notification] Resuming after %s', marker)
+
+        started = time.time()
+        listed = replayed = 0
+        failed_keys = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for page in self.iter_pages(bucket, marker, page_size):
+                key_names = [
+                    key.name for key in page
+                    if parse_ts(key.last_modified) < cutoff_date
+                ]
+                page_failed_keys = []
+                if key_names:
+                    if use_celery:
+                        enqueue_ingests(key_names)
+                    else:
+                        statuses = pool.map(self.send_http_request, key_names)
+                        page_failed_keys = [
+                            key_name for key_name, status in zip(key_names, statuses) if not self.is_sent(status)
+                        ]
+
+                if not failed_keys:
+                    # Checkpoint up to the first failure, so that a new run sends it again.
+                    for key in page:
+                        if key.name in page_failed_keys:
+                            break
+                        marker = key.name
+                    write_marker(resume_file, marker)
+                failed_keys.extend(page_failed_keys)
+                last_key_name = page[-1].name
+                listed += len(page)
+                replayed += len(key_names) - len(page_failed_keys)
+                LOGGER.info(
+                    '[Re-send SNS notification] keys(listed)=%s - keys(replayed)=%s - keys(failed)=%s - '
+                    'rate=%.2f keys/s - marker=%s',
+                    listed,
+                    replayed,
+                    len(failed_keys),
+                    replayed / max(time.time() - started, 1e-6),
+                    marker,
+                )
+
+            if failed_keys:
+                LOGGER.info('[Re-send SNS notification] Retrying %s failed keys.', len(failed_keys))
+                statuses = pool.map(self.send_http_request, failed_keys)
+                retried_keys = len(failed_keys)
+                failed_keys = [key_name for key_name, status in zip(failed_keys, statuses) if not self.is_sent(status)]
+                replayed += retried_keys - len(failed_keys)
+                if failed_keys:
+                    LOGGER.error(
+                        '[Re-send SNS notification] %s keys failed, the checkpoint stays at %s: %s',
+                        len(failed_keys), marker, ', '.join(failed_keys)
+                    )
+                else:
+                    write_marker(resume_file, last_key_name)
+
+        LOGGER.info('[Re-send SNS notification] Process completed, %s keys replayed.', replayed)
+        return replayed
+
+    @staticmethod
+    def is_sent(status_code):
+        """
+        Whether a notification was delivered, server errors and failed connections are retried.
+        """
+        return status_code is not None and status_code < 500
+
+    @property
+    def session(self):
+        """
+        Returns the HTTP session of the current thread, which keeps its connection alive.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
 
     def send_http_request(self, key):
-        data = '{"Type" : "Notification", "Subject" : "",'
-        data += '"Message" : "{\\"Records\\":[{\\"s3\\":{\\"object\\":{\\"key\\":\\"' + key + '\\"}}}]}"}'
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        data = json.dumps({
+            'Type': 'Notification',
+            'Subject': '',
+            'Message': json.dumps({'Records': [{'s3': {'object': {'key': key}}}]}),
+        })
 
         headers = {
             'Connection': 'Keep-Alive',
@@ -96,10 +277,14 @@ class Command(BaseCommand):
             'x-amz-sns-message-type': 'Notification'
         }
 
-        url = 'https://veda.edx.org/api/ingest_from_s3/'
-        r = requests.post(url, headers=headers, data=data)
+        try:
+            r = self.session.post(INGEST_URL, headers=headers, data=data)
+        except requests.RequestException as error:
+            LOGGER.error('Ingest from S3 API call failed for {}: {}'.format(key, error))
+            return None
 
         LOGGER.info('Ingest from S3 API call sent for for {} with status code {}'.format(key, r.status_code))
+        return r.status_code
 
     def connect_boto(self):
         conn = boto.connect_s3()
@@ -0,0 +1,41 @@
+"""
+Management command used to run the scheduler service for the periodic pipeline jobs.
+
+See `control.veda_scheduler` for the jobs and their schedule.
+"""
+
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from control.veda_scheduler import JOBS, Scheduler, get_jobs
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Run scheduler command class
+    """
+    help = 'Run the periodic pipeline jobs: {}'.format(', '.join(sorted(JOBS)))
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+
+        parser.add_argument(
+            '--job',
+            action='append',
+            dest='jobs',
+            help='Name of a job to run, can be repeated. Runs all jobs if not given.'
+        )
+
+    def handle(self, *args, **options):
+        """
+        handle method for command class.
+        """
+        try:
+            jobs = get_jobs(options.get('jobs'))
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        Scheduler(jobs).run()
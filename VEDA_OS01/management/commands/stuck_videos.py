@@ -0,0 +1,47 @@
+"""
+Management command used to list the videos stuck in a transcode status.
+
+Uses the status change time of the videos, see `VEDA_OS01.utils.set_video_trans_status`.
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from VEDA_OS01.utils import VIDEO_STATUS_STUCK_HOURS, get_stuck_videos
+
+
+class Command(BaseCommand):
+    """
+    Stuck videos command class
+    """
+    help = 'List the videos that have been in a transcode status for too long, oldest first'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+
+        parser.add_argument(
+            '--status',
+            default='Queue',
+            help='Transcode status, defaults to Queue.'
+        )
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=VIDEO_STATUS_STUCK_HOURS,
+            help='Hours after which a video is stuck in the status.'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Maximum number of videos listed.'
+        )
+
+    def handle(self, *args, **options):
+        """
+        handle method for command class.
+        """
+        videos = get_stuck_videos(options['status'], datetime.timedelta(hours=options['hours']))
+        for edx_id, status_changed in videos.values_list('edx_id', 'video_status_changed')[:options['limit']]:
+            self.stdout.write('{edx_id}\t{status_changed}'.format(edx_id=edx_id, status_changed=status_changed))
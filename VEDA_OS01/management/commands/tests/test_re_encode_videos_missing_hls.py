@@ -0,0 +1,125 @@
+"""
+Tests of the HLS backfill of the re_encode_videos_missing_hls management command.
+"""
+
+from django.test import TestCase
+from mock import Mock, patch
+
+from VEDA_OS01.management.commands.re_encode_videos_missing_hls import QUEUE_POLL_INTERVAL, HlsBackfill
+from VEDA_OS01.models import HlsBackfillCheckpoint
+from VEDA_OS01.tests.factories import EncodeFactory, UrlFactory, VideoFactory
+
+COMMAND_MODULE = 'VEDA_OS01.management.commands.re_encode_videos_missing_hls'
+
+
+class HlsBackfillTests(TestCase):
+    """
+    Tests for `HlsBackfill`
+    """
+
+    def setUp(self):
+        self.hls_profile = EncodeFactory(product_spec='hls')
+        self.videos = [VideoFactory(process_transcription=True) for __ in range(3)]
+        self.hls_url = UrlFactory(
+            videoID=self.videos[1],
+            encode_profile=self.hls_profile,
+            encode_size=100,
+            encode_bitdepth='200 kbps'
+        )
+        self.val_ids = [video.studio_id for video in self.videos] + ['not-in-veda']
+
+        self.fetched_offsets = []
+        fetch_patcher = patch(COMMAND_MODULE + '.fetch_videos_wo_hls', side_effect=self.fetch_videos)
+        fetch_patcher.start()
+        self.addCleanup(fetch_patcher.stop)
+
+        enqueue_patcher = patch(COMMAND_MODULE + '.enqueue_video_for_hls_encode', return_value=True)
+        self.mock_enqueue = enqueue_patcher.start()
+        self.addCleanup(enqueue_patcher.stop)
+
+        val_patcher = patch(COMMAND_MODULE + '.update_hls_profile_in_val', return_value=Mock(status_code=200))
+        self.mock_update_val = val_patcher.start()
+        self.addCleanup(val_patcher.stop)
+
+    def fetch_videos(self, api_url, headers, params):
+        """
+        Serve batches of the edxval ids.
+        """
+        offset, batch_size = params['offset'], params['batch_size']
+        self.fetched_offsets.append(offset)
+        return {
+            'videos': self.val_ids[offset:offset + batch_size],
+            'total': len(self.val_ids),
+            'offset': offset + batch_size,
+            'batch_size': batch_size,
+        }
+
+    def backfill(self, **kwargs):
+        return HlsBackfill('https://val', {}, self.hls_profile, run=1, batch_size=2, **kwargs)
+
+    def test_run_backfill(self):
+        """
+        Verify that all batches are processed and the checkpoint follows every video.
+        """
+        checkpoint = HlsBackfillCheckpoint.objects.create(start_offset=0)
+
+        processed = self.backfill(checkpoint=checkpoint).run_backfill()
+
+        self.assertEqual(processed, 4)
+        self.assertEqual(self.fetched_offsets, [0, 2])
+        self.assertEqual(
+            [call[1]['veda_id'] for call in self.mock_enqueue.call_args_list],
+            [self.videos[0].edx_id, self.videos[2].edx_id]
+        )
+        self.mock_update_val.assert_called_once_with('https://val', {}, self.videos[1].studio_id, 'hls', encode_data={
+            'file_size': 100,
+            'bitrate': 200,
+            'url': self.hls_url.encode_url
+        })
+
+        checkpoint.refresh_from_db()
+        self.assertEqual(
+            (checkpoint.position, checkpoint.total, checkpoint.processed, checkpoint.enqueued, checkpoint.val_updated),
+            (4, 4, 4, 2, 1)
+        )
+        self.videos[0].refresh_from_db()
+        self.assertFalse(self.videos[0].process_transcription)
+
+    def test_resume(self):
+        """
+        Verify that a backfill resumes from the checkpoint position.
+        """
+        checkpoint = HlsBackfillCheckpoint.objects.create(start_offset=0, position=2, processed=2)
+
+        self.assertEqual(self.backfill(checkpoint=checkpoint).run_backfill(), 2)
+
+        self.assertEqual(self.fetched_offsets, [2])
+        self.assertEqual(
+            [call[1]['veda_id'] for call in self.mock_enqueue.call_args_list],
+            [self.videos[2].edx_id]
+        )
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.position, checkpoint.processed), (4, 4))
+
+    def test_resolve_batch(self):
+        """
+        Verify that the VEDA videos and HLS encodes of a batch are resolved with a query each.
+        """
+        with self.assertNumQueries(2):
+            videos_by_val_id, hls_urls = self.backfill().resolve_batch(self.val_ids)
+
+        self.assertEqual(list(videos_by_val_id), self.val_ids)
+        self.assertEqual(list(videos_by_val_id['not-in-veda']), [])
+        self.assertEqual(list(hls_urls), [self.videos[1].pk])
+
+    @patch(COMMAND_MODULE + '.get_queue_depth', side_effect=[50, 20, 9])
+    def test_wait_for_queue(self, mock_get_queue_depth):
+        """
+        Verify that enqueues are held back while the backfill queue is too deep.
+        """
+        mock_sleep = Mock()
+        self.backfill(max_queue_depth=10, sleep=mock_sleep).wait_for_queue()
+
+        self.assertEqual(mock_get_queue_depth.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        mock_sleep.assert_called_with(QUEUE_POLL_INTERVAL)
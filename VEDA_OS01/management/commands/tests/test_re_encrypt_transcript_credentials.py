@@ -103,3 +103,68 @@ class ReEncryptTranscriptCredentialsTests(TestCase):
             # Verify we are not able to access the record, we should get an error due to decryption key not present.
             with self.assertRaises(InvalidToken):
                 self.verify_access_credentials()
+
+    def create_credentials(self, count):
+        """
+        Creates credentials for `count` more organizations.
+        """
+        for index in range(count):
+            TranscriptCredentials.objects.create(
+                org='org{}'.format(index), provider=TranscriptProvider.CIELO24, api_key='key', api_secret='secret'
+            )
+
+    def test_reencrypt_in_chunks(self):
+        """
+        Test that every chunk of credentials is re-encrypted with the new key.
+        """
+        self.create_credentials(4)
+        new_keys_set = ['new-fernet-key'] + settings.FERNET_KEYS
+
+        with override_settings(FERNET_KEYS=new_keys_set):
+            call_command('re_encrypt_transcript_credentials', chunk_size=2, workers=2)
+
+        # Only the new key is needed to decrypt every record now.
+        with override_settings(FERNET_KEYS=['new-fernet-key']):
+            invalidate_fernet_cached_properties(TranscriptCredentials, ['api_key', 'api_secret'])
+            self.assertEqual(
+                sorted(TranscriptCredentials.objects.values_list('api_secret', flat=True)),
+                ['secret'] * 4 + ['test-secret']
+            )
+
+    @patch('VEDA_OS01.management.commands.re_encrypt_transcript_credentials.LOGGER')
+    def test_resume(self, mock_logger):
+        """
+        Test that resuming skips the credentials already encrypted with the new key.
+        """
+        self.create_credentials(2)
+        new_keys_set = ['new-fernet-key'] + settings.FERNET_KEYS
+
+        with override_settings(FERNET_KEYS=new_keys_set):
+            invalidate_fernet_cached_properties(TranscriptCredentials, ['api_key', 'api_secret'])
+            TranscriptCredentials.objects.get(org='org0').save()
+            call_command('re_encrypt_transcript_credentials', chunk_size=2, workers=1, resume=True)
+
+        mock_logger.info.assert_any_call('[Transcript credentials re-encryption] Re-encrypted %s credentials.', 2)
+
+    @patch('VEDA_OS01.management.commands.re_encrypt_transcript_credentials.LOGGER')
+    def test_verify(self, mock_logger):
+        """
+        Test that verification reports stale and unreadable credentials without changing them.
+        """
+        stale_pk = TranscriptCredentials.objects.get(org='MAx').pk
+        with override_settings(FERNET_KEYS=['other-fernet-key']):
+            invalidate_fernet_cached_properties(TranscriptCredentials, ['api_key', 'api_secret'])
+            self.create_credentials(1)
+            unreadable_pk = TranscriptCredentials.objects.get(org='org0').pk
+        new_keys_set = ['new-fernet-key'] + settings.FERNET_KEYS
+
+        with override_settings(FERNET_KEYS=new_keys_set):
+            call_command('re_encrypt_transcript_credentials', workers=1, verify=True)
+
+        mock_logger.error.assert_called_with(
+            '[Transcript credentials re-encryption] Credentials that cannot be decrypted: %s', [unreadable_pk]
+        )
+        mock_logger.warning.assert_called_with(
+            '[Transcript credentials re-encryption] Credentials encrypted with an old key: %s', [stale_pk]
+        )
+        self.verify_access_credentials()
@@ -0,0 +1,116 @@
+"""
+Tests of the re_ingest_from_hotstore management command.
+"""
+
+import os
+import shutil
+import tempfile
+
+from boto.s3.connection import S3Connection
+from django.core.management import call_command
+from django.test import TestCase
+from mock import Mock, patch
+from moto import mock_s3_deprecated
+
+from VEDA_OS01.management.commands.re_ingest_from_hotstore import BUCKET_NAME, list_hotstore_keys
+from VEDA_OS01.tests.factories import VideoFactory
+
+
+@mock_s3_deprecated
+class ReIngestFromHotstoreTests(TestCase):
+    """
+    Management command test class.
+    """
+
+    def setUp(self):
+        self.videos = [VideoFactory(video_orig_extension='mp4') for __ in range(4)]
+        bucket = S3Connection().create_bucket(BUCKET_NAME)
+        # The last video is missing from the hotstore.
+        for video in self.videos[:3]:
+            bucket.new_key(video.edx_id + '.mp4').set_contents_from_string('video')
+
+        self.start_id, self.end_id = str(self.videos[0].id), str(self.videos[-1].id)
+
+        discovery_patcher = patch('VEDA_OS01.management.commands.re_ingest_from_hotstore.FileDiscovery')
+        mock_file_discovery = discovery_patcher.start().return_value
+        self.addCleanup(discovery_patcher.stop)
+        self.mock_download = mock_file_discovery.download_video_to_working_directory
+        self.mock_download.return_value = Mock(volume=tempfile.gettempdir())
+        self.mock_ingest = mock_file_discovery.validate_metadata_and_feed_to_ingest
+        self.mock_ingest.return_value = True
+
+    def ingested_keys(self):
+        return sorted(call[0][0].name for call in self.mock_ingest.call_args_list)
+
+    def test_re_ingest(self):
+        """
+        Verify that the videos found in the hotstore are downloaded and ingested without per-key lookups.
+        """
+        with patch('boto.s3.bucket.Bucket.get_key') as mock_get_key:
+            call_command('re_ingest_from_hotstore', self.start_id, self.end_id, '--download-workers=2')
+            self.assertFalse(mock_get_key.called)
+
+        self.assertEqual(self.mock_download.call_count, 3)
+        self.assertEqual(self.ingested_keys(), sorted(video.edx_id + '.mp4' for video in self.videos[:3]))
+        for call in self.mock_ingest.call_args_list:
+            self.assertTrue(call[1]['file_downloaded'])
+
+    def test_dry_run(self):
+        """
+        Verify that nothing is downloaded or ingested on a dry run.
+        """
+        call_command('re_ingest_from_hotstore', self.start_id, self.end_id, '--dry-run')
+
+        self.assertFalse(self.mock_download.called)
+        self.assertFalse(self.mock_ingest.called)
+
+    def test_resume(self):
+        """
+        Verify that videos recorded in the resume file are skipped and new ones are recorded.
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        resume_file = os.path.join(directory, 'resume.txt')
+        with open(resume_file, 'w') as completed:
+            completed.write(self.videos[0].edx_id + '\n')
+
+        # The ingest of the second video fails, so it is not recorded.
+        failed_key = self.videos[1].edx_id + '.mp4'
+        self.mock_ingest.side_effect = lambda key, **kwargs: key.name != failed_key
+
+        call_command('re_ingest_from_hotstore', self.start_id, self.end_id, '--resume', resume_file)
+
+        self.assertEqual(self.ingested_keys(), sorted([failed_key, self.videos[2].edx_id + '.mp4']))
+        with open(resume_file) as completed:
+            self.assertEqual(completed.read().split(), [self.videos[0].edx_id, self.videos[2].edx_id])
+
+    def test_list_hotstore_keys_per_course(self):
+        """
+        Verify that keys of different institutions are listed per course and never the whole hotstore.
+        """
+        bucket = S3Connection().get_bucket(BUCKET_NAME)
+        key_names = ['MITX101T12018-V000001.mp4', 'MITX101T12018-V000002.mp4', 'HARVX20T22019-V000001.mov']
+        for key_name in key_names + ['MITX101T12018-V000003.mp4']:
+            bucket.new_key(key_name).set_contents_from_string('video')
+
+        with patch.object(bucket, 'list', wraps=bucket.list) as mock_list:
+            hotstore_keys = list_hotstore_keys(bucket, key_names + ['MITX101T12018-V000004.mp4'])
+
+        self.assertEqual(sorted(hotstore_keys), sorted(key_names))
+        self.assertEqual(
+            sorted(call[1]['prefix'] for call in mock_list.call_args_list),
+            ['HARVX20T22019-V000001.mov', 'MITX101T12018-V00000'],
+        )
+
+    def test_list_hotstore_keys_short_prefix(self):
+        """
+        Verify that keys without a common prefix to list by are looked up one by one.
+        """
+        bucket = S3Connection().get_bucket(BUCKET_NAME)
+        bucket.new_key('a.mp4').set_contents_from_string('video')
+
+        with patch.object(bucket, 'list') as mock_list:
+            hotstore_keys = list_hotstore_keys(bucket, ['a.mp4', 'b.mp4'])
+
+        self.assertFalse(mock_list.called)
+        self.assertEqual(list(hotstore_keys), ['a.mp4'])
@@ -0,0 +1,153 @@
+"""
+Tests of the re_send_sns_notification management command.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import responses
+from boto.s3.connection import S3Connection
+from django.core.management import call_command
+from django.test import TestCase
+from mock import patch
+from moto import mock_s3_deprecated
+
+from VEDA.utils import get_config
+from VEDA_OS01.management.commands.re_send_sns_notification import INGEST_URL
+
+CONFIG_DATA = get_config('test_config.yaml')
+COMMAND_MODULE = 'VEDA_OS01.management.commands.re_send_sns_notification'
+
+
+@mock_s3_deprecated
+class ReSendSnsNotificationTests(TestCase):
+    """
+    Management command test class.
+    """
+
+    def setUp(self):
+        config_patcher = patch.dict(COMMAND_MODULE + '.CONFIG_DATA', CONFIG_DATA)
+        config_patcher.start()
+        self.addCleanup(config_patcher.stop)
+
+        bucket = S3Connection().create_bucket(CONFIG_DATA['edx_s3_ingest_bucket'])
+        self.key_names = [CONFIG_DATA['edx_s3_ingest_prefix'] + 'video{}'.format(index) for index in range(5)]
+        for key_name in self.key_names:
+            bucket.new_key(key_name).set_contents_from_string('video')
+        bucket.new_key('other-prefix/video').set_contents_from_string('video')
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def notified_keys(self):
+        keys = []
+        for call in responses.calls:
+            message = json.loads(json.loads(call.request.body)['Message'])
+            keys.extend(record['s3']['object']['key'] for record in message['Records'])
+        return sorted(keys)
+
+    @responses.activate
+    def test_replay_date(self):
+        """
+        Verify that every key modified before the date is notified, page by page.
+        """
+        responses.add(responses.POST, INGEST_URL, status=200)
+
+        call_command('re_send_sns_notification', '--date=2100-01-01', '--page-size=2', '--workers=3')
+
+        self.assertEqual(self.notified_keys(), self.key_names)
+
+    @responses.activate
+    def test_replay_date_filter(self):
+        """
+        Verify that keys modified after the date are not notified.
+        """
+        responses.add(responses.POST, INGEST_URL, status=200)
+
+        call_command('re_send_sns_notification', '--date=2000-01-01')
+
+        self.assertEqual(len(responses.calls), 0)
+
+    @responses.activate
+    def test_resume(self):
+        """
+        Verify that the listing marker is checkpointed and a new run continues after it.
+        """
+        responses.add(responses.POST, INGEST_URL, status=200)
+        resume_file = os.path.join(self.directory, 'marker')
+        with open(resume_file, 'w') as marker_file:
+            marker_file.write(self.key_names[2])
+
+        call_command('re_send_sns_notification', '--date=2100-01-01', '--page-size=2', '--resume', resume_file)
+
+        self.assertEqual(self.notified_keys(), self.key_names[3:])
+        with open(resume_file) as marker_file:
+            self.assertEqual(marker_file.read(), self.key_names[-1])
+
+    def fail_keys(self, failing_keys):
+        """
+        Answer the notifications of `failing_keys` with a server error, once for each key in the list.
+        """
+        failing_keys = list(failing_keys)
+
+        def notify(request):
+            message = json.loads(json.loads(request.body)['Message'])
+            key_name = message['Records'][0]['s3']['object']['key']
+            if key_name in failing_keys:
+                failing_keys.remove(key_name)
+                return (503, {}, '')
+            return (200, {}, '')
+
+        responses.add_callback(responses.POST, INGEST_URL, callback=notify)
+
+    def read_resume_file(self, resume_file):
+        with open(resume_file) as marker_file:
+            return marker_file.read()
+
+    @responses.activate
+    def test_resume_after_failure(self):
+        """
+        Verify that the checkpoint stays before a key whose notification failed, and a new run sends it again.
+        """
+        self.fail_keys([self.key_names[2]] * 2)
+        resume_file = os.path.join(self.directory, 'marker')
+
+        call_command('re_send_sns_notification', '--date=2100-01-01', '--page-size=2', '--resume', resume_file)
+
+        self.assertEqual(self.read_resume_file(resume_file), self.key_names[1])
+        self.assertEqual(self.notified_keys(), sorted(self.key_names + [self.key_names[2]]))
+
+        responses.calls.reset()
+        call_command('re_send_sns_notification', '--date=2100-01-01', '--page-size=2', '--resume', resume_file)
+
+        self.assertEqual(self.notified_keys(), self.key_names[2:])
+        self.assertEqual(self.read_resume_file(resume_file), self.key_names[-1])
+
+    @responses.activate
+    def test_retry_failures(self):
+        """
+        Verify that failed notifications are sent again at the end of the run, which then checkpoints the listing.
+        """
+        self.fail_keys([self.key_names[0], self.key_names[3]])
+        resume_file = os.path.join(self.directory, 'marker')
+
+        call_command('re_send_sns_notification', '--date=2100-01-01', '--page-size=2', '--resume', resume_file)
+
+        self.assertEqual(
+            self.notified_keys(), sorted(self.key_names + [self.key_names[0], self.key_names[3]])
+        )
+        self.assertEqual(self.read_resume_file(resume_file), self.key_names[-1])
+
+    @patch(COMMAND_MODULE + '.enqueue_ingests')
+    def test_replay_celery(self, mock_enqueue_ingests):
+        """
+        Verify that keys are enqueued straight to the ingest queue, a group per page.
+        """
+        call_command('re_send_sns_notification', '--date=2100-01-01', '--page-size=3', '--celery')
+
+        self.assertEqual(
+            [call[0][0] for call in mock_enqueue_ingests.call_args_list],
+            [self.key_names[:3], self.key_names[3:]]
+        )
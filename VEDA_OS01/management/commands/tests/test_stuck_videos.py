@@ -0,0 +1,39 @@
+"""
+Tests of the stuck_videos management command.
+"""
+
+import datetime
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from six import StringIO
+
+from VEDA_OS01.tests.factories import VideoFactory
+
+
+class StuckVideosTests(TestCase):
+    """
+    Management command test class.
+    """
+    def test_stuck_videos(self):
+        """
+        Verify that the videos in the status for longer than the given hours are listed, oldest first.
+        """
+        now = timezone.now()
+        for edx_id, hours_ago in (('recent', 1), ('stuck', 7), ('stuckest', 9)):
+            VideoFactory(
+                edx_id=edx_id,
+                video_trans_status='Queue',
+                video_status_changed=now - datetime.timedelta(hours=hours_ago),
+            )
+        VideoFactory(
+            edx_id='complete',
+            video_trans_status='Complete',
+            video_status_changed=now - datetime.timedelta(days=1),
+        )
+
+        out = StringIO()
+        call_command('stuck_videos', '--hours', '6', stdout=out)
+
+        self.assertEqual([line.split('\t')[0] for line in out.getvalue().splitlines()], ['stuckest', 'stuck'])
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:35
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0009_auto_20200109_2256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InFlightEncode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('veda_id', models.CharField(max_length=50, verbose_name='VEDA Video ID')),
+                ('encode_profile', models.CharField(max_length=50, verbose_name='Encode profile')),
+                ('job_id', models.CharField(max_length=50, verbose_name='Job id')),
+            ],
+            options={
+                'unique_together': {('veda_id', 'encode_profile')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:37
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0010_inflightencode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HlsBackfillCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('start_offset', models.PositiveIntegerField(unique=True, verbose_name='Start offset')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='Next VAL offset')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Videos missing HLS in VAL')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Processed videos')),
+                ('enqueued', models.PositiveIntegerField(default=0, verbose_name='Enqueued encodes')),
+                ('val_updated', models.PositiveIntegerField(default=0, verbose_name='VAL profile updates')),
+            ],
+            options={
+                'get_latest_by': 'modified',
+            },
+        ),
+    ]
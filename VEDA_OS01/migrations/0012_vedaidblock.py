@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-19 17:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0011_hlsbackfillcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VedaIdBlock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('owner', models.CharField(max_length=100, verbose_name='Owner')),
+                ('next_number', models.IntegerField(verbose_name='Next video number')),
+                ('last_number', models.IntegerField(verbose_name='Last video number')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='veda_id_blocks', to='VEDA_OS01.Course')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0012_vedaidblock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inflightencode',
+            name='held',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Held for dispatch'),
+        ),
+        migrations.AddField(
+            model_name='inflightencode',
+            name='priority',
+            field=models.CharField(default='heal', max_length=20, verbose_name='Priority'),
+        ),
+        migrations.AddField(
+            model_name='inflightencode',
+            name='share_key',
+            field=models.CharField(blank=True, default='', help_text='Institution or course the encode is dispatched for.', max_length=255, verbose_name='Share key'),
+        ),
+        migrations.AddField(
+            model_name='inflightencode',
+            name='update_val_status',
+            field=models.BooleanField(default=True, verbose_name='Update VAL status'),
+        ),
+    ]
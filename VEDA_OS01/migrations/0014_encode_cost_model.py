@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0013_inflightencode_fair_share'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encode',
+            name='cost_rate',
+            field=models.FloatField(blank=True, help_text='Calibrated from delivered encodes, used to estimate encode durations.', null=True, verbose_name='Encode seconds per source megapixel-second'),
+        ),
+        migrations.AddField(
+            model_name='inflightencode',
+            name='estimated_seconds',
+            field=models.FloatField(blank=True, null=True, verbose_name='Estimated encode seconds'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0015_skippedencode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='source_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='Orig. SHA-256'),
+        ),
+    ]
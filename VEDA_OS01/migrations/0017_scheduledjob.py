@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:29
+
+from django.db import migrations, models
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0016_video_source_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Job name')),
+                ('running_since', models.DateTimeField(blank=True, null=True, verbose_name='Running since')),
+                ('last_started', models.DateTimeField(blank=True, null=True, verbose_name='Last run started')),
+                ('last_finished', models.DateTimeField(blank=True, null=True, verbose_name='Last run finished')),
+                ('last_duration', models.FloatField(blank=True, null=True, verbose_name='Last run duration (sec)')),
+                ('total_duration', models.FloatField(default=0, verbose_name='Total run duration (sec)')),
+                ('runs', models.PositiveIntegerField(default=0, verbose_name='Runs')),
+                ('failures', models.PositiveIntegerField(default=0, verbose_name='Failed runs')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0017_scheduledjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealWorkItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('encode_profile', models.CharField(max_length=50, verbose_name='Encode profile')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Enqueue attempts')),
+                ('next_check', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Next check')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='heal_work_items', to='VEDA_OS01.Video')),
+            ],
+            options={
+                'unique_together': {('video', 'encode_profile')},
+            },
+        ),
+    ]
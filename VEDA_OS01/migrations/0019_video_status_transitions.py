@@ -0,0 +1,70 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0018_healworkitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoStatusSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=100, unique=True, verbose_name='Transcode status')),
+                ('videos', models.PositiveIntegerField(default=0, verbose_name='Videos in the status')),
+                ('stuck_videos', models.PositiveIntegerField(default=0, verbose_name='Videos in the status for too long')),
+                ('oldest_change', models.DateTimeField(blank=True, null=True, verbose_name='Oldest status change')),
+                ('transitions_in', models.PositiveIntegerField(default=0, verbose_name='Transitions into the status within the window')),
+                ('p50_seconds', models.FloatField(blank=True, null=True, verbose_name='Median seconds in the status')),
+                ('p90_seconds', models.FloatField(blank=True, null=True, verbose_name='90th percentile seconds in the status')),
+                ('p99_seconds', models.FloatField(blank=True, null=True, verbose_name='99th percentile seconds in the status')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='Summarized')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VideoStatusTransition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, default='', max_length=100, verbose_name='From status')),
+                ('to_status', models.CharField(choices=[('Ingest', 'System Ingest'), ('Transcode Queue', 'Transcode Queue'), ('Active Transcode', 'Active Transcode'), ('Transcode Retry', 'Transcode Retry'), ('Transcode Complete', 'Transcode Complete'), ('Deliverable Upload', 'Deliverable Upload'), ('File Complete', 'File Complete'), ('Transcode Error', 'Transcode Error'), ('Corrupt File', 'Corrupt File on Ingest'), ('Review Hold', 'Review Hold'), ('Review Reject', 'Review Rejected'), ('Final Publish', 'Review to Final Publish'), ('Youtube Duplicate', 'Youtube Duplicate'), ('Queue', 'In Encode Queue'), ('Progress', 'In Progress'), ('Complete', 'Complete')], max_length=100, verbose_name='To status')),
+                ('source', models.CharField(help_text='Pipeline stage making the transition, e.g. heal.', max_length=50, verbose_name='Source')),
+                ('seconds_in_status', models.FloatField(blank=True, null=True, verbose_name='Seconds in the previous status')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Transitioned')),
+            ],
+            options={
+                'get_latest_by': 'created',
+            },
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='video_status_changed',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Transcode Status Changed'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['video_trans_status', 'video_status_changed'], name='video_status_changed_idx'),
+        ),
+        migrations.AddField(
+            model_name='videostatustransition',
+            name='video',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_transitions', to='VEDA_OS01.Video'),
+        ),
+        migrations.AddIndex(
+            model_name='videostatustransition',
+            index=models.Index(fields=['video', 'created'], name='transition_video_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videostatustransition',
+            index=models.Index(fields=['from_status', 'created'], name='transition_from_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videostatustransition',
+            index=models.Index(fields=['to_status', 'created'], name='transition_to_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('VEDA_OS01', '0019_video_status_transitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inflightencode',
+            name='encode_started',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Encode started'),
+        ),
+    ]
@@ -5,6 +5,7 @@ Models for Video Pipeline
 import json
 import uuid
 from django.db import models
+from django.utils import timezone
 from fernet_fields import EncryptedTextField
 from model_utils.models import TimeStampedModel
 
@@ -468,6 +469,12 @@ class Video(models.Model):
         max_length=50,
         null=True, blank=True
     )
+    source_hash = models.CharField(
+        'Orig. SHA-256',
+        max_length=64,
+        null=True, blank=True,
+        db_index=True
+    )
     # Status
     video_trans_start = models.DateTimeField('Process Start', null=True, blank=True)
     video_trans_end = models.DateTimeField('Process Complete', null=True, blank=True)
@@ -478,6 +485,7 @@ class Video(models.Model):
         choices=VideoStatus.CHOICES,
         default=VideoStatus.SI
     )
+    video_status_changed = models.DateTimeField('Transcode Status Changed', null=True, blank=True)
     transcript_status = models.CharField(
         'Transcription Status',
         max_length=100,
@@ -529,6 +537,10 @@ class Video(models.Model):
 
     class Meta:
         get_latest_by = 'video_trans_start'
+        indexes = [
+            # Videos in a status since before a time, e.g. stuck in 'Queue'.
+            models.Index(fields=['video_trans_status', 'video_status_changed'], name='video_status_changed_idx'),
+        ]
 
     def __str__(self):
         return '{edx_id}'.format(edx_id=self.edx_id)
@@ -591,6 +603,11 @@ class Encode(models.Model):
         'VAL Profile Name',
         max_length=300,
         null=True, blank=True)
+    cost_rate = models.FloatField(
+        'Encode seconds per source megapixel-second',
+        help_text='Calibrated from delivered encodes, used to estimate encode durations.',
+        null=True, blank=True
+    )
 
     def __str__(self):
         return '{encode_profile}'.format(encode_profile=self.encode_name)
@@ -743,6 +760,140 @@ class TranscriptProcessMetadata(TimeStampedModel):
         )
 
 
+class VedaIdBlock(TimeStampedModel):
+    """
+    A block of VEDA video numbers reserved from a course by one ingest worker.
+
+    Numbers are handed out from the block without locking the course row. A block
+    whose owner stopped using it (e.g. the worker exited) is adopted by another
+    worker once it is stale, so no reserved numbers are lost.
+    """
+    course = models.ForeignKey(Course, related_name='veda_id_blocks', on_delete=models.CASCADE)
+    owner = models.CharField('Owner', max_length=100)
+    next_number = models.IntegerField('Next video number')
+    last_number = models.IntegerField('Last video number')
+
+    def __str__(self):
+        return '{course} - {next_number}:{last_number}'.format(
+            course=self.course.course_name,
+            next_number=self.next_number,
+            last_number=self.last_number,
+        )
+
+
+class InFlightEncode(TimeStampedModel):
+    """
+    Registry of encode jobs that are queued or running on the encode workers.
+
+    There is at most one registration per (veda_id, encode_profile), which makes
+    enqueueing an encode idempotent. A registration is cleared when the encode is
+    delivered and is considered stale once it is older than the registry ttl.
+
+    Encodes of fair share lanes are held in the registry, grouped by `share_key`, until
+    they are dispatched to the worker queue. The encode worker stamps `encode_started`
+    when it picks the job up.
+    """
+    veda_id = models.CharField('VEDA Video ID', max_length=50)
+    encode_profile = models.CharField('Encode profile', max_length=50)
+    job_id = models.CharField('Job id', max_length=50)
+    priority = models.CharField('Priority', max_length=20, default='heal')
+    update_val_status = models.BooleanField('Update VAL status', default=True)
+    share_key = models.CharField(
+        'Share key', max_length=255, blank=True, default='',
+        help_text='Institution or course the encode is dispatched for.'
+    )
+    held = models.BooleanField('Held for dispatch', default=False, db_index=True)
+    estimated_seconds = models.FloatField('Estimated encode seconds', null=True, blank=True)
+    encode_started = models.DateTimeField('Encode started', null=True, blank=True)
+
+    class Meta:
+        unique_together = ('veda_id', 'encode_profile')
+
+    @classmethod
+    def register(cls, veda_id, encode_profile, job_id, ttl, **job_fields):
+        """
+        Registers an encode job.
+
+        Arguments:
+            veda_id (str): VEDA video id
+            encode_profile (str): encode profile name
+            job_id (str): id of the job being enqueued
+            ttl (timedelta): time after which a registration is considered stale
+            job_fields: other fields of the registration, e.g. `held`
+
+        Returns:
+            True if the job was registered, False if the same encode is already in flight.
+        """
+        registration, created = cls.objects.get_or_create(
+            veda_id=veda_id,
+            encode_profile=encode_profile,
+            defaults=dict(job_fields, job_id=job_id)
+        )
+        if created:
+            return True
+
+        # Take over a stale registration; the conditional update lets only one caller win.
+        now = timezone.now()
+        return bool(cls.objects.filter(pk=registration.pk, modified__lt=now - ttl).update(
+            job_id=job_id, modified=now, encode_started=None, **job_fields
+        ))
+
+    @classmethod
+    def mark_started(cls, veda_id, encode_profile, job_id):
+        """
+        Records that an encode worker started the job, a job that was replaced meanwhile is ignored.
+        """
+        cls.objects.filter(veda_id=veda_id, encode_profile=encode_profile, job_id=job_id).update(
+            encode_started=timezone.now()
+        )
+
+    @classmethod
+    def release(cls, veda_id, encode_profile):
+        """
+        Clears the registration of an encode job.
+        """
+        cls.objects.filter(veda_id=veda_id, encode_profile=encode_profile).delete()
+
+    def __str__(self):
+        return '{veda_id} - {encode_profile}'.format(veda_id=self.veda_id, encode_profile=self.encode_profile)
+
+
+class SkippedEncode(TimeStampedModel):
+    """
+    Encodes a video does not get because its source is not eligible for the encode profile,
+    e.g. a desktop encode of a low resolution source. Skipped encodes count as complete.
+    """
+    video = models.ForeignKey(Video, related_name='skipped_encodes', on_delete=models.CASCADE)
+    encode_profile = models.CharField('Encode profile', max_length=50)
+    reason = models.CharField('Reason', max_length=255)
+
+    class Meta:
+        unique_together = ('video', 'encode_profile')
+
+    def __str__(self):
+        return '{video_id} - {encode_profile}'.format(video_id=self.video.edx_id, encode_profile=self.encode_profile)
+
+
+class HealWorkItem(TimeStampedModel):
+    """
+    An encode of a video that heal checks, see `VedaHeal.discovery`.
+
+    Items are added when an encode is enqueued and removed once it is delivered, skipped
+    or no longer needed. `next_check` backs off exponentially with the attempts and is
+    cleared when heal gives up on the encode; a change of the video status makes it due again.
+    """
+    video = models.ForeignKey(Video, related_name='heal_work_items', on_delete=models.CASCADE)
+    encode_profile = models.CharField('Encode profile', max_length=50)
+    attempts = models.PositiveIntegerField('Enqueue attempts', default=0)
+    next_check = models.DateTimeField('Next check', null=True, blank=True, db_index=True)
+
+    class Meta:
+        unique_together = ('video', 'encode_profile')
+
+    def __str__(self):
+        return '{video_id} - {encode_profile}'.format(video_id=self.video.edx_id, encode_profile=self.encode_profile)
+
+
 class EncodeVideosForHlsConfiguration(ConfigurationModel):
     """
     A configuration model for configuring `re_encode_videos_missing_hls` job.
@@ -768,12 +919,109 @@ class EncodeVideosForHlsConfiguration(ConfigurationModel):
         self.save()
         return self.command_run
 
-    def update_offset(self):
-        self.offset += self.batch_size
-        self.save()
-
     def __str__(self):
         return "[EncodeVideosForHlsConfiguration] update for {courses} courses if commit as {commit}".format(
             courses='ALL' if self.all_videos else self.course_ids,
             commit=self.commit,
         )
+
+
+class HlsBackfillCheckpoint(TimeStampedModel):
+    """
+    Progress of an HLS backfill run of the `re_encode_videos_missing_hls` job.
+
+    A checkpoint is kept per VAL offset the backfill was started from and is
+    advanced after every video, so an interrupted backfill resumes where it stopped.
+    """
+    start_offset = models.PositiveIntegerField('Start offset', unique=True)
+    position = models.PositiveIntegerField('Next VAL offset', default=0)
+    total = models.PositiveIntegerField('Videos missing HLS in VAL', default=0)
+    processed = models.PositiveIntegerField('Processed videos', default=0)
+    enqueued = models.PositiveIntegerField('Enqueued encodes', default=0)
+    val_updated = models.PositiveIntegerField('VAL profile updates', default=0)
+
+    class Meta:
+        get_latest_by = 'modified'
+
+    def __str__(self):
+        return '[HlsBackfillCheckpoint] offset {start_offset}: {position}/{total}'.format(
+            start_offset=self.start_offset,
+            position=self.position,
+            total=self.total,
+        )
+
+
+class ScheduledJob(TimeStampedModel):
+    """
+    Run state of a periodic job of the scheduler service, see `control.veda_scheduler`.
+
+    `running_since` is set while a run is in progress, so a job never runs twice at the
+    same time across scheduler processes.
+    """
+    name = models.CharField('Job name', max_length=50, unique=True)
+    running_since = models.DateTimeField('Running since', null=True, blank=True)
+    last_started = models.DateTimeField('Last run started', null=True, blank=True)
+    last_finished = models.DateTimeField('Last run finished', null=True, blank=True)
+    last_duration = models.FloatField('Last run duration (sec)', null=True, blank=True)
+    total_duration = models.FloatField('Total run duration (sec)', default=0)
+    runs = models.PositiveIntegerField('Runs', default=0)
+    failures = models.PositiveIntegerField('Failed runs', default=0)
+
+    def __str__(self):
+        return '[ScheduledJob] {name}: {runs} runs, {failures} failed'.format(
+            name=self.name,
+            runs=self.runs,
+            failures=self.failures,
+        )
+
+
+class VideoStatusTransition(models.Model):
+    """
+    Append-only log of the `Video.video_trans_status` transitions, written by
+    `VEDA_OS01.utils.set_video_trans_status`.
+    """
+    video = models.ForeignKey(Video, related_name='status_transitions', on_delete=models.CASCADE)
+    from_status = models.CharField('From status', max_length=100, blank=True, default='')
+    to_status = models.CharField('To status', max_length=100, choices=VideoStatus.CHOICES)
+    source = models.CharField('Source', max_length=50, help_text='Pipeline stage making the transition, e.g. heal.')
+    seconds_in_status = models.FloatField('Seconds in the previous status', null=True, blank=True)
+    created = models.DateTimeField('Transitioned', default=timezone.now)
+
+    class Meta:
+        get_latest_by = 'created'
+        indexes = [
+            models.Index(fields=['video', 'created'], name='transition_video_idx'),
+            # Latencies of the transitions out of a status.
+            models.Index(fields=['from_status', 'created'], name='transition_from_status_idx'),
+            models.Index(fields=['to_status', 'created'], name='transition_to_status_idx'),
+        ]
+
+    def __str__(self):
+        return '{video_id} : {from_status} -> {to_status}'.format(
+            video_id=self.video.edx_id,
+            from_status=self.from_status,
+            to_status=self.to_status,
+        )
+
+
+class VideoStatusSummary(models.Model):
+    """
+    Summary of the videos per transcode status, materialized periodically by
+    `VEDA_OS01.utils.summarize_video_trans_statuses`.
+    """
+    status = models.CharField('Transcode status', max_length=100, unique=True)
+    videos = models.PositiveIntegerField('Videos in the status', default=0)
+    stuck_videos = models.PositiveIntegerField('Videos in the status for too long', default=0)
+    oldest_change = models.DateTimeField('Oldest status change', null=True, blank=True)
+    transitions_in = models.PositiveIntegerField('Transitions into the status within the window', default=0)
+    p50_seconds = models.FloatField('Median seconds in the status', null=True, blank=True)
+    p90_seconds = models.FloatField('90th percentile seconds in the status', null=True, blank=True)
+    p99_seconds = models.FloatField('99th percentile seconds in the status', null=True, blank=True)
+    modified = models.DateTimeField('Summarized', auto_now=True)
+
+    def __str__(self):
+        return '[VideoStatusSummary] {status}: {videos} videos, {stuck_videos} stuck'.format(
+            status=self.status,
+            videos=self.videos,
+            stuck_videos=self.stuck_videos,
+        )
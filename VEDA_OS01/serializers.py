@@ -4,6 +4,7 @@
 from rest_framework import serializers
 
 from VEDA_OS01.models import Course, Video, URL, Encode
+from VEDA_OS01.utils import record_video_trans_status
 
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -90,10 +91,13 @@ class VideoSerializer(serializers.ModelSerializer):
         return [course_id.strip() for course_id in video.inst_class.local_storedir.split(',') if course_id]
 
     def create(self, validated_data):
-        return Video.objects.create(**validated_data)
+        video = Video.objects.create(**validated_data)
+        record_video_trans_status(video, '', 'api')
+        return video
 
     def update(self, instance, validated_data):
         """Might be able to pare this down"""
+        previous_status = instance.video_trans_status
         instance.inst_class = validated_data.get(
             'inst_class',
             instance.inst_class
@@ -171,6 +175,7 @@ class VideoSerializer(serializers.ModelSerializer):
             instance.preferred_languages
         )
         instance.save()
+        record_video_trans_status(instance, previous_status, 'api')
         return instance
 
 
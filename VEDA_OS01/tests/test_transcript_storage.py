@@ -0,0 +1,124 @@
+"""
+Transcript storage tests
+"""
+
+import json
+import shutil
+import tempfile
+
+import boto
+from boto.s3.connection import S3Connection
+from django.test import TestCase
+from mock import patch
+from moto import mock_s3_deprecated
+
+from VEDA.utils import get_config
+from VEDA_OS01 import transcripts
+from VEDA_OS01.transcript_storage import (LocalTranscriptStorage, S3TranscriptStorage, get_transcript_storage,
+                                          reset_transcript_storages)
+
+CONFIG_DATA = get_config('test_config.yaml')
+
+
+class LocalTranscriptStorageTests(TestCase):
+    """
+    Tests for `LocalTranscriptStorage`
+    """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.addCleanup(reset_transcript_storages)
+        self.storage = LocalTranscriptStorage(self.root, max_workers=3)
+
+    def test_save(self):
+        """
+        Verify that a transcript is written under the storage root.
+        """
+        name = self.storage.save('video-transcripts/abc.sjson', '{"text": []}')
+        self.assertEqual(name, 'video-transcripts/abc.sjson')
+        with open(self.storage.path(name)) as transcript_file:
+            self.assertEqual(transcript_file.read(), '{"text": []}')
+
+    def test_save_many(self):
+        """
+        Verify that a batch of transcripts is stored and the names come back in order.
+        """
+        files = [('video-transcripts/{}.sjson'.format(index), str(index)) for index in range(5)]
+        names = self.storage.save_many(files)
+        self.assertEqual(names, [name for name, __ in files])
+        for name, content in files:
+            with open(self.storage.path(name)) as transcript_file:
+                self.assertEqual(transcript_file.read(), content)
+
+    def test_upload_sjson_batch(self):
+        """
+        Verify that `upload_sjson_batch_to_s3` stores every transcript through the configured backend.
+        """
+        config = dict(CONFIG_DATA, transcript_storage_backend='local', transcript_storage_local_root=self.root)
+        sjson_list = [{'text': ['one']}, {'text': ['two']}]
+
+        edxval_names = transcripts.upload_sjson_batch_to_s3(config, sjson_list)
+
+        self.assertEqual(len(set(edxval_names)), 2)
+        storage = get_transcript_storage(config)
+        for edxval_name, sjson_data in zip(edxval_names, sjson_list):
+            with open(storage.path(config['instance_prefix'] + '/' + edxval_name)) as transcript_file:
+                self.assertEqual(json.load(transcript_file), sjson_data)
+
+
+class S3TranscriptStorageTests(TestCase):
+    """
+    Tests for `S3TranscriptStorage`
+    """
+    def setUp(self):
+        self.addCleanup(reset_transcript_storages)
+
+    def test_storage_is_reused(self):
+        """
+        Verify that the same storage instance is handed out for the same configuration.
+        """
+        self.assertIs(get_transcript_storage(CONFIG_DATA), get_transcript_storage(CONFIG_DATA))
+        self.assertIsInstance(get_transcript_storage(CONFIG_DATA), S3TranscriptStorage)
+
+    def test_unknown_backend(self):
+        """
+        Verify that an unknown backend is reported.
+        """
+        with self.assertRaises(ValueError):
+            get_transcript_storage(dict(CONFIG_DATA, transcript_storage_backend='ftp'))
+
+    @mock_s3_deprecated
+    def test_save_many_reuses_connections(self):
+        """
+        Verify that batches are uploaded by the same threads over the same connections.
+        """
+        S3Connection().create_bucket(CONFIG_DATA['aws_video_transcripts_bucket'])
+        storage = S3TranscriptStorage(CONFIG_DATA['aws_video_transcripts_bucket'], max_workers=2)
+        self.addCleanup(storage.close)
+
+        with patch('boto.connect_s3', wraps=boto.connect_s3) as mock_connect:
+            for batch in range(3):
+                storage.save_many([
+                    ('{}-{}.sjson'.format(batch, index), '{"a": 1}') for index in range(4)
+                ])
+
+        self.assertLessEqual(mock_connect.call_count, storage.max_workers)
+
+    @mock_s3_deprecated
+    def test_save_many(self):
+        """
+        Verify that transcripts are uploaded as public objects without a separate ACL request.
+        """
+        connection = S3Connection()
+        bucket = connection.create_bucket(CONFIG_DATA['aws_video_transcripts_bucket'])
+        storage = S3TranscriptStorage(CONFIG_DATA['aws_video_transcripts_bucket'], max_workers=2)
+
+        with patch('boto.s3.key.Key.set_acl') as mock_set_acl:
+            storage.save_many([('a.sjson', '{"a": 1}'), ('b.sjson', '{"b": 2}')])
+            self.assertFalse(mock_set_acl.called)
+
+        for name, expected in (('a.sjson', {'a': 1}), ('b.sjson', {'b': 2})):
+            key = bucket.get_key(name)
+            self.assertEqual(json.loads(key.get_contents_as_string()), expected)
+            grants = key.get_acl().acl.grants
+            self.assertTrue(any(grant.permission == 'READ' and grant.uri for grant in grants))
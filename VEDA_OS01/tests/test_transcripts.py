@@ -4,6 +4,7 @@ Transcript tests
 """
 
 import json
+import requests
 import responses
 import six.moves.urllib.error
 import six.moves.urllib.request
@@ -13,6 +14,7 @@ from boto.exception import S3ResponseError
 from boto.s3.connection import S3Connection
 from boto.s3.key import Key
 from ddt import data, ddt, unpack
+from django.core.cache import cache
 from django.urls import reverse
 from mock import Mock, PropertyMock, patch
 from moto import mock_s3_deprecated
@@ -24,6 +26,7 @@ from VEDA_OS01 import transcripts, utils
 from VEDA_OS01.models import (Course, TranscriptCredentials,
                               TranscriptProcessMetadata, TranscriptProvider,
                               TranscriptStatus, Video)
+from VEDA_OS01.transcript_storage import reset_transcript_storages
 import six
 
 CONFIG_DATA = get_config('test_config.yaml')
@@ -101,6 +104,8 @@ class Cielo24TranscriptTests(APITestCase):
         Tests setup.
         """
         super(Cielo24TranscriptTests, self).setUp()
+        # Storage connections must not outlive the S3 mock of a single test.
+        self.addCleanup(reset_transcript_storages)
         self.url = reverse('cielo24_transcript_completed', args=[CONFIG_DATA['transcript_provider_request_token']])
         self.uuid_hex = '01234567890123456789'
         self.course = Course.objects.create(
@@ -337,6 +342,10 @@ class ThreePlayTranscriptionCallbackTest(APITestCase):
         Tests setup.
         """
         super(ThreePlayTranscriptionCallbackTest, self).setUp()
+        # Storage connections must not outlive the S3 mock of a single test.
+        self.addCleanup(reset_transcript_storages)
+        # 3Play catalogs must not outlive a single test.
+        cache.clear()
 
         self.org = u'MAx'
         self.file_id = u'112233'
@@ -773,6 +782,7 @@ class ThreePlayTranscriptionCallbackTest(APITestCase):
     )
     @unpack
     @responses.activate
+    @mock_s3_deprecated
     @patch('VEDA_OS01.transcripts.LOGGER')
     def test_fetch_transcript_exceptions(self, response, log_method, log_args, mock_logger):
         """
@@ -1038,6 +1048,91 @@ class ThreePlayTranscriptionCallbackTest(APITestCase):
             TranscriptStatus.FAILED,
         )
 
+    @responses.activate
+    def test_order_translations_concurrently(self):
+        """
+        Tests that the orders of all the target languages are placed and recorded in one bulk update,
+        including when an order fails to be sent.
+        """
+        target_languages = ['ro', 'ur', 'fr', 'de']
+        for lang_code in target_languages:
+            TranscriptProcessMetadata.objects.create(
+                video=self.video,
+                process_id=self.file_id,
+                lang_code=lang_code,
+                provider=TranscriptProvider.THREE_PLAY,
+                status=TranscriptStatus.PENDING,
+            )
+
+        responses.add(
+            responses.GET,
+            transcripts.THREE_PLAY_TRANSLATION_SERVICES_URL,
+            body=json.dumps([
+                {'id': service_id, 'source_language_iso_639_1_code': 'en', 'target_language_iso_639_1_code': lang_code,
+                 'service_level': 'standard'}
+                for service_id, lang_code in enumerate(['ro', 'ur', 'de'])
+            ]),
+            status=200
+        )
+
+        def order_callback(request):
+            service_id = json.loads(request.body)['translation_service_id']
+            if service_id == 2:
+                return 400, {}, 'Bad request'
+            if service_id == 1:
+                raise requests.ConnectionError('Connection reset by peer')
+            return 200, {}, json.dumps({'success': True, 'translation_id': 'translation-{}'.format(service_id)})
+
+        responses.add_callback(
+            responses.POST,
+            transcripts.THREE_PLAY_ORDER_TRANSLATION_URL.format(file_id=self.file_id),
+            callback=order_callback,
+        )
+
+        # Processes are loaded once and updated in bulk, not queried and saved per language.
+        with self.assertNumQueries(2):
+            transcripts.order_translations(
+                self.file_id, 'insecure_api_key', 'insecure_api_secret', 'en', target_languages
+            )
+
+        processes = {
+            process.lang_code: (process.status, process.translation_id)
+            for process in TranscriptProcessMetadata.objects.filter(lang_code__in=target_languages)
+        }
+        self.assertEqual(processes, {
+            'ro': (TranscriptStatus.IN_PROGRESS, 'translation-0'),
+            'ur': (TranscriptStatus.FAILED, None),
+            'fr': (TranscriptStatus.FAILED, None),
+            'de': (TranscriptStatus.FAILED, None),
+        })
+
+    @responses.activate
+    def test_standard_translation_services_cached(self):
+        """
+        Tests that the standard translation services are fetched once and mapped by language pair.
+        """
+        responses.add(
+            responses.GET,
+            transcripts.THREE_PLAY_TRANSLATION_SERVICES_URL,
+            body=json.dumps([
+                {'id': 1, 'source_language_iso_639_1_code': 'en', 'target_language_iso_639_1_code': 'ro',
+                 'service_level': 'premium'},
+                {'id': 2, 'source_language_iso_639_1_code': 'en', 'target_language_iso_639_1_code': 'ro',
+                 'service_level': 'standard'},
+                {'id': 3, 'source_language_iso_639_1_code': 'en', 'target_language_iso_639_1_code': 'ur',
+                 'service_level': 'standard'},
+            ]),
+            status=200
+        )
+
+        for __ in range(2):
+            services = transcripts.get_standard_translation_services('insecure_api_key')
+            self.assertEqual(transcripts.get_standard_translation_service(services, 'en', 'ro'), 2)
+            self.assertEqual(transcripts.get_standard_translation_service(services, 'en', 'ur'), 3)
+            self.assertIsNone(transcripts.get_standard_translation_service(services, 'ur', 'en'))
+
+        self.assertEqual(len(responses.calls), 1)
+
     @responses.activate
     @mock_s3_deprecated
     @patch('control.veda_val.OAuthAPIClient.request')
@@ -1337,6 +1432,62 @@ class ThreePlayTranscriptionCallbackTest(APITestCase):
             'es',
         )
 
+    @responses.activate
+    @patch('VEDA_OS01.transcripts.LOGGER', Mock())
+    @patch('VEDA_OS01.transcripts.upload_sjson_batch_to_s3', Mock(side_effect=ValueError))
+    @patch('control.veda_val.OAuthAPIClient.request')
+    def test_translations_retrieval_failed_upload(self, mock_client):
+        """
+        Test that the translations of a failed batch upload are marked failed instead of ready.
+        """
+        translations_lang_map = {
+            'ro': '1z2x3c',
+            'da': '1q2w3e',
+        }
+        self.setup_translations_prereqs(
+            file_id=self.file_id,
+            translation_lang_map=translations_lang_map,
+            preferred_languages=['en', 'ro', 'da']
+        )
+        translation_status_mock_response = []
+        for target_language, translation_id in six.iteritems(translations_lang_map):
+            translation_status_mock_response.append({
+                'id': translation_id,
+                'source_language_iso_639_1_code': 'en',
+                'target_language_iso_639_1_code': target_language,
+                'state': 'complete'
+            })
+            responses.add(
+                responses.GET,
+                transcripts.THREE_PLAY_TRANSLATION_DOWNLOAD_URL.format(
+                    file_id=self.file_id, translation_id=translation_id
+                ),
+                body=TRANSCRIPT_SRT_DATA,
+                content_type='text/plain; charset=utf-8',
+                status=200,
+            )
+        responses.add(
+            responses.GET,
+            transcripts.THREE_PLAY_TRANSLATIONS_METADATA_URL.format(file_id=self.file_id),
+            json.dumps(translation_status_mock_response),
+            status=200
+        )
+
+        with self.assertRaises(ValueError):
+            transcripts.retrieve_three_play_translations()
+
+        self.assertFalse(mock_client.called)
+        for lang_code, translation_id in six.iteritems(translations_lang_map):
+            self.assertEqual(
+                TranscriptProcessMetadata.objects.get(
+                    provider=TranscriptProvider.THREE_PLAY,
+                    process_id=self.file_id,
+                    lang_code=lang_code,
+                    translation_id=translation_id,
+                ).status,
+                TranscriptStatus.FAILED,
+            )
+
     @patch('VEDA_OS01.transcripts.LOGGER')
     def test_translations_retrieval_with_zero_translation_process(self, mock_logger):
         """
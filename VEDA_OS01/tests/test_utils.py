@@ -2,15 +2,19 @@
 Tests common utils
 """
 
+import datetime
+import time
 from unittest import TestCase
 
 from ddt import data, ddt, unpack
 from django.conf import settings
+from django.test import TestCase as DjangoTestCase
 from django.test import override_settings, TransactionTestCase
-from mock import MagicMock, Mock
+from django.utils import timezone
+from mock import MagicMock, Mock, patch
 
 from VEDA_OS01 import utils
-from VEDA_OS01.models import TranscriptCredentials
+from VEDA_OS01.models import SkippedEncode, TranscriptCredentials, Video, VideoStatusSummary, VideoStatusTransition
 from VEDA_OS01.tests.factories import CourseFactory, DestinationFactory, EncodeFactory, VideoFactory, UrlFactory
 from VEDA_OS01.utils import get_incomplete_encodes, is_video_ready
 
@@ -120,6 +124,14 @@ class EncodeUtilsTest(TransactionTestCase):
         self.assertEqual(get_incomplete_encodes(self.video2.edx_id), ['audio_mp3'])
         self.assertEqual(get_incomplete_encodes(self.video3.edx_id), ['review'])
 
+    def test_get_incomplete_encodes_skipped(self):
+        """
+        Tests that `get_incomplete_encodes` counts skipped encodes as complete.
+        """
+        SkippedEncode.objects.create(video=self.video2, encode_profile='audio_mp3', reason='no audio')
+        self.assertEqual(get_incomplete_encodes(self.video2.edx_id), [])
+        self.assertTrue(is_video_ready(self.video2.edx_id))
+
     def test_is_video_ready(self):
         """
         Tests that `is_video_ready` works as expected.
@@ -128,3 +140,146 @@ class EncodeUtilsTest(TransactionTestCase):
         self.assertFalse(is_video_ready(self.video2.edx_id))
         self.assertTrue(is_video_ready(self.video2.edx_id, ignore_encodes=['audio_mp3']))
         self.assertTrue(is_video_ready(self.video3.edx_id, ignore_encodes=['review', 'abc_encode']))
+
+
+class TranscriptSecretsTest(TransactionTestCase):
+    """
+    Tests for the decrypted transcript credentials cache
+    """
+    def setUp(self):
+        # Start with the FERNET KEYS from tests.py and no cached secrets.
+        utils.invalidate_fernet_cached_properties(TranscriptCredentials, ['api_key', 'api_secret'])
+        self.credentials = TranscriptCredentials.objects.create(
+            org='MAx', provider='3PlayMedia', api_key='test-key', api_secret='test-secret'
+        )
+
+    def test_secrets_cached(self):
+        """
+        Verify that secrets are fetched and decrypted once.
+        """
+        self.assertEqual(utils.get_transcript_secrets('MAx', '3PlayMedia'), ('test-key', 'test-secret'))
+        with self.assertNumQueries(0):
+            secrets = utils.get_transcript_secrets('MAx', '3PlayMedia')
+            self.assertTrue(utils.has_transcript_credentials('MAx', '3PlayMedia'))
+
+        self.assertEqual(secrets.api_key, 'test-key')
+        self.assertEqual(secrets.api_secret, 'test-secret')
+
+    def test_missing_credentials_cached(self):
+        """
+        Verify that missing credentials are cached as well.
+        """
+        self.assertFalse(utils.has_transcript_credentials('MAx', 'Cielo24'))
+        with self.assertNumQueries(0):
+            self.assertFalse(utils.has_transcript_credentials('MAx', 'Cielo24'))
+            with self.assertRaises(TranscriptCredentials.DoesNotExist):
+                utils.get_transcript_secrets('MAx', 'Cielo24')
+
+    def test_invalidated_on_save(self):
+        """
+        Verify that secrets are fetched again once credentials are saved or deleted.
+        """
+        utils.get_transcript_secrets('MAx', '3PlayMedia')
+        self.credentials.api_key = 'new-key'
+        self.credentials.save()
+        self.assertEqual(utils.get_transcript_secrets('MAx', '3PlayMedia').api_key, 'new-key')
+
+        self.credentials.delete()
+        self.assertFalse(utils.has_transcript_credentials('MAx', '3PlayMedia'))
+
+    def test_invalidated_with_fernet_keys(self):
+        """
+        Verify that invalidating the fernet keys drops the secrets decrypted with them.
+        """
+        utils.get_transcript_secrets('MAx', '3PlayMedia')
+        utils.invalidate_fernet_cached_properties(TranscriptCredentials, ['api_key', 'api_secret'])
+        with self.assertNumQueries(1):
+            utils.get_transcript_secrets('MAx', '3PlayMedia')
+
+    def test_expired(self):
+        """
+        Verify that secrets are fetched again after the timeout, e.g. when changed by another process.
+        """
+        utils.get_transcript_secrets('MAx', '3PlayMedia')
+        # Updating the queryset sends no signals, like a change made by another process.
+        TranscriptCredentials.objects.filter(pk=self.credentials.pk).update(api_key='new-key')
+        self.assertEqual(utils.get_transcript_secrets('MAx', '3PlayMedia').api_key, 'test-key')
+
+        with patch('VEDA_OS01.utils.time.time', return_value=time.time() + utils.TRANSCRIPT_CREDENTIALS_CACHE_TIMEOUT):
+            self.assertEqual(utils.get_transcript_secrets('MAx', '3PlayMedia').api_key, 'new-key')
+
+
+class VideoStatusTransitionTest(DjangoTestCase):
+    """
+    Tests for the video transcode status transitions.
+    """
+    def setUp(self):
+        self.video = VideoFactory(video_trans_status='Ingest')
+        utils.record_video_trans_status(self.video, '', 'ingest')
+
+    def set_status(self, status, hours_ago=0):
+        """
+        Transition the video to a status some hours ago.
+        """
+        changed = timezone.now() - datetime.timedelta(hours=hours_ago)
+        with patch('VEDA_OS01.utils.timezone.now', return_value=changed):
+            return utils.set_video_trans_status(Video.objects.filter(pk=self.video.pk), status, 'heal')
+
+    def test_transitions(self):
+        """
+        Verify that transitions are logged with the time spent in the previous status, and repeats are not.
+        """
+        self.assertEqual(self.set_status('Queue', hours_ago=2), 1)
+        self.assertEqual(self.set_status('Queue', hours_ago=1), 0)
+        self.assertEqual(self.set_status('Complete'), 1)
+
+        transitions = list(VideoStatusTransition.objects.filter(video=self.video).order_by('pk').values_list(
+            'from_status', 'to_status', 'source'
+        ))
+        self.assertEqual(transitions, [
+            ('', 'Ingest', 'ingest'),
+            ('Ingest', 'Queue', 'heal'),
+            ('Queue', 'Complete', 'heal'),
+        ])
+        self.assertAlmostEqual(VideoStatusTransition.objects.latest().seconds_in_status, 2 * 60 * 60, delta=60)
+
+    def test_stuck_videos(self):
+        """
+        Verify that videos in a status for too long are reported as stuck.
+        """
+        other_video = VideoFactory(video_trans_status='Ingest')
+        self.set_status('Queue', hours_ago=7)
+
+        self.assertEqual(list(utils.get_stuck_videos('Queue')), [self.video])
+        self.assertEqual(list(utils.get_stuck_videos('Queue', datetime.timedelta(hours=8))), [])
+        self.assertNotIn(other_video, utils.get_stuck_videos('Ingest'))
+
+    def test_summary(self):
+        """
+        Verify that the summary has the videos, stuck videos and latency percentiles per status.
+        """
+        self.set_status('Queue', hours_ago=7)
+        for hours_ago in (5, 3):
+            video = VideoFactory(video_trans_status='Ingest')
+            utils.record_video_trans_status(video, '', 'ingest')
+            utils.set_video_trans_status(Video.objects.filter(pk=video.pk), 'Queue', 'heal')
+            VideoStatusTransition.objects.filter(video=video, to_status='Queue').update(
+                seconds_in_status=hours_ago * 60 * 60
+            )
+
+        self.assertEqual(utils.summarize_video_trans_statuses(), 2)
+
+        queue = VideoStatusSummary.objects.get(status='Queue')
+        self.assertEqual((queue.videos, queue.stuck_videos, queue.transitions_in), (3, 1, 3))
+        ingest = VideoStatusSummary.objects.get(status='Ingest')
+        self.assertEqual((ingest.videos, ingest.transitions_in), (0, 3))
+        self.assertEqual((ingest.p50_seconds, ingest.p99_seconds), (3 * 60 * 60, 5 * 60 * 60))
+
+    def test_percentile(self):
+        """
+        Verify the nearest-rank percentiles.
+        """
+        self.assertIsNone(utils.percentile([], 0.5))
+        self.assertEqual(utils.percentile([1, 2, 3, 4], 0.5), 2)
+        self.assertEqual(utils.percentile(list(range(1, 101)), 0.99), 99)
+        self.assertEqual(utils.percentile([1], 0.99), 1)
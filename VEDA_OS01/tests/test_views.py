@@ -14,6 +14,8 @@ from rest_framework.test import APITestCase
 from VEDA_OS01.enums import TranscriptionProviderErrorType
 from VEDA_OS01.models import TranscriptCredentials, TranscriptProvider
 from VEDA_OS01.views import CIELO24_LOGIN_URL
+from control.http_ingest_celeryapp import auth_dict as INGEST_CONFIG
+from control.http_ingest_celeryapp import enqueue_ingests
 
 
 @ddt
@@ -246,3 +248,72 @@ class HeartbeatTests(APITestCase):
         response = self.client.get(reverse('heartbeat'))
         assert response.status_code == 500
         assert json.loads(response.content) == {'OK': False}
+
+
+@ddt
+class IngestFromS3ViewTests(APITestCase):
+    """
+    Tests for the SNS ingest endpoint.
+    """
+    def setUp(self):
+        super(IngestFromS3ViewTests, self).setUp()
+        self.url = reverse('ingest_from_s3')
+
+    def post_notification(self, records):
+        """
+        Post an SNS notification carrying the given S3 event records.
+        """
+        return self.client.post(
+            self.url,
+            data=json.dumps({'Type': 'Notification', 'Message': json.dumps({'Records': records})}),
+            content_type='text/plain',
+            HTTP_X_AMZ_SNS_MESSAGE_TYPE='Notification'
+        )
+
+    @patch('VEDA_OS01.views.enqueue_ingests')
+    def test_multiple_records(self, mock_enqueue_ingests):
+        """
+        Verify that every valid record is enqueued once, in a single call.
+        """
+        records = [
+            {'s3': {'object': {'key': 'prod-edx/unprocessed/video1'}}},
+            {'s3': {'object': {'key': 'prod-edx/unprocessed/video2'}}},
+            {'s3': {'object': {'key': 'prod-edx/unprocessed/video1'}}},
+            {'s3': {'object': {}}},
+            'invalid',
+        ]
+        response = self.post_notification(records)
+
+        self.assertEqual(response.status_code, 200)
+        mock_enqueue_ingests.assert_called_once_with(['prod-edx/unprocessed/video1', 'prod-edx/unprocessed/video2'])
+
+    @data(
+        [],
+        [{'s3': {'object': {'key': ''}}}],
+        [{'eventName': 'ObjectCreated:Put'}],
+    )
+    @patch('VEDA_OS01.views.enqueue_ingests')
+    def test_no_valid_records(self, records, mock_enqueue_ingests):
+        """
+        Verify that a notification without any S3 key is rejected.
+        """
+        response = self.post_notification(records)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'Reason': 'Video does not contain s3 key'})
+        self.assertFalse(mock_enqueue_ingests.called)
+
+    @patch('control.http_ingest_celeryapp.group')
+    def test_enqueue_ingests(self, mock_group):
+        """
+        Verify that the ingest tasks are sent as one group on the ingest queue.
+        """
+        enqueue_ingests(['video1', 'video2'])
+
+        signatures = list(mock_group.call_args[0][0])
+        self.assertEqual([signature.args for signature in signatures], [('video1',), ('video2',)])
+        self.assertEqual(
+            set(signature.options['queue'] for signature in signatures),
+            {INGEST_CONFIG['celery_http_ingest_queue']}
+        )
+        mock_group.return_value.apply_async.assert_called_once_with()
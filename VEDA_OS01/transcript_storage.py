@@ -0,0 +1,195 @@
+"""
+Transcript storage backends.
+
+Transcripts are stored as sjson files. `S3TranscriptStorage` is used in the
+deployed pipeline, `LocalTranscriptStorage` writes to a local directory and is
+meant for tests and benchmarks.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto
+from boto.s3.key import Key
+
+LOGGER = logging.getLogger(__name__)
+
+# Default number of transcripts uploaded concurrently in a batch.
+DEFAULT_UPLOAD_WORKERS = 4
+
+S3_BACKEND = 's3'
+LOCAL_BACKEND = 'local'
+
+# Storage instances are kept per process so that their connections are reused.
+_STORAGES = {}
+_STORAGES_LOCK = threading.Lock()
+
+
+class TranscriptStorage(object):
+    """
+    Base class for transcript storage backends.
+    """
+    content_type = 'application/json'
+
+    def __init__(self, max_workers=DEFAULT_UPLOAD_WORKERS):
+        self.max_workers = max(1, int(max_workers))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """
+        Returns the upload thread pool, kept for the lifetime of the storage so
+        that its threads and their connections are reused across batches.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def close(self):
+        """
+        Shuts down the upload thread pool.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def save(self, name, content):
+        """
+        Store a single transcript.
+
+        Arguments:
+            name (str): storage path of the transcript
+            content (str): serialized transcript content
+
+        Returns:
+            name of the stored transcript
+        """
+        raise NotImplementedError
+
+    def save_many(self, files):
+        """
+        Store several transcripts concurrently.
+
+        Arguments:
+            files (list): list of (name, content) tuples
+
+        Returns:
+            list of stored names, in the same order as `files`
+        """
+        if len(files) <= 1 or self.max_workers == 1:
+            return [self.save(name, content) for name, content in files]
+
+        return list(self.executor.map(lambda item: self.save(*item), files))
+
+
+class S3TranscriptStorage(TranscriptStorage):
+    """
+    Stores transcripts in an S3 bucket as publicly readable objects.
+
+    The bucket handle (and its underlying connection pool) is created once per
+    upload thread and reused for every subsequent upload.
+    """
+    def __init__(self, bucket_name, **kwargs):
+        super(S3TranscriptStorage, self).__init__(**kwargs)
+        self.bucket_name = bucket_name
+        self._local = threading.local()
+
+    @property
+    def bucket(self):
+        """
+        Returns the bucket handle for the current thread.
+        """
+        bucket = getattr(self._local, 'bucket', None)
+        if bucket is None:
+            # Skip bucket validation, it costs an extra request and a missing
+            # bucket surfaces as an `S3ResponseError` on upload anyway.
+            bucket = boto.connect_s3().get_bucket(self.bucket_name, validate=False)
+            self._local.bucket = bucket
+        return bucket
+
+    def save(self, name, content):
+        key = Key(self.bucket, name)
+        key.content_type = self.content_type
+        # Setting the canned ACL with the upload avoids a separate `set_acl` request.
+        key.set_contents_from_string(content, policy='public-read')
+        return name
+
+
+class LocalTranscriptStorage(TranscriptStorage):
+    """
+    Stores transcripts on the local filesystem.
+    """
+    def __init__(self, root, **kwargs):
+        super(LocalTranscriptStorage, self).__init__(**kwargs)
+        self.root = root
+
+    def path(self, name):
+        """
+        Returns the absolute path of a stored transcript.
+        """
+        return os.path.join(self.root, name.lstrip('/'))
+
+    def save(self, name, content):
+        file_path = self.path(name)
+        directory = os.path.dirname(file_path)
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(file_path, mode) as transcript_file:
+            transcript_file.write(content)
+
+        return name
+
+
+def get_transcript_storage(config):
+    """
+    Returns the transcript storage configured for this instance.
+
+    Arguments:
+        config (dict): instance configuration
+
+    Config:
+        transcript_storage_backend: 's3' (default) or 'local'
+        transcript_storage_local_root: directory used by the 'local' backend
+        transcript_upload_workers: number of concurrent uploads in a batch
+    """
+    backend = config.get('transcript_storage_backend') or S3_BACKEND
+    max_workers = config.get('transcript_upload_workers') or DEFAULT_UPLOAD_WORKERS
+
+    if backend == S3_BACKEND:
+        location = config['aws_video_transcripts_bucket']
+        storage_class = S3TranscriptStorage
+    elif backend == LOCAL_BACKEND:
+        location = config['transcript_storage_local_root']
+        storage_class = LocalTranscriptStorage
+    else:
+        raise ValueError(u'Unknown transcript storage backend "{}".'.format(backend))
+
+    cache_key = (backend, location, max_workers)
+    with _STORAGES_LOCK:
+        storage = _STORAGES.get(cache_key)
+        if storage is None:
+            storage = storage_class(location, max_workers=max_workers)
+            _STORAGES[cache_key] = storage
+
+    return storage
+
+
+def reset_transcript_storages():
+    """
+    Drops the cached storage instances along with their connections.
+    """
+    with _STORAGES_LOCK:
+        storages = list(_STORAGES.values())
+        _STORAGES.clear()
+    for storage in storages:
+        storage.close()
@@ -5,13 +5,14 @@ Transcript handlers.
 import json
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-import boto
 import django.dispatch
 import requests
+import six
 import urllib3
-from boto.s3.key import Key
 from django.db.models import Q
+from django.utils import timezone
 from pysrt import SubRipFile
 from rest_framework import status
 from rest_framework.parsers import FormParser
@@ -24,6 +25,7 @@ from VEDA.utils import get_config, build_url, scrub_query_params
 from VEDA_OS01 import utils
 from VEDA_OS01.models import (TranscriptCredentials, TranscriptProcessMetadata,
                               TranscriptProvider, TranscriptStatus, Video)
+from VEDA_OS01.transcript_storage import get_transcript_storage
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -74,6 +76,8 @@ THREE_PLAY_TRANSLATION_DOWNLOAD_URL = build_url(
     CONFIG['three_play_api_transcript_url'],
     'files/{file_id}/translations/{translation_id}/captions.srt'
 )
+# Translation orders placed at once for a file.
+THREE_PLAY_MAX_CONCURRENT_ORDERS = 5
 
 
 class TranscriptError(Exception):
@@ -184,10 +188,7 @@ def cielo24_transcript_callback(sender, **kwargs):
 
     # get transcript credentials for an organization
     try:
-        transcript_prefs = TranscriptCredentials.objects.get(
-            org=org,
-            provider=TranscriptProvider.CIELO24,
-        )
+        transcript_prefs = utils.get_transcript_secrets(org, TranscriptProvider.CIELO24)
     except TranscriptCredentials.DoesNotExist:
         LOGGER.exception('[CIELO24 TRANSCRIPTS] Unable to get transcript credentials for job_id=%s', job_id)
 
@@ -349,19 +350,33 @@ def upload_sjson_to_s3(config, sjson_data):
     Returns:
         transcript name for 'edxval'
     """
-    s3_conn = boto.connect_s3()
-    bucket = s3_conn.get_bucket(config['aws_video_transcripts_bucket'])
-    k = Key(bucket)
-    k.content_type = 'application/json'
+    return upload_sjson_batch_to_s3(config, [sjson_data])[0]
+
+
+def upload_sjson_batch_to_s3(config, sjson_data_list):
+    """
+    Upload several sjson transcripts concurrently to the configured transcript storage.
 
-    transcript_name_without_instance_prefix, transcript_name_with_instance_prefix = construct_transcript_names(config)
+    Arguments:
+        config (dict): instance configuration
+        sjson_data_list (list): transcripts data to be uploaded to `s3`
+
+    Returns:
+        list of transcript names for 'edxval', in the same order as `sjson_data_list`
+    """
+    storage = get_transcript_storage(config)
 
-    k.key = '{}.sjson'.format(transcript_name_with_instance_prefix)
-    k.set_contents_from_string(json.dumps(sjson_data))
-    k.set_acl('public-read')
+    files, edxval_names = [], []
+    for sjson_data in sjson_data_list:
+        transcript_name_without_instance_prefix, transcript_name_with_instance_prefix = construct_transcript_names(
+            config
+        )
+        files.append(('{}.sjson'.format(transcript_name_with_instance_prefix), json.dumps(sjson_data)))
+        # transcript path is stored in edxval without `instance_prefix`
+        edxval_names.append('{}.sjson'.format(transcript_name_without_instance_prefix))
 
-    # transcript path is stored in edxval without `instance_prefix`
-    return '{}.sjson'.format(transcript_name_without_instance_prefix)
+    storage.save_many(files)
+    return edxval_names
 
 
 class ThreePlayMediaCallbackHandlerView(APIView):
@@ -436,29 +451,41 @@ def get_translation_services(api_key):
     return available_services
 
 
+def get_standard_translation_services(api_key):
+    """
+    GET standard 3Play Media Translation services, cached per api key
+
+    Arguments:
+        api_key(unicode): api key which is required to make an authentic call to 3Play Media
+
+    Returns:
+        Standard translation service ids by (source language code, target language code).
+    """
+    def build_standard_services():
+        standard_services = {}
+        for service in get_translation_services(api_key):
+            if service['service_level'] == 'standard':
+                standard_services.setdefault(
+                    (service['source_language_iso_639_1_code'], service['target_language_iso_639_1_code']),
+                    service['id']
+                )
+        return standard_services
+
+    return utils.get_three_play_catalog('translation_services', api_key, build_standard_services)
+
+
 def get_standard_translation_service(translation_services, source_language, target_language):
     """
     Get standard translation service
     Arguments:
-         translation_services(list): List of available 3play media translation services.
+         translation_services(dict): standard 3play media translation services by (source, target) language.
          source_language(unicode): A language code for video source/speech language.
          target_language(unicode): A language code whose standard translation service is needed.
 
     Returns:
         A translation service id or None.
     """
-    translation_service_id = None
-    for service in translation_services:
-        service_found = (
-            service['source_language_iso_639_1_code'] == source_language and
-            service['target_language_iso_639_1_code'] == target_language and
-            service['service_level'] == 'standard'
-        )
-        if service_found:
-            translation_service_id = service['id']
-            break
-
-    return translation_service_id
+    return translation_services.get((source_language, target_language))
 
 
 def place_translation_order(api_key, api_secret, translation_service_id, target_language, file_id):
@@ -536,17 +563,23 @@ def order_translations(file_id, api_key, api_secret, source_language, target_lan
 
     # Retrieve available translation services.
     try:
-        available_services = get_translation_services(api_key)
+        available_services = get_standard_translation_services(api_key)
     except TranscriptTranslationError:
         # Fail all the pending translation processes associated with this file id.
         translation_processes.update(status=TranscriptStatus.FAILED)
         raise
 
+    # Latest pending process per target language, loaded at once.
+    pending_processes = {}
+    for translation_process in translation_processes.order_by('modified'):
+        pending_processes[translation_process.lang_code] = translation_process
+
+    orders = []
+    failed_processes = []
     for target_language in target_languages:
         # 1 - get a translation process for the target language
-        try:
-            translation_process = translation_processes.filter(lang_code=target_language).latest()
-        except TranscriptProcessMetadata.DoesNotExist:
+        translation_process = pending_processes.get(target_language)
+        if translation_process is None:
             LOGGER.warning(
                 u'[3PlayMedia Callback] process not found for target language %s -- process id %s',
                 target_language,
@@ -558,7 +591,7 @@ def order_translations(file_id, api_key, api_secret, source_language, target_lan
         translation_service_id = get_standard_translation_service(available_services, source_language, target_language)
         if translation_service_id is None:
             # Fail the process
-            translation_process.update(status=TranscriptStatus.FAILED)
+            failed_processes.append(translation_process)
             LOGGER.error(
                 u'[3PlayMedia Callback] No translation service found for source language "%s" '
                 u'target language "%s" -- process id %s',
@@ -568,22 +601,56 @@ def order_translations(file_id, api_key, api_secret, source_language, target_lan
             )
             continue
 
-        # 3 - Place an order
-        # At this point, we've got our service ready to use. Now, place an order for the translation.
-        translation_order = place_translation_order(
-            api_key=api_key,
-            api_secret=api_secret,
-            translation_service_id=translation_service_id,
-            target_language=target_language,
-            file_id=file_id,
-        )
-        if translation_order:
-            translation_process.update(
-                translation_id=translation_order['translation_id'],
-                status=TranscriptStatus.IN_PROGRESS
+        orders.append((translation_process, translation_service_id))
+
+    def place_order(order):
+        translation_process, translation_service_id = order
+        try:
+            return place_translation_order(
+                api_key=api_key,
+                api_secret=api_secret,
+                translation_service_id=translation_service_id,
+                target_language=translation_process.lang_code,
+                file_id=file_id,
+            )
+        except Exception:  # pylint: disable=broad-except
+            # A failed order must not keep the orders already placed from being recorded.
+            LOGGER.exception(
+                u'[3PlayMedia Callback] Translation order failed for target language=%s, file_id=%s',
+                translation_process.lang_code,
+                file_id,
             )
+            return None
+
+    # 3 - Place the orders
+    # At this point, we've got our services ready to use. Now, place the orders for the translations.
+    if orders:
+        with ThreadPoolExecutor(max_workers=min(len(orders), THREE_PLAY_MAX_CONCURRENT_ORDERS)) as executor:
+            translation_orders = list(executor.map(place_order, orders))
+    else:
+        translation_orders = []
+
+    # 4 - Record the outcome of every process in one bulk update.
+    ordered_processes = []
+    for (translation_process, __), translation_order in zip(orders, translation_orders):
+        if translation_order:
+            translation_process.translation_id = translation_order['translation_id']
+            translation_process.status = TranscriptStatus.IN_PROGRESS
+            ordered_processes.append(translation_process)
         else:
-            translation_process.update(status=TranscriptStatus.FAILED)
+            failed_processes.append(translation_process)
+
+    for translation_process in failed_processes:
+        translation_process.status = TranscriptStatus.FAILED
+
+    # `bulk_update` does not touch the modification time like `save` does.
+    now = timezone.now()
+    for translation_process in ordered_processes + failed_processes:
+        translation_process.modified = now
+
+    TranscriptProcessMetadata.objects.bulk_update(
+        ordered_processes + failed_processes, ['translation_id', 'status', 'modified']
+    )
 
 
 def validate_transcript_response(edx_video_id, file_id, transcript, lang_code, log_prefix):
@@ -632,7 +699,7 @@ def get_transcript_credentials(provider, org, edx_video_id, file_id, log_prefix)
     """
     transcript_secrets = None
     try:
-        transcript_secrets = TranscriptCredentials.objects.get(org=org, provider=provider)
+        transcript_secrets = utils.get_transcript_secrets(org, provider)
     except TranscriptCredentials.DoesNotExist:
         LOGGER.exception(
             u'[%s] Unable to get transcript secrets for org=%s, edx_video_id=%s, file_id=%s.',
@@ -953,20 +1020,44 @@ def convert_to_sjson_and_upload_to_s3(srt_transcript, edx_video_id, file_id, tar
     Raises:
         Logs and raises any unexpected Exception.
     """
+    sjson_files = convert_to_sjson_and_upload_batch_to_s3(
+        srt_transcripts={target_language: srt_transcript},
+        edx_video_id=edx_video_id,
+        file_id=file_id,
+    )
+    return sjson_files[target_language]
+
+
+def convert_to_sjson_and_upload_batch_to_s3(srt_transcripts, edx_video_id, file_id):
+    """
+    Converts SRT transcripts of a video to sjson format and uploads them to S3 concurrently.
+
+    Arguments:
+        srt_transcripts(dict): SRT transcript content keyed by language code.
+        edx_video_id(unicode): studio video identifier
+        file_id(unicode): file identifier or process identifier
+
+    Returns:
+        A dict containing S3 file paths of the uploaded files keyed by language code.
+
+    Raises:
+        Logs and raises any unexpected Exception.
+    """
+    target_languages = list(srt_transcripts)
     try:
-        sjson_transcript = convert_srt_to_sjson(srt_transcript)
-        sjson_file = upload_sjson_to_s3(CONFIG, sjson_transcript)
+        sjson_transcripts = [convert_srt_to_sjson(srt_transcripts[lang_code]) for lang_code in target_languages]
+        sjson_files = upload_sjson_batch_to_s3(CONFIG, sjson_transcripts)
     except Exception:
         # in case of any exception, log and raise.
         LOGGER.exception(
             u'[3PlayMedia Task] translation failed for video=%s -- lang_code=%s -- process_id=%s',
             edx_video_id,
             file_id,
-            target_language,
+            u', '.join(target_languages),
         )
         raise
 
-    return sjson_file
+    return dict(zip(target_languages, sjson_files))
 
 
 def handle_video_translations(video, translations, file_id, api_key, log_prefix):
@@ -984,11 +1075,12 @@ def handle_video_translations(video, translations, file_id, api_key, log_prefix)
     Steps include:
         - Fetch translated transcript content from 3Play Media.
         - Validate the content of received translated transcript.
-        - Convert translated SRT transcript to SJson format and upload it to S3.
-        - Update edx-val for a completed transcript.
+        - Convert translated SRT transcripts to SJson format and upload them to S3 in one batch.
+        - Update edx-val for the completed transcripts.
         - update transcript status for video in edx-val as well as edx-video-pipeline.
     """
     video_translation_processes = get_in_progress_translation_processes(video)
+    completed_translations = {}
     for translation_metadata in translations:
 
         translation_id = translation_metadata['id']
@@ -1030,44 +1122,64 @@ def handle_video_translations(video, translations, file_id, api_key, log_prefix)
                 lang_code=target_language,
                 log_prefix=log_prefix
             )
-            if is_transcript_valid:
-                translation_process.update(status=TranscriptStatus.READY)
-            else:
+            if not is_transcript_valid:
                 translation_process.update(status=TranscriptStatus.FAILED)
                 continue
 
-            # 3 - Convert SRT translation to SJson format and upload it to S3.
-            sjson_file = convert_to_sjson_and_upload_to_s3(
-                srt_transcript=srt_transcript,
-                target_language=target_language,
-                edx_video_id=video.studio_id,
-                file_id=file_id,
-            )
+            completed_translations[target_language] = (translation_id, srt_transcript, translation_process)
+
+    if not completed_translations:
+        return
 
-            # 4 Update edx-val with completed transcript information
-            val_api = VALAPICall(video_proto=None, val_status=None)
+    # A translation is only READY once its transcript is uploaded and in edx-val,
+    # the ones still pending when the batch fails are marked FAILED.
+    pending_languages = set(completed_translations)
+    val_api = VALAPICall(video_proto=None, val_status=None)
+    try:
+        # 3 - Convert SRT translations to SJson format and upload them to S3.
+        sjson_files = convert_to_sjson_and_upload_batch_to_s3(
+            srt_transcripts={
+                target_language: srt_transcript
+                for target_language, (__, srt_transcript, __) in six.iteritems(completed_translations)
+            },
+            edx_video_id=video.studio_id,
+            file_id=file_id,
+        )
+
+        # 4 Update edx-val with completed transcripts information
+        for target_language, (translation_id, __, translation_process) in six.iteritems(completed_translations):
             val_api.update_val_transcript(
                 video_id=video.studio_id,
                 lang_code=target_language,
-                name=sjson_file,
+                name=sjson_files[target_language],
                 transcript_format=TRANSCRIPT_SJSON,
                 provider=TranscriptProvider.THREE_PLAY,
             )
+            translation_process.update(status=TranscriptStatus.READY)
+            pending_languages.discard(target_language)
 
             LOGGER.info(
                 '[3PlayMedia Task] Translation retrieval was successful -- video=%s, translation_id=%s, language=%s.',
                 video.studio_id, translation_id, target_language
             )
+    except Exception:
+        for target_language in pending_languages:
+            completed_translations[target_language][2].update(status=TranscriptStatus.FAILED)
+        LOGGER.exception(
+            '[3PlayMedia Task] Translation retrieval failed -- video=%s, file_id=%s, languages=%s.',
+            video.studio_id, file_id, ', '.join(sorted(pending_languages))
+        )
+        raise
 
-            # 5 - if all the processes for this video are complete, update transcript status
-            # for video in edx-val as well as edx-video-pipeline.
-            video_jobs = TranscriptProcessMetadata.objects.filter(video=video)
-            if all(video_job.status == TranscriptStatus.READY for video_job in video_jobs):
-                utils.update_video_status(
-                    val_api_client=val_api,
-                    video=video,
-                    status=TranscriptStatus.READY
-                )
+    # 5 - if all the processes for this video are complete, update transcript status
+    # for video in edx-val as well as edx-video-pipeline.
+    video_jobs = TranscriptProcessMetadata.objects.filter(video=video)
+    if all(video_job.status == TranscriptStatus.READY for video_job in video_jobs):
+        utils.update_video_status(
+            val_api_client=val_api,
+            video=video,
+            status=TranscriptStatus.READY
+        )
 
 
 def retrieve_three_play_translations():
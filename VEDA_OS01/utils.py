@@ -2,12 +2,51 @@
 Common utils.
 """
 
+import datetime
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from rest_framework.parsers import BaseParser
 
 from VEDA.utils import get_config
-from VEDA_OS01.models import Encode, TranscriptStatus, URL, Video
+from VEDA_OS01.models import (Encode, HealWorkItem, SkippedEncode, TranscriptCredentials, TranscriptStatus, URL,
+                              Video, VideoStatusSummary, VideoStatusTransition)
 import six
 
+LOGGER = logging.getLogger(__name__)
+
+# 3Play Media language and translation service catalogs hardly ever change.
+THREE_PLAY_CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Videos are reported stuck once they are in a transcode status for longer than this.
+VIDEO_STATUS_STUCK_HOURS = 6
+# Window of the status transitions the latency percentiles are computed from.
+VIDEO_STATUS_SUMMARY_WINDOW = datetime.timedelta(days=1)
+
+# Decrypted transcript credentials are only kept in the memory of a process, and for
+# a short while so that changes made by other processes are picked up.
+TRANSCRIPT_CREDENTIALS_CACHE_TIMEOUT = 60
+
+# Video fields whose change makes heal check the encodes of the video again.
+HEAL_VIDEO_FIELDS = ('video_trans_status', 'video_active')
+
+TranscriptSecrets = namedtuple('TranscriptSecrets', 'api_key api_secret')
+
+_TRANSCRIPT_SECRETS = {}
+_TRANSCRIPT_SECRETS_LOCK = threading.Lock()
+# Bumped on every invalidation so that a lookup racing with a save does not cache stale secrets.
+_TRANSCRIPT_SECRETS_GENERATION = [0]
+
 
 class ValTranscriptStatus(object):
     """
@@ -47,7 +86,8 @@ def update_video_status(val_api_client, video, status):
 
 def invalidate_fernet_cached_properties(model, fields):
     """
-    Invalidates transcript credential fernet field's cached properties.
+    Invalidates transcript credential fernet field's cached properties, and the transcript
+    secrets decrypted with them.
 
     Arguments:
         model (class): Model class containing fernet fields.
@@ -62,6 +102,64 @@ def invalidate_fernet_cached_properties(model, fields):
         except AttributeError:
             pass
 
+    if model is TranscriptCredentials:
+        invalidate_transcript_secrets()
+
+
+@receiver([post_save, post_delete], sender=TranscriptCredentials, dispatch_uid='invalidate_transcript_secrets')
+def invalidate_transcript_secrets(**kwargs):  # pylint: disable=unused-argument
+    """
+    Drops the cached transcript secrets, e.g. when transcript credentials are saved.
+    """
+    with _TRANSCRIPT_SECRETS_LOCK:
+        _TRANSCRIPT_SECRETS.clear()
+        _TRANSCRIPT_SECRETS_GENERATION[0] += 1
+
+
+def get_transcript_secrets(org, provider):
+    """
+    Get the decrypted transcript credentials of an organization, cached in memory.
+
+    Arguments:
+        org (unicode): organization extracted from course id
+        provider (TranscriptProvider): transcript provider
+
+    Returns:
+        TranscriptSecrets with the decrypted `api_key` and `api_secret`.
+
+    Raises:
+        TranscriptCredentials.DoesNotExist: if the organization has no credentials for the provider.
+    """
+    key = (org, provider)
+    with _TRANSCRIPT_SECRETS_LOCK:
+        generation = _TRANSCRIPT_SECRETS_GENERATION[0]
+        expires_at, secrets = _TRANSCRIPT_SECRETS.get(key, (0, None))
+
+    if expires_at <= time.time():
+        credentials = TranscriptCredentials.objects.filter(org=org, provider=provider).first()
+        secrets = credentials and TranscriptSecrets(api_key=credentials.api_key, api_secret=credentials.api_secret)
+        with _TRANSCRIPT_SECRETS_LOCK:
+            if generation == _TRANSCRIPT_SECRETS_GENERATION[0]:
+                _TRANSCRIPT_SECRETS[key] = (time.time() + TRANSCRIPT_CREDENTIALS_CACHE_TIMEOUT, secrets)
+
+    if secrets is None:
+        raise TranscriptCredentials.DoesNotExist(
+            'No transcript credentials for org={org}, provider={provider}'.format(org=org, provider=provider)
+        )
+
+    return secrets
+
+
+def has_transcript_credentials(org, provider):
+    """
+    Returns True if an organization has transcript credentials for a provider.
+    """
+    try:
+        get_transcript_secrets(org, provider)
+    except TranscriptCredentials.DoesNotExist:
+        return False
+    return True
+
 
 def get_incomplete_encodes(edx_id):
     """
@@ -90,6 +188,10 @@ def get_incomplete_encodes(edx_id):
         if not encode_profile or (encode_profile and not encode_profile.profile_active):
             encode_list.remove(encode)
 
+    # Encodes the video source is not eligible for count as complete.
+    skipped_encodes = set(video.skipped_encodes.values_list('encode_profile', flat=True))
+    encode_list = [encode for encode in encode_list if encode not in skipped_encodes]
+
     # Filter encodes based on their successful encoding for the specified video.
     for encode in list(encode_list):
         completed_encode_profile = URL.objects.filter(
@@ -113,6 +215,215 @@ def is_video_ready(edx_id, ignore_encodes=list()):
     return set(get_incomplete_encodes(edx_id)).issubset(set(ignore_encodes))
 
 
+@receiver(post_save, sender=URL, dispatch_uid='settle_heal_work_item_on_url')
+def settle_heal_work_item_on_url(instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Removes a delivered encode from the heal work set.
+    """
+    HealWorkItem.objects.filter(
+        video_id=instance.videoID_id, encode_profile=instance.encode_profile.product_spec
+    ).delete()
+
+
+@receiver(post_save, sender=SkippedEncode, dispatch_uid='settle_heal_work_item_on_skip')
+def settle_heal_work_item_on_skip(instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Removes a skipped encode from the heal work set.
+    """
+    HealWorkItem.objects.filter(video_id=instance.video_id, encode_profile=instance.encode_profile).delete()
+
+
+def get_heal_video_fields(video):
+    """
+    Returns the loaded `HEAL_VIDEO_FIELDS` values of a video, deferred fields are None.
+    """
+    return {field_name: video.__dict__.get(field_name) for field_name in HEAL_VIDEO_FIELDS}
+
+
+@receiver(post_init, sender=Video, dispatch_uid='track_heal_video_fields')
+def track_heal_video_fields(instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Remembers the heal relevant fields a video was loaded with.
+    """
+    instance._loaded_heal_fields = get_heal_video_fields(instance)
+
+
+@receiver(post_save, sender=Video, dispatch_uid='recheck_heal_work_items')
+def recheck_heal_work_items(instance, created, **kwargs):  # pylint: disable=unused-argument
+    """
+    Makes the waiting heal work items of a video due when its status or activity changes.
+
+    Items heal gave up on (without a `next_check`) are left alone, as are their attempts.
+    """
+    heal_fields = get_heal_video_fields(instance)
+    changed = heal_fields != getattr(instance, '_loaded_heal_fields', None)
+    instance._loaded_heal_fields = heal_fields
+    if created or not changed:
+        return
+
+    now = timezone.now()
+    HealWorkItem.objects.filter(video_id=instance.pk, next_check__gt=now).update(next_check=now)
+
+
+def set_video_trans_status(videos, status, source, **fields):
+    """
+    Set the transcode status of videos and log their status transitions.
+
+    Arguments:
+        videos (QuerySet): videos to update.
+        status (unicode): new transcode status, see `VideoStatus`.
+        source (unicode): pipeline stage making the change, e.g. 'heal'.
+        fields: other video fields to update, e.g. `video_trans_end`.
+
+    Returns:
+        The number of videos that changed status.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        changing = list(
+            videos.select_for_update().exclude(video_trans_status=status).values_list(
+                'pk', 'video_trans_status', 'video_status_changed'
+            )
+        )
+        videos.update(video_trans_status=status, **fields)
+        if not changing:
+            return 0
+
+        Video.objects.filter(pk__in=[pk for pk, __, __ in changing]).update(video_status_changed=now)
+        VideoStatusTransition.objects.bulk_create([
+            VideoStatusTransition(
+                video_id=pk,
+                from_status=from_status,
+                to_status=status,
+                source=source,
+                seconds_in_status=(now - changed).total_seconds() if changed else None,
+                created=now,
+            )
+            for pk, from_status, changed in changing
+        ])
+    return len(changing)
+
+
+def record_video_trans_status(video, previous_status, source):
+    """
+    Log the status transition of a video saved with a new transcode status, e.g. a new video.
+
+    Arguments:
+        video (Video): the saved video.
+        previous_status (unicode): transcode status before the save, empty for a new video.
+        source (unicode): pipeline stage making the change, e.g. 'ingest'.
+    """
+    if video.video_trans_status == previous_status:
+        return
+
+    now = timezone.now()
+    changed = video.video_status_changed if previous_status else None
+    Video.objects.filter(pk=video.pk).update(video_status_changed=now)
+    video.video_status_changed = now
+    VideoStatusTransition.objects.create(
+        video=video,
+        from_status=previous_status or '',
+        to_status=video.video_trans_status,
+        source=source,
+        seconds_in_status=(now - changed).total_seconds() if changed else None,
+        created=now,
+    )
+
+
+def get_stuck_videos(status, older_than=datetime.timedelta(hours=VIDEO_STATUS_STUCK_HOURS)):
+    """
+    Returns the videos that have been in a transcode status for longer than `older_than`, oldest first.
+    """
+    return Video.objects.filter(
+        video_trans_status=status,
+        video_status_changed__lt=timezone.now() - older_than,
+    ).order_by('video_status_changed')
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the nearest-rank percentile of sorted values, or None if there are none.
+    """
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(fraction * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+def summarize_video_trans_statuses(stuck_after=datetime.timedelta(hours=VIDEO_STATUS_STUCK_HOURS),
+                                   window=VIDEO_STATUS_SUMMARY_WINDOW):
+    """
+    Materialize the `VideoStatusSummary` of every transcode status.
+
+    Returns:
+        The number of statuses summarized.
+    """
+    now = timezone.now()
+    since = now - window
+    current = {
+        row['video_trans_status']: row
+        for row in Video.objects.order_by().values('video_trans_status').annotate(
+            videos=Count('pk'), oldest_change=Min('video_status_changed')
+        )
+    }
+    stuck = dict(
+        Video.objects.filter(video_status_changed__lt=now - stuck_after).order_by().values(
+            'video_trans_status'
+        ).annotate(stuck=Count('pk')).values_list('video_trans_status', 'stuck')
+    )
+    transitions_in = dict(
+        VideoStatusTransition.objects.filter(created__gte=since).order_by().values('to_status').annotate(
+            transitions=Count('pk')
+        ).values_list('to_status', 'transitions')
+    )
+
+    statuses = set(current) | set(transitions_in)
+    for status in statuses:
+        durations = sorted(VideoStatusTransition.objects.filter(
+            from_status=status, created__gte=since, seconds_in_status__isnull=False
+        ).values_list('seconds_in_status', flat=True))
+        VideoStatusSummary.objects.update_or_create(
+            status=status,
+            defaults=dict(
+                videos=current.get(status, {}).get('videos', 0),
+                stuck_videos=stuck.get(status, 0),
+                oldest_change=current.get(status, {}).get('oldest_change'),
+                transitions_in=transitions_in.get(status, 0),
+                p50_seconds=percentile(durations, 0.5),
+                p90_seconds=percentile(durations, 0.9),
+                p99_seconds=percentile(durations, 0.99),
+            )
+        )
+    VideoStatusSummary.objects.exclude(status__in=statuses).delete()
+    return len(statuses)
+
+
+def get_s3_event_keys(records):
+    """
+    Returns the de-duplicated S3 object keys of S3 event records, in order.
+
+    Records that do not carry an S3 object key are logged and skipped.
+
+    Arguments:
+        records(list): `Records` of an S3 event notification.
+    """
+    s3_keys = []
+    for record in records:
+        try:
+            s3_key = record['s3']['object']['key']
+        except (KeyError, TypeError):
+            s3_key = None
+
+        if not s3_key or not isinstance(s3_key, six.string_types):
+            LOGGER.error('[S3 EVENT] Record does not contain s3 key: %s', record)
+            continue
+
+        if s3_key not in s3_keys:
+            s3_keys.append(s3_key)
+
+    return s3_keys
+
+
 class PlainTextParser(BaseParser):
     """
     Plain text parser.
@@ -124,3 +435,23 @@ class PlainTextParser(BaseParser):
         Simply return a string representing the body of the request.
         """
         return stream.read()
+
+
+def get_three_play_catalog(catalog_name, api_key, build_catalog):
+    """
+    Returns a 3Play Media catalog of an account, cached until `THREE_PLAY_CATALOG_CACHE_TIMEOUT`.
+
+    Arguments:
+        catalog_name(str): name of the catalog
+        api_key(unicode): 3Play Media api key of the account
+        build_catalog(callable): fetches the catalog when it is not cached
+    """
+    cache_key = 'three_play_catalog.{catalog_name}.{api_key_hash}'.format(
+        catalog_name=catalog_name,
+        api_key_hash=hashlib.sha256(api_key.encode('utf-8')).hexdigest(),
+    )
+    catalog = cache.get(cache_key)
+    if catalog is None:
+        catalog = build_catalog()
+        cache.set(cache_key, catalog, THREE_PLAY_CATALOG_CACHE_TIMEOUT)
+    return catalog
@@ -25,8 +25,8 @@ from VEDA_OS01.models import (URL, Course, Encode, TranscriptCredentials,
 from VEDA_OS01.serializers import (CourseSerializer, EncodeSerializer,
                                    URLSerializer, VideoSerializer)
 from VEDA_OS01.transcripts import CIELO24_API_VERSION
-from VEDA_OS01.utils import PlainTextParser
-from control.http_ingest_celeryapp import ingest_video_and_upload_to_hotstore
+from VEDA_OS01.utils import PlainTextParser, get_s3_event_keys
+from control.http_ingest_celeryapp import enqueue_ingests
 
 LOGGER = logging.getLogger(__name__)
 
@@ -297,25 +297,29 @@ class IngestFromS3View(APIView):
     def _ingest_from_s3_bucket(self, request_body):
         """
         Handle ingest from s3 bucket.
+
+        Every record of the notification is ingested, the ingest tasks are enqueued together.
         """
         status = 400
         reason = ''
         request_message = request_body.get('Message')
         try:
             message_json = json.loads(request_message)
-            s3_object = message_json.get('Records')[0].get('s3')
-            video_s3_key = s3_object.get('object').get('key')
-        except TypeError:
+            records = message_json.get('Records')
+            if not isinstance(records, list):
+                raise TypeError
+        except (TypeError, ValueError, AttributeError):
             reason = 'Request message body does not contain expected output'
             LOGGER.error('[HTTP INGEST] {reason}'.format(reason=reason))
             return status, reason
 
-        if not video_s3_key:
+        video_s3_keys = get_s3_event_keys(records)
+        if not video_s3_keys:
             reason = 'Video does not contain s3 key'
             LOGGER.error('[HTTP INGEST] {reason}'.format(reason=reason))
             return status, reason
-        ingest_video_and_upload_to_hotstore.apply_async(args=[video_s3_key],
-                                                        queue=auth_dict['celery_http_ingest_queue'])
+
+        enqueue_ingests(video_s3_keys)
         status = 200
         return status, reason
 
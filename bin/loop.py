@@ -9,9 +9,6 @@ import os
 import sys
 import argparse
 import logging
-from django.db import reset_queries
-import resource
-import time
 
 project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_path not in sys.path:
@@ -20,10 +17,7 @@ if project_path not in sys.path:
 import django
 django.setup()
 
-from control.control_env import WORK_DIRECTORY
-from control.veda_file_discovery import FileDiscovery
-from youtube_callback.daemon import generate_course_list
-from youtube_callback.sftp_id_retrieve import callfunction
+from control.veda_scheduler import Scheduler, get_jobs
 
 LOGGER = logging.getLogger(__name__)
 # TODO: Remove this temporary logging to stdout
@@ -36,7 +30,6 @@ class DaemonCli(object):
         self.args = None
         self.ingest = False
         self.youtube = False
-        self.course_list = []
 
     def get_args(self):
         parser = argparse.ArgumentParser()
@@ -63,42 +56,15 @@ class DaemonCli(object):
 
     def run(self):
         """
-        actually run the function
+        actually run the function, through the scheduler service
         """
+        job_names = []
         if self.youtube is True:
-            self.youtube_daemon()
+            job_names.append('youtube_callback')
         if self.aboutingest is True:
-            self.about_video_ingest_daemon()
-
-    def about_video_ingest_daemon(self):
-        x = 0
-        while True:
-            FD = FileDiscovery(
-                node_work_directory=WORK_DIRECTORY
-            )
-            FD.about_video_ingest()
-            reset_queries()
-            x += 1
-            if x >= 100:
-                LOGGER.info('Memory usage: %s (kb)' % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
-                x = 0
-
-    def youtube_daemon(self):
-        x = 0
-        while True:
-            self.course_list = generate_course_list()
-            for course in self.course_list:
-                LOGGER.info('%s%s: Callback' % (course.institution, course.edx_classid))
-                callfunction(course)
-
-            x += 1
-            if x >= 100:
-                LOGGER.info('Memory usage: %s (kb)' % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
-                x = 0
-
-            reset_queries()
-            self.course_list = []
-            time.sleep(10)
+            job_names.append('about_video_ingest')
+        if job_names:
+            Scheduler(get_jobs(job_names)).run()
 
 
 def main():
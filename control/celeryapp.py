@@ -5,6 +5,7 @@ Start Celery Worker
 
 
 from celery import Celery
+from django.utils import timezone
 import logging
 import os
 import sys
@@ -15,8 +16,9 @@ try:
 except ImportError:
     from veda_deliver import VedaDelivery
 
+from control.encode_cost_model import calibrate
 from control.veda_heal import VedaHeal
-from VEDA_OS01.models import Video
+from VEDA_OS01.models import InFlightEncode, Video
 
 LOGGER = logging.getLogger(__name__)
 # TODO: Remove this temporary logging to stdout
@@ -53,7 +55,25 @@ def deliverable_route(veda_id, encode_profile):
         veda_id=veda_id,
         encode_profile=encode_profile
     )
-    veda_deliver.run()
+    registration = InFlightEncode.objects.filter(veda_id=veda_id, encode_profile=encode_profile).first()
+    encode_finished = timezone.now()
+    try:
+        veda_deliver.run()
+    finally:
+        # The encode is no longer in flight, heal may enqueue it again if delivery failed.
+        InFlightEncode.release(veda_id, encode_profile)
+
+    if registration is not None:
+        calibrate(registration, encode_finished)
+
+
+@app.task(name='encode_started')
+def encode_started(veda_id, encode_profile, job_id):
+    """
+    Task sent by `worker_encode` to `celery_deliver_queue` when it starts an encode, the encode cost model
+    measures from it.
+    """
+    InFlightEncode.mark_started(veda_id, encode_profile, job_id)
 
 
 @app.task
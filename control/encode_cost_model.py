@@ -0,0 +1,117 @@
+"""
+Encode cost model
+
+Estimates how long the encode workers take to encode a video with a profile:
+
+    estimated seconds = source seconds * source megapixels * rate of the profile
+
+The rate of a profile (`Encode.cost_rate`) starts at `encode_cost_default_rate` and is
+calibrated with a moving average of the time its encodes took, from when the encode
+worker started them (`InFlightEncode.encode_started`, sent with the `encode_started`
+task) to when the deliver task picked them up, leaving out the time spent waiting in
+the worker queue. Workers that do not send `encode_started` are measured from the
+dispatch of the encode instead.
+"""
+
+import logging
+
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+
+from VEDA.utils import get_config
+from VEDA_OS01.models import URL, Encode, Video
+
+LOGGER = logging.getLogger(__name__)
+
+# Encode seconds per source megapixel-second, i.e. a 1080p source encodes at about half real time.
+DEFAULT_RATE = 0.25
+# Ingest assumes 1080p when ffprobe does not report the resolution.
+DEFAULT_MEGAPIXELS = 1920 * 1080 / 1000000.0
+# Weight of a new observation in the calibrated rate.
+CALIBRATION_WEIGHT = 0.2
+
+
+def parse_duration(duration):
+    """
+    Returns the seconds of a `Video.video_orig_duration`, e.g. '01:02:03.45', or 0 if it is unknown.
+    """
+    try:
+        seconds = 0.0
+        for part in str(duration or 0).split(':'):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        return 0.0
+    return seconds
+
+
+def parse_megapixels(resolution):
+    """
+    Returns the megapixels of a `Video.video_orig_resolution`, e.g. '1280x720'.
+    """
+    try:
+        width, height = str(resolution).lower().split('x')[:2]
+        megapixels = int(width) * int(height.split()[0]) / 1000000.0
+    except (AttributeError, IndexError, ValueError):
+        return DEFAULT_MEGAPIXELS
+    return megapixels or DEFAULT_MEGAPIXELS
+
+
+def source_size(video):
+    """
+    Returns the size of a video in megapixel-seconds.
+    """
+    return parse_duration(video.video_orig_duration) * parse_megapixels(video.video_orig_resolution)
+
+
+def estimate_encode_seconds(veda_id, encode_profile, config=None):
+    """
+    Returns the estimated seconds to encode a video with a profile, or None if the video is unknown.
+    """
+    config = config or get_config()
+    video = Video.objects.filter(edx_id=veda_id).only('video_orig_duration', 'video_orig_resolution').last()
+    if video is None:
+        return None
+
+    rate = Encode.objects.filter(product_spec=encode_profile, cost_rate__isnull=False).values_list(
+        'cost_rate', flat=True
+    ).first()
+    if rate is None:
+        rate = config.get('encode_cost_default_rate') or DEFAULT_RATE
+    return source_size(video) * rate
+
+
+def calibrate(registration, encode_finished):
+    """
+    Calibrate the rate of a profile from a delivered encode.
+
+    Arguments:
+        registration (InFlightEncode): registration of the encode, measured from its
+            `encode_started`, or its dispatch (`modified`) if the worker did not send it.
+        encode_finished (datetime): when the deliver task for the encode started.
+    """
+    encode_started = registration.encode_started or registration.modified
+    url = URL.objects.filter(
+        videoID__edx_id=registration.veda_id,
+        encode_profile__product_spec=registration.encode_profile,
+        url_date__gte=encode_started,
+    ).select_related('videoID').order_by('-url_date').first()
+    if url is None:
+        return
+
+    size = source_size(url.videoID)
+    elapsed = (encode_finished - encode_started).total_seconds()
+    if size <= 0 or elapsed <= 0:
+        return
+
+    observed_rate = elapsed / size
+    Encode.objects.filter(product_spec=registration.encode_profile).update(
+        cost_rate=Coalesce(
+            F('cost_rate') * (1 - CALIBRATION_WEIGHT) + Value(observed_rate * CALIBRATION_WEIGHT),
+            Value(observed_rate)
+        )
+    )
+    LOGGER.info(
+        '[ENCODE] %s : %s took %ss (%s encode seconds per megapixel-second)',
+        registration.veda_id, registration.encode_profile, elapsed, observed_rate
+    )
+
@@ -0,0 +1,89 @@
+"""
+Encode profile eligibility
+
+Encode profiles can be skipped for sources that would not benefit from them, with rules
+per profile in `encode_eligibility_rules`, evaluated against the probed source metadata:
+
+    desktop_mp4:
+        min_height: 540        # skip sources with fewer lines, e.g. a 480p upload
+    mobile_high:
+        requires_video: true   # skip sources without a video stream
+    hls:
+        min_duration: 10       # skip sources shorter than this many seconds
+
+Skipped encodes are recorded as `SkippedEncode` and count as complete, so heal does not
+enqueue them again.
+"""
+
+import logging
+import re
+
+from control.encode_cost_model import parse_duration
+from VEDA_OS01.models import SkippedEncode
+
+LOGGER = logging.getLogger(__name__)
+
+RESOLUTION_PATTERN = re.compile(r'(\d+)\s*x\s*(\d+)', re.IGNORECASE)
+
+
+def parse_dimensions(resolution):
+    """
+    Returns the (width, height) of a `Video.video_orig_resolution`, or None if the source has no video stream.
+    """
+    match = RESOLUTION_PATTERN.search(resolution or '')
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def get_skip_reason(rules, video):
+    """
+    Returns why a video is not eligible for a profile with `rules`, or None if it is eligible.
+    """
+    dimensions = parse_dimensions(video.video_orig_resolution)
+    if rules.get('requires_video') and dimensions is None:
+        return 'source has no video stream'
+
+    min_height = rules.get('min_height')
+    if min_height and dimensions is not None and dimensions[1] < min_height:
+        return 'source is {height}p, below {min_height}p'.format(height=dimensions[1], min_height=min_height)
+
+    # An unknown duration (0) never makes a source ineligible.
+    duration = parse_duration(video.video_orig_duration)
+    min_duration = rules.get('min_duration')
+    if min_duration and 0 < duration < min_duration:
+        return 'source is {duration}s, shorter than {min_duration}s'.format(
+            duration=duration, min_duration=min_duration
+        )
+
+    return None
+
+
+def skip_ineligible_encodes(video, encode_profiles, eligibility_rules):
+    """
+    Record the encodes a video is not eligible for as skipped.
+
+    Arguments:
+        video (Video): the source video.
+        encode_profiles (iterable): encode profile names.
+        eligibility_rules (dict): `encode_eligibility_rules` config.
+
+    Returns:
+        The set of encode profiles that are skipped.
+    """
+    skipped = set()
+    for encode_profile in encode_profiles:
+        reason = get_skip_reason(eligibility_rules.get(encode_profile) or {}, video)
+        if reason is None:
+            continue
+
+        __, created = SkippedEncode.objects.get_or_create(
+            video=video,
+            encode_profile=encode_profile,
+            defaults={'reason': reason}
+        )
+        if created:
+            LOGGER.info('[ENCODE] %s : skipping %s, %s', video.edx_id, encode_profile, reason)
+        skipped.add(encode_profile)
+
+    return skipped
@@ -4,11 +4,33 @@ The code for those tasks lives in the edx-video-worker repository.
 """
 
 
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
 from celery import Celery
+from django.db.models import Case, Count, F, IntegerField, Min, Value, When
+from django.utils import timezone
+from kombu.exceptions import ChannelError
+
+from control.encode_cost_model import estimate_encode_seconds
 from VEDA.utils import get_config
+from VEDA_OS01.models import InFlightEncode, Video
+
+LOGGER = logging.getLogger(__name__)
 
 auth_dict = get_config()
 
+# Hours after which an in-flight encode that was never delivered may be enqueued again.
+DEFAULT_INFLIGHT_TTL_HOURS = 24
+# Enqueues dispatch the held encodes of their lane at most this often, `dispatch_encodes` does the rest.
+DISPATCH_ON_ENQUEUE_INTERVAL = 1
+# Held encodes are dispatched shortest first, unless they have been held for this long.
+DEFAULT_SJF_MAX_WAIT_MINUTES = 60
+
 CEL_BROKER = 'redis://:@{redis_broker}:6379/0'.format(redis_broker=auth_dict['redis_broker'])
 
 app = Celery(auth_dict['celery_app_name'], broker=CEL_BROKER, include=['celeryapp'])
@@ -29,9 +51,351 @@ app.conf.update(
 )
 
 
-def enqueue_encode(veda_id, encode_profile, job_id, encode_worker_queue, update_val_status=True):
+class EncodePriority(object):
     """
-    Send an encode request to the remote encode worker.
+    Encode job priorities. Every priority is served by its own worker queue (lane).
+    """
+    NEW_UPLOAD = 'new_upload'
+    HEAL = 'heal'
+    BACKFILL = 'backfill'
+
+    CHOICES = (
+        (NEW_UPLOAD, 'New studio upload'),
+        (HEAL, 'Heal re-encode'),
+        (BACKFILL, 'Bulk backfill'),
+    )
+
+
+# Maps an encode priority to the config key of the worker queue serving it.
+ENCODE_PRIORITY_QUEUES = {
+    EncodePriority.NEW_UPLOAD: 'celery_worker_high_queue',
+    EncodePriority.HEAL: 'celery_worker_medium_queue',
+    EncodePriority.BACKFILL: 'celery_worker_low_queue',
+}
+DEFAULT_ENCODE_QUEUE = 'celery_worker_medium_queue'
+
+
+class LaneRateLimiter(object):
+    """
+    Spaces out enqueues so that a lane never receives more than `rate` jobs per second.
+    """
+    def __init__(self, rate, clock=time.time, sleep=time.sleep):
+        self.interval = 1.0 / rate
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until the lane can take another job.
+        """
+        with self.lock:
+            now = self.clock()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+
+        if wait > 0:
+            self.sleep(wait)
+
+
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_encode_queue(priority, config=None):
+    """
+    Returns the worker queue (lane) for an encode priority.
+
+    Lanes that are not configured fall back to the medium queue.
+    """
+    config = config or auth_dict
+    queue = config.get(ENCODE_PRIORITY_QUEUES.get(priority, DEFAULT_ENCODE_QUEUE))
+    if not queue:
+        queue = config[DEFAULT_ENCODE_QUEUE]
+    return queue.strip()
+
+
+def route_encode(priority, estimated_seconds=None, config=None):
     """
+    Returns the worker queue for an encode.
+
+    Encodes estimated to take at least `encode_long_job_seconds` go to `celery_worker_long_queue`
+    when it is configured, so long recordings do not hold up the workers of the lanes.
+    """
+    config = config or auth_dict
+    long_queue = config.get('celery_worker_long_queue')
+    long_job_seconds = config.get('encode_long_job_seconds')
+    if long_queue and long_job_seconds and estimated_seconds is not None and estimated_seconds >= long_job_seconds:
+        return long_queue.strip()
+    return get_encode_queue(priority, config)
+
+
+def get_rate_limiter(priority, config=None):
+    """
+    Returns the rate limiter of a lane or None if the lane is not rate limited.
+
+    Rates are read from `encode_lane_rate_limits` (jobs per second, keyed by priority).
+    """
+    config = config or auth_dict
+    rate = (config.get('encode_lane_rate_limits') or {}).get(priority)
+    if not rate:
+        return None
+
+    with _RATE_LIMITERS_LOCK:
+        limiter = _RATE_LIMITERS.get((priority, rate))
+        if limiter is None:
+            limiter = LaneRateLimiter(float(rate))
+            _RATE_LIMITERS[(priority, rate)] = limiter
+    return limiter
+
+
+def get_queue_depth(queue):
+    """
+    Returns the number of messages waiting in a worker queue or None if it can not be measured.
+
+    Redis deletes a list once it is empty, so a queue the broker does not know is empty.
+    """
+    try:
+        with app.connection_or_acquire() as connection:
+            return connection.default_channel.queue_declare(queue=queue, passive=True).message_count
+    except ChannelError:
+        return 0
+    except Exception as error:  # pylint: disable=broad-except
+        LOGGER.warning('[ENQUEUE] Unable to measure depth of queue %s: %s', queue, error)
+        return None
+
+
+def get_fair_share_target_depth(priority, config=None):
+    """
+    Returns the worker queue depth fair share dispatching keeps a lane at, or None if the lane is not fair shared.
+
+    Depths are read from `encode_fair_share_target_depth` (keyed by priority).
+    """
+    config = config or auth_dict
+    return (config.get('encode_fair_share_target_depth') or {}).get(priority)
+
+
+def get_share_key(veda_id, config=None):
+    """
+    Returns the institution, or the course if `encode_fair_share_by` is `course`, a video is dispatched for.
+    """
+    config = config or auth_dict
+    if config.get('encode_fair_share_by') == 'course':
+        field_name = 'inst_class_id'
+    else:
+        field_name = 'inst_class__institution'
+    share_key = Video.objects.filter(edx_id=veda_id).order_by('-pk').values_list(field_name, flat=True).first()
+    return str(share_key or '')
+
+
+class FairShareDispatcher(object):
+    """
+    Dispatches the held encodes of a lane to its worker queue.
+
+    The room left in the worker queue below `target_depth` is shared between the institutions
+    (or courses) with held encodes, weighted round robin starting with the one waiting longest,
+    so a bulk upload does not hold back everyone else's uploads. The encodes of an institution
+    are dispatched shortest first, except those held for more than `max_wait_minutes`.
+    """
+    def __init__(self, priority, target_depth, weights=None, max_wait_minutes=DEFAULT_SJF_MAX_WAIT_MINUTES):
+        self.priority = priority
+        self.queue = get_encode_queue(priority)
+        self.target_depth = target_depth
+        self.weights = weights or {}
+        self.max_wait = timedelta(minutes=max_wait_minutes)
+
+    def room(self):
+        """
+        Returns the number of encodes the worker queue can take, from its measured depth.
+
+        Nothing is dispatched while the depth can't be measured, the encodes stay held.
+        """
+        depth = get_queue_depth(self.queue)
+        if depth is None:
+            LOGGER.warning('[ENQUEUE] Depth of %s unknown, holding its encodes', self.queue)
+            return 0
+        return self.target_depth - depth
+
+    def allocate(self, room):
+        """
+        Share `room` encodes between the held encodes of every share key.
+
+        Returns:
+            An ordered dict of the number of encodes to dispatch per share key.
+        """
+        shares = InFlightEncode.objects.filter(held=True, priority=self.priority).values('share_key').annotate(
+            held_count=Count('pk'),
+            waiting_since=Min('created'),
+        ).order_by('waiting_since')
+        held_counts = OrderedDict((share['share_key'], share['held_count']) for share in shares)
+
+        allocation = OrderedDict((share_key, 0) for share_key in held_counts)
+        while room > 0 and held_counts:
+            for share_key in list(held_counts):
+                count = min(max(int(self.weights.get(share_key, 1)), 1), held_counts[share_key], room)
+                allocation[share_key] += count
+                held_counts[share_key] -= count
+                room -= count
+                if not held_counts[share_key]:
+                    del held_counts[share_key]
+                if room <= 0:
+                    break
+        return allocation
+
+    def dispatch(self):
+        """
+        Dispatch held encodes while the worker queue has room.
+
+        Returns:
+            The number of encodes dispatched.
+        """
+        room = self.room()
+        if room <= 0:
+            return 0
+
+        waited_too_long = Case(
+            When(created__lt=timezone.now() - self.max_wait, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+        held_jobs = [
+            list(InFlightEncode.objects.filter(
+                held=True, priority=self.priority, share_key=share_key
+            ).order_by(waited_too_long, F('estimated_seconds').asc(nulls_last=True), 'created')[:count])
+            for share_key, count in self.allocate(room).items()
+        ]
+
+        dispatched = 0
+        # Take turns between the share keys, so they are all served if sending stops halfway.
+        for turn in range(max([len(jobs) for jobs in held_jobs] or [0])):
+            for jobs in held_jobs:
+                if turn >= len(jobs):
+                    continue
+                job = jobs[turn]
+                # Another dispatcher may have claimed the encode in the meantime.
+                if not InFlightEncode.objects.filter(pk=job.pk, held=True).update(held=False, modified=timezone.now()):
+                    continue
+                try:
+                    send_encode(job.veda_id, job.encode_profile, job.job_id, job.update_val_status,
+                                route_encode(self.priority, job.estimated_seconds), self.priority)
+                except Exception:  # pylint: disable=broad-except
+                    LOGGER.exception('[ENQUEUE] Unable to dispatch %s : %s', job.veda_id, job.encode_profile)
+                    InFlightEncode.objects.filter(pk=job.pk).update(held=True)
+                    return dispatched
+                dispatched += 1
+
+        if dispatched:
+            LOGGER.info('[ENQUEUE] Dispatched %s held encodes to %s', dispatched, self.queue)
+        return dispatched
+
+
+_LAST_DISPATCH = {}
+
+
+def dispatch_encodes(priorities=None, config=None):
+    """
+    Dispatch the held encodes of the fair share lanes.
+
+    Returns:
+        The number of encodes dispatched.
+    """
+    config = config or auth_dict
+    dispatched = 0
+    for priority in priorities or [priority for priority, __ in EncodePriority.CHOICES]:
+        target_depth = get_fair_share_target_depth(priority, config)
+        if target_depth:
+            _LAST_DISPATCH[priority] = time.time()
+            dispatched += FairShareDispatcher(
+                priority,
+                target_depth,
+                weights=config.get('encode_fair_share_weights'),
+                max_wait_minutes=config.get('encode_sjf_max_wait_minutes') or DEFAULT_SJF_MAX_WAIT_MINUTES,
+            ).dispatch()
+    return dispatched
+
+
+def send_encode(veda_id, encode_profile, job_id, update_val_status, encode_worker_queue, priority):
+    """
+    Send an encode request to a worker queue, at the rate of the lane.
+    """
+    rate_limiter = get_rate_limiter(priority)
+    if rate_limiter:
+        rate_limiter.acquire()
+
     app.send_task('worker_encode', args=(veda_id, encode_profile, job_id, update_val_status),
                   queue=encode_worker_queue, connect_timeout=3)
+
+
+class EncodeJob(object):
+    """
+    An encode request for a single video and encode profile.
+
+    The job carries its priority, which decides the worker queue (lane) it is sent to.
+    """
+    def __init__(self, veda_id, encode_profile, priority=EncodePriority.HEAL, job_id=None, update_val_status=True):
+        self.veda_id = veda_id
+        self.encode_profile = encode_profile
+        self.priority = priority
+        self.job_id = job_id or uuid.uuid1().hex[0:10]
+        self.update_val_status = update_val_status
+
+    @property
+    def queue(self):
+        return get_encode_queue(self.priority)
+
+    def enqueue(self):
+        return enqueue_encode(
+            self.veda_id,
+            self.encode_profile,
+            self.job_id,
+            update_val_status=self.update_val_status,
+            priority=self.priority
+        )
+
+
+def enqueue_encode(veda_id, encode_profile, job_id, encode_worker_queue=None, update_val_status=True,
+                   priority=EncodePriority.HEAL):
+    """
+    Send an encode request to the remote encode worker.
+
+    The worker queue is picked from the job priority unless `encode_worker_queue` is given.
+    Enqueueing is idempotent: nothing is sent while the same encode is still in flight.
+    Encodes of fair share lanes are held and dispatched by `FairShareDispatcher`.
+
+    Returns:
+        True if the encode was sent or held, False if it was already in flight.
+    """
+    ttl = timedelta(hours=auth_dict.get('encode_inflight_ttl_hours') or DEFAULT_INFLIGHT_TTL_HOURS)
+    held = not encode_worker_queue and bool(get_fair_share_target_depth(priority))
+    job_fields = {
+        'priority': priority,
+        'update_val_status': update_val_status,
+        'held': held,
+        'estimated_seconds': estimate_encode_seconds(veda_id, encode_profile, auth_dict),
+    }
+    if held:
+        job_fields['share_key'] = get_share_key(veda_id)
+
+    if not InFlightEncode.register(veda_id, encode_profile, job_id, ttl, **job_fields):
+        LOGGER.info('[ENQUEUE] {video_id} : {encode} already in flight, skipping'.format(
+            video_id=veda_id,
+            encode=encode_profile
+        ))
+        return False
+
+    if held:
+        if time.time() - _LAST_DISPATCH.get(priority, 0) >= DISPATCH_ON_ENQUEUE_INTERVAL:
+            dispatch_encodes([priority])
+        return True
+
+    if not encode_worker_queue:
+        encode_worker_queue = route_encode(priority, job_fields['estimated_seconds'])
+
+    try:
+        send_encode(veda_id, encode_profile, job_id, update_val_status, encode_worker_queue, priority)
+    except Exception:
+        InFlightEncode.release(veda_id, encode_profile)
+        raise
+
+    return True
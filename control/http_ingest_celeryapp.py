@@ -4,7 +4,7 @@ Start Celery Worker
 
 
 
-from celery import Celery
+from celery import Celery, group
 import logging
 import sys
 import boto
@@ -12,6 +12,7 @@ from boto.exception import S3ResponseError
 
 from VEDA.utils import get_config
 from control.veda_file_discovery import FileDiscovery
+from control.veda_work_directory import WorkDirectoryFull
 
 
 LOGGER = logging.getLogger(__name__)
@@ -20,6 +21,11 @@ logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
 auth_dict = get_config()
 
+# An ingest that found no room in the working storage is retried after this many seconds,
+# for up to a day.
+WORK_DIRECTORY_FULL_RETRY_SECONDS = 15 * 60
+WORK_DIRECTORY_FULL_MAX_RETRIES = 96
+
 CEL_BROKER = 'redis://:@{redis_broker}:6379/0'.format(redis_broker=auth_dict['redis_broker'])
 
 app = Celery(auth_dict['celery_app_name'], broker=CEL_BROKER, include=['http_ingest_celeryapp'])
@@ -40,8 +46,8 @@ app.conf.update(
 )
 
 
-@app.task(name=auth_dict['celery_http_ingest_queue'])
-def ingest_video_and_upload_to_hotstore(requested_key):
+@app.task(name=auth_dict['celery_http_ingest_queue'], bind=True, max_retries=WORK_DIRECTORY_FULL_MAX_RETRIES)
+def ingest_video_and_upload_to_hotstore(self, requested_key):
     LOGGER.info('ingest_video_and_upload_to_hotstore key %s' % requested_key)
     bucket_name = auth_dict['edx_s3_ingest_bucket']
     try:
@@ -54,11 +60,29 @@ def ingest_video_and_upload_to_hotstore(requested_key):
 
     file_discovery = FileDiscovery()
     file_discovery.bucket = bucket
-    successful_ingest = file_discovery.validate_metadata_and_feed_to_ingest(video_s3_key=s3_key)
+    try:
+        successful_ingest = file_discovery.validate_metadata_and_feed_to_ingest(video_s3_key=s3_key)
+    except WorkDirectoryFull as error:
+        LOGGER.error('[INGEST CELERY TASK] No room in the working storage for key %s, retrying' % requested_key)
+        raise self.retry(exc=error, countdown=WORK_DIRECTORY_FULL_RETRY_SECONDS)
     if not successful_ingest:
         LOGGER.error('[INGEST CELERY TASK] Ingest failed for key %s' % requested_key)
     return
 
 
+def enqueue_ingests(requested_keys):
+    """
+    Enqueue an ingest task for every key.
+
+    The tasks are sent as a group, which publishes all of them over a single
+    broker connection instead of one connection per key.
+    """
+    queue = auth_dict['celery_http_ingest_queue']
+    group(
+        ingest_video_and_upload_to_hotstore.si(requested_key).set(queue=queue)
+        for requested_key in requested_keys
+    ).apply_async()
+
+
 if __name__ == '__main__':
     app.start()
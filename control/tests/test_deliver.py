@@ -10,7 +10,7 @@ from django.test import TestCase
 import responses
 from control.veda_deliver import VedaDelivery
 from control.veda_file_ingest import VideoProto
-from mock import PropertyMock, patch
+from mock import Mock, PropertyMock, patch
 from moto import mock_s3_deprecated
 from VEDA.utils import get_config
 from VEDA_OS01.models import URL, Course, Destination, Encode, Video
@@ -98,6 +98,24 @@ class VedaDeliverRunTest(TestCase):
             ))
         )
 
+    def test_run_releases_reservation(self):
+        """
+        Test that the working storage of the encoded file stays reserved until the delivery ends.
+        """
+        reservation = Mock()
+
+        def deliver():
+            self.deliver_instance.reservation = reservation
+            self.assertFalse(reservation.release.called)
+            raise ValueError
+
+        with patch.object(self.deliver_instance, '_deliver', side_effect=deliver):
+            with self.assertRaises(ValueError):
+                self.deliver_instance.run()
+
+        reservation.release.assert_called_once_with()
+        self.assertIsNone(self.deliver_instance.reservation)
+
     @mock_s3_deprecated
     def test_intake(self):
         """
@@ -8,6 +8,7 @@ import responses
 from ddt import ddt, data, unpack
 from mock import Mock, patch
 
+from django.core.cache import cache
 from django.test import TestCase
 from control.veda_deliver_3play import (
     ThreePlayMediaClient,
@@ -38,6 +39,7 @@ class ThreePlayMediaClientTests(TestCase):
         """
         Tests setup
         """
+        cache.clear()
         self.course = Course.objects.create(
             course_name=u'Intro to VEDA',
             institution=u'MAx',
@@ -80,6 +82,31 @@ class ThreePlayMediaClientTests(TestCase):
             else:
                 self.assertEqual(getattr(received_request, request_attr), expected_request[request_attr])
 
+    @responses.activate
+    def test_language_ids_cached(self):
+        """
+        Verify that the 3PlayMedia languages are fetched once per api key
+        """
+        responses.add(
+            responses.GET,
+            u'https://api.3playmedia.com/caption_imports/available_languages',
+            body=json.dumps([
+                {"iso_639_1_code": "en", "language_id": 1},
+                {"iso_639_1_code": "en", "language_id": 2},
+                {"iso_639_1_code": "ur", "language_id": 3},
+            ]),
+            status=200,
+        )
+
+        for __ in range(2):
+            three_play_client = ThreePlayMediaClient(**self.video_transcript_preferences)
+            self.assertEqual(three_play_client.get_language_ids(), {'en': 1, 'ur': 3})
+        self.assertEqual(len(responses.calls), 1)
+
+        preferences = dict(self.video_transcript_preferences, api_key='other_api_key')
+        ThreePlayMediaClient(**preferences).get_language_ids()
+        self.assertEqual(len(responses.calls), 2)
+
     @responses.activate
     @patch('control.veda_deliver_3play.LOGGER')
     def test_transcription_flow(self, mock_logger):
@@ -4,6 +4,9 @@ Cielo24 transcription testing
 
 
 import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
 from django.test import TestCase
 
@@ -12,7 +15,7 @@ import six.moves.urllib.parse
 from ddt import ddt
 from mock import patch
 
-from control.veda_deliver_cielo import Cielo24Transcript
+from control.veda_deliver_cielo import Cielo24RequestError, Cielo24Transcript
 from VEDA_OS01.models import (Cielo24Fidelity, Cielo24Turnaround, Course,
                               TranscriptProcessMetadata, TranscriptStatus,
                               Video)
@@ -75,26 +78,16 @@ class Cielo24TranscriptTests(TestCase):
         """
         return build_url(cielo24.cielo24_api_base_url, endpoint)
 
-    def assert_request(self, received_request, expected_request):
+    def request_key(self, method, url, body):
         """
-        Verify that `received_request` matches `expected_request`
+        Return a comparable representation of a request, independent of the query parameters order
         """
-        expected_parsed_url = six.moves.urllib.parse.urlparse(expected_request['url'])
-        expected_request_url = '{scheme}://{netloc}/{path}'.format(
-            scheme=expected_parsed_url.scheme, netloc=expected_parsed_url.netloc, path=expected_parsed_url.path
+        parsed_url = six.moves.urllib.parse.urlparse(url)
+        request_url = '{scheme}://{netloc}/{path}'.format(
+            scheme=parsed_url.scheme, netloc=parsed_url.netloc, path=parsed_url.path
         )
-        expected_request_params = dict(six.moves.urllib.parse.parse_qsl(expected_parsed_url.query))
-
-        received_parsed_url = six.moves.urllib.parse.urlparse(received_request.url)
-        received_request_url = '{scheme}://{netloc}/{path}'.format(
-            scheme=received_parsed_url.scheme, netloc=received_parsed_url.netloc, path=received_parsed_url.path
-        )
-        received_request_params = dict(six.moves.urllib.parse.parse_qsl(received_parsed_url.query))
-
-        self.assertEqual(received_request.method, expected_request['method'])
-        self.assertEqual(received_request_url, expected_request_url)
-        self.assertDictEqual(received_request_params, expected_request_params)
-        self.assertEqual(received_request.body, expected_request['body'])
+        request_params = sorted(six.moves.urllib.parse.parse_qsl(parsed_url.query))
+        return method, request_url, request_params, body
 
     @responses.activate
     def test_transcript_flow(self):
@@ -182,7 +175,7 @@ class Cielo24TranscriptTests(TestCase):
             }
         ]
 
-        received_request_index = 0
+        expected_requests = []
         for preferred_language in self.video_transcript_preferences['preferred_languages']:
             for request_data in expected_data:
                 # replace target language with appropriate value
@@ -190,11 +183,18 @@ class Cielo24TranscriptTests(TestCase):
                     request_data = dict(request_data)
                     request_data['url'] = request_data['url'].replace('TARGET_LANG', preferred_language)
 
-                self.assert_request(
-                    responses.calls[received_request_index].request,
-                    request_data
+                expected_requests.append(
+                    self.request_key(request_data['method'], request_data['url'], request_data['body'])
                 )
-                received_request_index += 1
+
+        # The jobs of the languages are submitted concurrently, their requests interleave.
+        received_requests = [
+            self.request_key(call.request.method, call.request.url, call.request.body) for call in responses.calls
+        ]
+        self.assertEqual(sorted(received_requests), sorted(expected_requests))
+
+        process_metadata = TranscriptProcessMetadata.objects.filter(status=TranscriptStatus.IN_PROGRESS)
+        self.assertEqual(sorted(process_metadata.values_list('lang_code', flat=True)), ['en', 'ur'])
 
     @patch('control.veda_deliver_cielo.LOGGER')
     @responses.activate
@@ -240,3 +240,120 @@ class Cielo24TranscriptTests(TestCase):
         process_metadata = TranscriptProcessMetadata.objects.all()
         self.assertEqual(process_metadata.count(), 1)
         self.assertEqual(process_metadata.first().status, TranscriptStatus.FAILED)
+
+
+class Cielo24StandIn(BaseHTTPRequestHandler):
+    """
+    Local cielo24 API stand-in, unavailable for the first `unavailable` requests to `unavailable_path`.
+    """
+    unavailable = 0
+    unavailable_path = '/api/job/add_media'
+    delay = 0
+    paths = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        path = self.path.split('?')[0]
+        type(self).paths.append(path)
+        time.sleep(self.delay)
+        if path == self.unavailable_path and type(self).unavailable > 0:
+            type(self).unavailable -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        body = {'JobId': 'job-1'} if path.endswith('/job/new') else {'TaskId': 'task-1'}
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode('utf-8'))
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class Cielo24ClientTests(TestCase):
+    """
+    Cielo24 requests against a local HTTP stand-in
+    """
+    def setUp(self):
+        Cielo24StandIn.unavailable = 0
+        Cielo24StandIn.unavailable_path = '/api/job/add_media'
+        Cielo24StandIn.delay = 0
+        Cielo24StandIn.paths = []
+        server = HTTPServer(('127.0.0.1', 0), Cielo24StandIn)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        course = Course.objects.create(course_name='Intro to VEDA', institution='MAx', edx_classid='123')
+        self.cielo24 = Cielo24Transcript(
+            video=Video.objects.create(inst_class=course, **VIDEO_DATA),
+            org='MAx',
+            api_key='cielo24_api_key',
+            turnaround=Cielo24Turnaround.PRIORITY,
+            fidelity=Cielo24Fidelity.PROFESSIONAL,
+            preferred_languages=['en', 'ur', 'fr'],
+            s3_video_url='https://s3.amazonaws.com/bkt/video.mp4',
+            callback_base_url='https://veda.edx.org/cielo24/transcript_completed/1234567890',
+            cielo24_api_base_url='http://127.0.0.1:{}/api'.format(server.server_address[1]),
+        )
+
+    def test_retry_unavailable(self):
+        """
+        Verify that requests safe to repeat are retried when answered as unavailable.
+        """
+        Cielo24StandIn.unavailable = 2
+
+        self.cielo24.start_transcription_flow()
+
+        self.assertEqual(len(Cielo24StandIn.paths), 3 * 3 + 2)
+        self.assertEqual(
+            TranscriptProcessMetadata.objects.filter(status=TranscriptStatus.IN_PROGRESS).count(), 3
+        )
+
+    def test_no_retry_of_job_creation(self):
+        """
+        Verify that creating a job is not retried on an unavailable response, it may have been created.
+        """
+        Cielo24StandIn.unavailable = 1
+        Cielo24StandIn.unavailable_path = '/api/job/new'
+
+        self.cielo24.start_transcription_flow()
+
+        self.assertEqual(Cielo24StandIn.paths.count('/api/job/new'), 3)
+        self.assertEqual(len(Cielo24StandIn.paths), 1 + 2 * 3)
+        self.assertEqual(
+            TranscriptProcessMetadata.objects.filter(status=TranscriptStatus.IN_PROGRESS).count(), 2
+        )
+
+    def test_language_error_keeps_other_jobs(self):
+        """
+        Verify that an unexpected error for one language still records the jobs created for every language.
+        """
+        perform_transcript = self.cielo24.perform_transcript
+
+        def fail_for_ur(job_id, lang_code):
+            if lang_code == 'ur':
+                raise KeyError('TaskId')
+            return perform_transcript(job_id, lang_code)
+
+        with patch.object(self.cielo24, 'perform_transcript', side_effect=fail_for_ur):
+            self.cielo24.start_transcription_flow()
+
+        self.assertEqual(
+            dict(TranscriptProcessMetadata.objects.values_list('lang_code', 'status')),
+            {'en': TranscriptStatus.IN_PROGRESS, 'ur': TranscriptStatus.FAILED, 'fr': TranscriptStatus.IN_PROGRESS},
+        )
+
+    @patch('control.veda_deliver_cielo.CIELO24_REQUEST_TIMEOUT', (1, 0.2))
+    def test_timeout(self):
+        """
+        Verify that a request cielo24 does not answer in time fails without being retried.
+        """
+        Cielo24StandIn.delay = 0.5
+
+        with self.assertRaises(Cielo24RequestError):
+            self.cielo24.create_job()
+
+        self.assertEqual(Cielo24StandIn.paths, ['/api/job/new'])
@@ -0,0 +1,205 @@
+"""
+Youtube delivery testing
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from django.test import TestCase
+from mock import MagicMock, Mock, patch
+
+from control.veda_deliver_youtube import (SftpSessionPool, UploadProgress, YoutubeDeliveryStage, YoutubeDrop,
+                                          get_drop_window_seconds, put_file)
+from VEDA_OS01.tests.factories import CourseFactory, VideoFactory
+
+
+class FakeSessionPool(object):
+    """
+    Session pool recording the files put in every session.
+    """
+    def __init__(self):
+        self.sessions = []
+
+    @contextmanager
+    def session(self, yt_logon):
+        sftp = MagicMock()
+        self.sessions.append((yt_logon, sftp))
+        yield sftp
+
+
+class YoutubeDeliveryStageTests(TestCase):
+    """
+    Tests for batching Youtube deliveries into drops.
+    """
+    def setUp(self):
+        self.course = CourseFactory(yt_logon='logon', yt_channel='channel')
+        self.session_pool = FakeSessionPool()
+        self.uploaded = []
+        upload_patcher = patch.object(YoutubeDrop, 'upload', autospec=True, side_effect=self.record_drop)
+        upload_patcher.start()
+        self.addCleanup(upload_patcher.stop)
+
+    def record_drop(self, drop, sftp):
+        self.uploaded.append(sorted(delivery.file for delivery in drop.deliveries))
+
+    def delivery(self, index, course=None):
+        return Mock(course=course or self.course, file='V00{}_100.mp4'.format(index))
+
+    def submit_all(self, stage, deliveries):
+        results = []
+
+        def submit(delivery):
+            try:
+                results.append(stage.submit(delivery))
+            except Exception as error:  # pylint: disable=broad-except
+                results.append(error)
+
+        threads = [threading.Thread(target=submit, args=(delivery,)) for delivery in deliveries]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_drop_window_needs_threaded_worker(self):
+        """
+        Verify that deliveries only wait for others on a deliver worker running them in threads.
+        """
+        config = {'youtube_drop_window_seconds': 5}
+        self.assertEqual(get_drop_window_seconds(dict(config, celery_threads=4)), 0)
+        self.assertEqual(get_drop_window_seconds(dict(config, celery_deliver_pool='threads', celery_threads=1)), 0)
+        self.assertEqual(get_drop_window_seconds(dict(config, celery_deliver_pool='threads', celery_threads=4)), 5)
+
+    def test_no_drop_window(self):
+        """
+        Verify that a delivery is uploaded right away without a drop window.
+        """
+        stage = YoutubeDeliveryStage(self.session_pool, drop_window_seconds=0)
+        self.assertTrue(stage.submit(self.delivery(0)))
+
+        self.assertEqual(self.uploaded, [['V000_100.mp4']])
+
+    def test_one_drop_per_channel(self):
+        """
+        Verify that deliveries to a channel within the window share a drop and a session.
+        """
+        other_course = CourseFactory(yt_logon='other', yt_channel='other')
+        stage = YoutubeDeliveryStage(self.session_pool, drop_window_seconds=1, drop_max_videos=3)
+        deliveries = [self.delivery(index) for index in range(3)] + [self.delivery(3, other_course)]
+
+        results = self.submit_all(stage, deliveries)
+
+        self.assertEqual(results, [True] * 4)
+        self.assertEqual(
+            sorted(self.uploaded),
+            [['V000_100.mp4', 'V001_100.mp4', 'V002_100.mp4'], ['V003_100.mp4']]
+        )
+        self.assertEqual(sorted(logon for logon, __ in self.session_pool.sessions), ['logon', 'other'])
+
+    def test_full_drop(self):
+        """
+        Verify that a drop is uploaded once it is full and later deliveries start a new one.
+        """
+        stage = YoutubeDeliveryStage(self.session_pool, drop_window_seconds=1, drop_max_videos=2)
+
+        self.submit_all(stage, [self.delivery(index) for index in range(2)])
+        stage.submit(self.delivery(2))
+
+        self.assertEqual(self.uploaded, [['V000_100.mp4', 'V001_100.mp4'], ['V002_100.mp4']])
+
+    def test_failed_drop(self):
+        """
+        Verify that a failed upload reaches every delivery of the drop, not only the one uploading it.
+        """
+        stage = YoutubeDeliveryStage(self.session_pool, drop_window_seconds=1, drop_max_videos=3)
+        error = IOError('Connection lost')
+
+        with patch.object(stage, 'upload', side_effect=error):
+            results = self.submit_all(stage, [self.delivery(index) for index in range(3)])
+
+        self.assertEqual(results, [error] * 3)
+
+
+class YoutubeDropTests(TestCase):
+    """
+    Tests for `YoutubeDrop`
+    """
+    def test_csv_row_per_video(self):
+        """
+        Verify that the drop CSV has a row per video, and is removed after the upload.
+        """
+        course = CourseFactory(yt_logon='logon', yt_channel='channel')
+        deliveries = []
+        for video in (VideoFactory(edx_id='V001', inst_class=course), VideoFactory(edx_id='V002', inst_class=course)):
+            delivery = Mock(video=video, course=course, file=video.edx_id + '_100.mp4')
+            delivery.csv_metadata.return_value = {'filename': delivery.file, 'custom_id': video.edx_id}
+            deliveries.append(delivery)
+        drop = YoutubeDrop('logon', deliveries)
+
+        uploaded = {}
+
+        def fake_put_file(sftp, local_path, remote_path, callback=None):
+            if local_path.endswith('.csv'):
+                with open(local_path) as csv_file:
+                    uploaded[remote_path] = csv_file.read().splitlines()
+            else:
+                uploaded[remote_path] = None
+
+        with patch('control.veda_deliver_youtube.put_file', side_effect=fake_put_file):
+            drop.upload(Mock())
+
+        csv_lines = uploaded[drop.remote_directory + '/' + os.path.basename(drop.csv_file)]
+        self.assertEqual(len(csv_lines), 3)
+        self.assertTrue(csv_lines[1].startswith('V001_100.mp4,,V001,'))
+        self.assertTrue(csv_lines[2].startswith('V002_100.mp4,,V002,'))
+        self.assertEqual(list(uploaded)[-1], drop.remote_directory + '/delivery.complete')
+        self.assertFalse(os.path.exists(drop.csv_file))
+
+
+class SftpTests(TestCase):
+    """
+    Tests for the SFTP helpers
+    """
+    def test_session_reused(self):
+        """
+        Verify that sessions are reused per account, and failed ones are dropped.
+        """
+        session_pool = SftpSessionPool('youtubekey')
+        with patch.object(session_pool, 'connect', side_effect=lambda logon: MagicMock()) as mock_connect:
+            with session_pool.session('logon') as first:
+                pass
+            with session_pool.session('logon') as second:
+                self.assertIs(first, second)
+            with self.assertRaises(IOError):
+                with session_pool.session('logon'):
+                    raise IOError
+            with session_pool.session('logon') as third:
+                self.assertIsNot(third, first)
+
+        self.assertEqual(mock_connect.call_count, 2)
+
+    def test_put_file_pipelined(self):
+        """
+        Verify that files are written with pipelining on.
+        """
+        local_path = os.path.abspath(__file__)
+        sftp = MagicMock()
+        remote_file = sftp.open.return_value.__enter__.return_value
+        callback = Mock()
+
+        put_file(sftp, local_path, 'remote/test.py', callback=callback)
+
+        remote_file.set_pipelined.assert_called_once_with(True)
+        callback.assert_called_with(os.path.getsize(local_path), os.path.getsize(local_path))
+
+    @patch('control.veda_deliver_youtube.LOGGER')
+    def test_progress_throttled(self, mock_logger):
+        """
+        Verify that progress is only logged once per interval and on completion.
+        """
+        progress = UploadProgress('video.mp4', interval=60)
+        for transferred in range(1, 11):
+            progress(transferred, 10)
+
+        self.assertEqual(mock_logger.info.call_count, 1)
@@ -0,0 +1,114 @@
+"""
+Test encode cost model
+"""
+
+from datetime import timedelta
+
+from ddt import data, ddt, unpack
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+
+from control.celeryapp import deliverable_route
+from control.encode_cost_model import (DEFAULT_MEGAPIXELS, calibrate, estimate_encode_seconds, parse_duration,
+                                       parse_megapixels)
+from VEDA_OS01.models import Encode, InFlightEncode
+from VEDA_OS01.tests.factories import DestinationFactory, EncodeFactory, UrlFactory, VideoFactory
+
+
+@ddt
+class EncodeCostModelTests(TestCase):
+    """
+    Tests for estimating and calibrating encode durations
+    """
+    def setUp(self):
+        self.video = VideoFactory(
+            edx_id='XXXXXXXX2014-V00COST', video_orig_duration='00:10:00.00', video_orig_resolution='1000x1000'
+        )
+        self.encode = EncodeFactory(encode_destination=DestinationFactory(), product_spec='desktop_mp4')
+
+    @data(
+        ('01:02:03.50', 3723.5),
+        ('12.5', 12.5),
+        (None, 0),
+        ('N/A', 0),
+    )
+    @unpack
+    def test_parse_duration(self, duration, expected_seconds):
+        self.assertEqual(parse_duration(duration), expected_seconds)
+
+    @data(
+        ('1280x720', 0.9216),
+        ('1920x1080 [SAR 1:1 DAR 16:9]', 2.0736),
+        (None, DEFAULT_MEGAPIXELS),
+    )
+    @unpack
+    def test_parse_megapixels(self, resolution, expected_megapixels):
+        self.assertAlmostEqual(parse_megapixels(resolution), expected_megapixels)
+
+    def test_estimate(self):
+        """
+        Verify that the estimate scales with the source, and uses the calibrated rate of the profile.
+        """
+        config = {'encode_cost_default_rate': 0.5}
+        self.assertEqual(estimate_encode_seconds(self.video.edx_id, 'desktop_mp4', config), 300)
+        self.assertIsNone(estimate_encode_seconds('unknown', 'desktop_mp4', config))
+
+        Encode.objects.filter(pk=self.encode.pk).update(cost_rate=2)
+        self.assertEqual(estimate_encode_seconds(self.video.edx_id, 'desktop_mp4', config), 1200)
+
+    def test_calibrate(self):
+        """
+        Verify that the rate of a profile moves towards the observed encode time, from the worker start to delivery.
+        """
+        registration = InFlightEncode.objects.create(
+            veda_id=self.video.edx_id, encode_profile='desktop_mp4', job_id='job'
+        )
+        InFlightEncode.mark_started(self.video.edx_id, 'desktop_mp4', 'job')
+        registration.refresh_from_db()
+        encode_finished = registration.encode_started + timedelta(seconds=1200)
+        UrlFactory(videoID=self.video, encode_profile=self.encode, url_date=encode_finished + timedelta(seconds=300))
+
+        calibrate(registration, encode_finished)
+        self.assertAlmostEqual(Encode.objects.get(pk=self.encode.pk).cost_rate, 2)
+
+        registration.encode_started = encode_finished + timedelta(seconds=3600)
+        encode_finished = registration.encode_started + timedelta(seconds=600)
+        UrlFactory(videoID=self.video, encode_profile=self.encode, url_date=encode_finished)
+        calibrate(registration, encode_finished)
+        self.assertAlmostEqual(Encode.objects.get(pk=self.encode.pk).cost_rate, 1.8)
+
+    def test_calibrate_from_dispatch(self):
+        """
+        Verify that encodes the worker did not report as started, or started by a replaced job, are measured from
+        their dispatch.
+        """
+        registration = InFlightEncode.objects.create(
+            veda_id=self.video.edx_id, encode_profile='desktop_mp4', job_id='job'
+        )
+        InFlightEncode.mark_started(self.video.edx_id, 'desktop_mp4', 'replaced_job')
+        registration.refresh_from_db()
+        self.assertIsNone(registration.encode_started)
+
+        encode_finished = registration.modified + timedelta(seconds=1200)
+        UrlFactory(videoID=self.video, encode_profile=self.encode, url_date=encode_finished)
+        calibrate(registration, encode_finished)
+        self.assertAlmostEqual(Encode.objects.get(pk=self.encode.pk).cost_rate, 2)
+
+    @patch('control.celeryapp.VedaDelivery')
+    def test_deliver_calibrates(self, mock_delivery):
+        """
+        Verify that delivering an encode calibrates its profile, without the worker reporting the encode start.
+        """
+        registration = InFlightEncode.objects.create(
+            veda_id=self.video.edx_id, encode_profile='desktop_mp4', job_id='job'
+        )
+        InFlightEncode.objects.filter(pk=registration.pk).update(modified=timezone.now() - timedelta(seconds=1200))
+        mock_delivery.return_value.run.side_effect = lambda: UrlFactory(
+            videoID=self.video, encode_profile=self.encode, url_date=timezone.now()
+        )
+
+        deliverable_route(self.video.edx_id, 'desktop_mp4')
+
+        self.assertFalse(InFlightEncode.objects.exists())
+        self.assertAlmostEqual(Encode.objects.get(pk=self.encode.pk).cost_rate, 2, places=2)
@@ -0,0 +1,74 @@
+"""
+Tests for encode profile eligibility
+"""
+
+from ddt import data, ddt, unpack
+from django.test import TestCase
+
+from control.encode_eligibility import get_skip_reason, parse_dimensions, skip_ineligible_encodes
+from control.veda_encode import VedaEncode
+from VEDA_OS01.models import SkippedEncode
+from VEDA_OS01.tests.factories import CourseFactory, DestinationFactory, EncodeFactory, VideoFactory
+
+ELIGIBILITY_RULES = {
+    'desktop_mp4': {'min_height': 540},
+    'hls': {'requires_video': True, 'min_duration': 10},
+}
+
+
+@ddt
+class EncodeEligibilityTests(TestCase):
+    """
+    Tests for skipping the encodes a source is not eligible for.
+    """
+    @data(
+        ('1920x1080', (1920, 1080)),
+        ('640 x 360 [SAR 1:1 DAR 16:9]', (640, 360)),
+        ('', None),
+        (None, None),
+    )
+    @unpack
+    def test_parse_dimensions(self, resolution, dimensions):
+        """
+        Verify that the source dimensions are parsed from the probed resolution.
+        """
+        self.assertEqual(parse_dimensions(resolution), dimensions)
+
+    @data(
+        ('desktop_mp4', '854x480', '00:10:00.00', 'source is 480p, below 540p'),
+        ('desktop_mp4', '1280x720', '00:10:00.00', None),
+        ('desktop_mp4', '', '00:10:00.00', None),
+        ('hls', '', '00:10:00.00', 'source has no video stream'),
+        ('hls', '1280x720', '00:00:05.00', 'source is 5.0s, shorter than 10s'),
+        ('hls', '1280x720', '0', None),
+        ('mobile_low', '320x240', '00:00:01.00', None),
+    )
+    @unpack
+    def test_get_skip_reason(self, encode_profile, resolution, duration, reason):
+        """
+        Verify that sources are checked against the rules of the profile.
+        """
+        video = VideoFactory(video_orig_resolution=resolution, video_orig_duration=duration)
+        self.assertEqual(get_skip_reason(ELIGIBILITY_RULES.get(encode_profile, {}), video), reason)
+
+    def test_skip_recorded(self):
+        """
+        Verify that skipped encodes are recorded once, and left out of the needed encodes.
+        """
+        course = CourseFactory(s3_proc=True, yt_proc=False, review_proc=False)
+        destination = DestinationFactory(destination_active=True)
+        for product_spec in ('desktop_mp4', 'mobile_low'):
+            EncodeFactory(encode_destination=destination, product_spec=product_spec, profile_active=True)
+        video = VideoFactory(
+            inst_class=course, video_orig_resolution='854x480', video_orig_duration='00:10:00.00'
+        )
+
+        self.assertEqual(skip_ineligible_encodes(video, ['desktop_mp4', 'mobile_low'], ELIGIBILITY_RULES),
+                         {'desktop_mp4'})
+        self.assertEqual(skip_ineligible_encodes(video, ['desktop_mp4'], ELIGIBILITY_RULES), {'desktop_mp4'})
+        self.assertEqual(SkippedEncode.objects.filter(video=video).count(), 1)
+
+        encoder = VedaEncode(course_object=course, veda_id=video.edx_id)
+        encodes = encoder.determine_encodes()
+        self.assertNotIn('desktop_mp4', encodes)
+        self.assertIn('mobile_low', encodes)
@@ -0,0 +1,287 @@
+"""
+Test encode worker task routing
+"""
+
+from datetime import timedelta
+
+from ddt import data, ddt, unpack
+from django.test import TestCase
+from django.utils import timezone
+from kombu import Connection
+from mock import patch
+
+from control.encode_worker_tasks import (EncodeJob, EncodePriority, FairShareDispatcher, LaneRateLimiter,
+                                         enqueue_encode, get_encode_queue, get_queue_depth, get_rate_limiter,
+                                         route_encode)
+from VEDA.utils import get_config
+from VEDA_OS01.models import InFlightEncode
+from VEDA_OS01.tests.factories import CourseFactory, VideoFactory
+
+CONFIG_DATA = get_config('test_config.yaml')
+
+
+@ddt
+class EncodeRoutingTests(TestCase):
+    """
+    Tests for routing encode jobs to priority lanes
+    """
+    @data(
+        (EncodePriority.NEW_UPLOAD, 'worker_high_queue'),
+        (EncodePriority.HEAL, 'worker_medium_queue'),
+        (EncodePriority.BACKFILL, 'worker_low_queue'),
+    )
+    @unpack
+    def test_get_encode_queue(self, priority, expected_queue):
+        """
+        Verify that every priority is routed to its own lane.
+        """
+        self.assertEqual(get_encode_queue(priority, CONFIG_DATA), expected_queue)
+
+    def test_unconfigured_lane(self):
+        """
+        Verify that a lane without a queue falls back to the medium queue.
+        """
+        config = dict(CONFIG_DATA, celery_worker_high_queue=None)
+        self.assertEqual(get_encode_queue(EncodePriority.NEW_UPLOAD, config), 'worker_medium_queue')
+
+    @patch.dict('control.encode_worker_tasks.auth_dict', CONFIG_DATA)
+    @patch('control.encode_worker_tasks.app.send_task')
+    def test_enqueue_job(self, mock_send_task):
+        """
+        Verify that a job is sent to the lane of its priority.
+        """
+        job = EncodeJob('XXXXXXXX2014-V00TES1', 'hls', priority=EncodePriority.BACKFILL, update_val_status=False)
+        job.enqueue()
+
+        mock_send_task.assert_called_once_with(
+            'worker_encode',
+            args=('XXXXXXXX2014-V00TES1', 'hls', job.job_id, False),
+            queue='worker_low_queue',
+            connect_timeout=3
+        )
+
+    def test_route_long_encodes(self):
+        """
+        Verify that encodes estimated to take long go to the long queue when it is configured.
+        """
+        config = dict(CONFIG_DATA, celery_worker_long_queue='worker_long_queue', encode_long_job_seconds=3600)
+        self.assertEqual(route_encode(EncodePriority.NEW_UPLOAD, 4000, config), 'worker_long_queue')
+        self.assertEqual(route_encode(EncodePriority.NEW_UPLOAD, 60, config), 'worker_high_queue')
+        self.assertEqual(route_encode(EncodePriority.NEW_UPLOAD, None, config), 'worker_high_queue')
+        self.assertEqual(route_encode(EncodePriority.NEW_UPLOAD, 4000, CONFIG_DATA), 'worker_high_queue')
+
+    @patch('control.encode_worker_tasks.app.send_task')
+    def test_enqueue_explicit_queue(self, mock_send_task):
+        """
+        Verify that an explicitly passed queue takes precedence over the lane.
+        """
+        enqueue_encode('XXXXXXXX2014-V00TES1', 'desktop_mp4', 'job', 'some_queue')
+        self.assertEqual(mock_send_task.call_args[1]['queue'], 'some_queue')
+
+
+@patch('control.encode_worker_tasks.app.send_task')
+class InFlightEncodeTests(TestCase):
+    """
+    Tests for the in-flight encode registry
+    """
+    def test_duplicate_enqueue(self, mock_send_task):
+        """
+        Verify that an encode is sent only once while it is in flight.
+        """
+        self.assertTrue(enqueue_encode('XXXXXXXX2014-V00TES1', 'desktop_mp4', 'job1'))
+        self.assertFalse(enqueue_encode('XXXXXXXX2014-V00TES1', 'desktop_mp4', 'job2'))
+        self.assertTrue(enqueue_encode('XXXXXXXX2014-V00TES1', 'mobile_low', 'job3'))
+
+        self.assertEqual(mock_send_task.call_count, 2)
+        self.assertEqual(InFlightEncode.objects.get(encode_profile='desktop_mp4').job_id, 'job1')
+
+    def test_enqueue_after_release(self, mock_send_task):
+        """
+        Verify that a delivered encode can be enqueued again.
+        """
+        enqueue_encode('XXXXXXXX2014-V00TES1', 'desktop_mp4', 'job1')
+        InFlightEncode.release('XXXXXXXX2014-V00TES1', 'desktop_mp4')
+
+        self.assertTrue(enqueue_encode('XXXXXXXX2014-V00TES1', 'desktop_mp4', 'job2'))
+        self.assertEqual(mock_send_task.call_count, 2)
+
+    def test_stale_registration(self, mock_send_task):
+        """
+        Verify that an encode which was never delivered is enqueued again once the registration is stale.
+        """
+        enqueue_encode('XXXXXXXX2014-V00TES1', 'desktop_mp4', 'job1')
+        InFlightEncode.objects.update(modified=timezone.now() - timedelta(days=2))
+
+        self.assertTrue(enqueue_encode('XXXXXXXX2014-V00TES1', 'desktop_mp4', 'job2'))
+        self.assertEqual(InFlightEncode.objects.get().job_id, 'job2')
+        self.assertEqual(mock_send_task.call_count, 2)
+
+    def test_failed_send(self, mock_send_task):
+        """
+        Verify that the registration is cleared if the encode could not be sent.
+        """
+        mock_send_task.side_effect = IOError
+        with self.assertRaises(IOError):
+            enqueue_encode('XXXXXXXX2014-V00TES1', 'desktop_mp4', 'job1')
+
+        self.assertFalse(InFlightEncode.objects.exists())
+
+
+class LaneRateLimiterTests(TestCase):
+    """
+    Tests for `LaneRateLimiter`
+    """
+    def test_acquire(self):
+        """
+        Verify that enqueues are spaced out according to the rate.
+        """
+        clock = [100.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        limiter = LaneRateLimiter(4, clock=lambda: clock[0], sleep=sleep)
+        for __ in range(3):
+            limiter.acquire()
+
+        self.assertEqual(sleeps, [0.25, 0.25])
+
+    def test_unlimited_lane(self):
+        """
+        Verify that lanes without a rate are not limited and limiters are reused.
+        """
+        config = dict(CONFIG_DATA, encode_lane_rate_limits={EncodePriority.BACKFILL: 2})
+        self.assertIsNone(get_rate_limiter(EncodePriority.NEW_UPLOAD, config))
+        self.assertIs(get_rate_limiter(EncodePriority.BACKFILL, config),
+                      get_rate_limiter(EncodePriority.BACKFILL, config))
+
+
+@patch.dict('control.encode_worker_tasks.auth_dict', CONFIG_DATA)
+@patch.dict('control.encode_worker_tasks.auth_dict', encode_fair_share_target_depth={EncodePriority.NEW_UPLOAD: 4})
+@patch('control.encode_worker_tasks.get_queue_depth', return_value=0)
+@patch('control.encode_worker_tasks.app.send_task')
+class FairShareDispatcherTests(TestCase):
+    """
+    Tests for fair share dispatching of encodes
+    """
+    def setUp(self):
+        self.videos = {}
+        for institution, count in (('BIG', 6), ('SML', 2)):
+            course = CourseFactory(institution=institution)
+            self.videos[institution] = [
+                VideoFactory(inst_class=course, edx_id='{}{}-V00000{}'.format(institution, course.pk, index))
+                for index in range(count)
+            ]
+
+    def hold(self, institution):
+        for video in self.videos[institution]:
+            with patch('control.encode_worker_tasks.dispatch_encodes'):
+                self.assertTrue(enqueue_encode(video.edx_id, 'desktop_mp4', 'job', priority=EncodePriority.NEW_UPLOAD))
+
+    def dispatched_institutions(self, mock_send_task):
+        return [call[1]['args'][0][:3] for call in mock_send_task.call_args_list]
+
+    def test_encodes_held(self, mock_send_task, mock_get_queue_depth):
+        """
+        Verify that encodes of a fair share lane are held, and encodes of other lanes are sent.
+        """
+        self.hold('BIG')
+        enqueue_encode(self.videos['SML'][0].edx_id, 'hls', 'job', priority=EncodePriority.BACKFILL)
+
+        self.assertEqual(InFlightEncode.objects.filter(held=True, share_key='BIG').count(), 6)
+        self.assertEqual(self.dispatched_institutions(mock_send_task), ['SML'])
+
+    def test_round_robin(self, mock_send_task, mock_get_queue_depth):
+        """
+        Verify that the room in the worker queue is shared between institutions, and held encodes stay in order.
+        """
+        self.hold('BIG')
+        self.hold('SML')
+
+        dispatcher = FairShareDispatcher(EncodePriority.NEW_UPLOAD, target_depth=4)
+        self.assertEqual(dispatcher.dispatch(), 4)
+
+        self.assertEqual(self.dispatched_institutions(mock_send_task), ['BIG', 'SML', 'BIG', 'SML'])
+        self.assertEqual(mock_send_task.call_args_list[0][1]['queue'], 'worker_high_queue')
+        self.assertEqual(
+            sorted(InFlightEncode.objects.filter(held=True).values_list('veda_id', flat=True)),
+            sorted(video.edx_id for video in self.videos['BIG'][2:])
+        )
+
+    def test_weighted(self, mock_send_task, mock_get_queue_depth):
+        """
+        Verify that weights give an institution more encodes per turn.
+        """
+        self.hold('SML')
+        self.hold('BIG')
+
+        dispatcher = FairShareDispatcher(EncodePriority.NEW_UPLOAD, target_depth=6, weights={'BIG': 3})
+        self.assertEqual(dict(dispatcher.allocate(6)), {'SML': 2, 'BIG': 4})
+
+    def test_measured_room(self, mock_send_task, mock_get_queue_depth):
+        """
+        Verify that nothing is dispatched while the worker queue is at its target depth.
+        """
+        self.hold('BIG')
+        mock_get_queue_depth.return_value = 3
+
+        self.assertEqual(FairShareDispatcher(EncodePriority.NEW_UPLOAD, target_depth=4).dispatch(), 1)
+        mock_get_queue_depth.return_value = 4
+        self.assertEqual(FairShareDispatcher(EncodePriority.NEW_UPLOAD, target_depth=4).dispatch(), 0)
+
+    def test_unknown_depth(self, mock_send_task, mock_get_queue_depth):
+        """
+        Verify that nothing is dispatched while the depth of the worker queue can't be measured.
+        """
+        self.hold('BIG')
+        mock_get_queue_depth.return_value = None
+
+        self.assertEqual(FairShareDispatcher(EncodePriority.NEW_UPLOAD, target_depth=4).dispatch(), 0)
+        self.assertFalse(mock_send_task.called)
+        self.assertEqual(InFlightEncode.objects.filter(held=True).count(), 6)
+
+    @patch('control.encode_worker_tasks.app.connection_or_acquire')
+    def test_missing_queue(self, mock_connection, mock_send_task, mock_get_queue_depth):
+        """
+        Verify that a worker queue the broker deleted once it drained counts as empty, and held encodes are sent.
+        """
+        mock_connection.side_effect = lambda: Connection('memory://')
+        mock_get_queue_depth.side_effect = get_queue_depth
+        self.hold('SML')
+
+        self.assertEqual(get_queue_depth('worker_high_queue'), 0)
+        self.assertEqual(FairShareDispatcher(EncodePriority.NEW_UPLOAD, target_depth=4).dispatch(), 2)
+        self.assertEqual(self.dispatched_institutions(mock_send_task), ['SML', 'SML'])
+        self.assertFalse(InFlightEncode.objects.filter(held=True).exists())
+
+    def test_failed_dispatch(self, mock_send_task, mock_get_queue_depth):
+        """
+        Verify that an encode that could not be sent stays held.
+        """
+        self.hold('SML')
+        mock_send_task.side_effect = IOError
+
+        self.assertEqual(FairShareDispatcher(EncodePriority.NEW_UPLOAD, target_depth=4).dispatch(), 0)
+        self.assertEqual(InFlightEncode.objects.filter(held=True).count(), 2)
+
+    def test_shortest_first(self, mock_send_task, mock_get_queue_depth):
+        """
+        Verify that the held encodes of an institution are dispatched shortest first, unless held for too long.
+        """
+        durations = ['01:00:00', '00:01:00', '00:10:00', '02:00:00', '03:00:00', '03:00:00']
+        for video, duration in zip(self.videos['BIG'], durations):
+            video.video_orig_duration = duration
+            video.save()
+        self.hold('BIG')
+        InFlightEncode.objects.filter(veda_id=self.videos['BIG'][3].edx_id).update(
+            created=timezone.now() - timedelta(hours=2)
+        )
+
+        FairShareDispatcher(EncodePriority.NEW_UPLOAD, target_depth=3).dispatch()
+
+        self.assertEqual(
+            [call[1]['args'][0] for call in mock_send_task.call_args_list],
+            [self.videos['BIG'][index].edx_id for index in (3, 1, 2)]
+        )
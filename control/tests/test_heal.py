@@ -10,12 +10,13 @@ from django.test import TestCase
 from datetime import timedelta
 from ddt import data, ddt, unpack
 import responses
+from django.utils import timezone
 from django.utils.timezone import utc
-from mock import PropertyMock, patch
+from mock import Mock, PropertyMock, patch
 
 from control_env import HEAL_START
 from control.veda_heal import VedaHeal
-from VEDA_OS01.models import URL, Course, Destination, Encode, Video, TranscriptStatus
+from VEDA_OS01.models import URL, Course, Destination, Encode, HealWorkItem, SkippedEncode, Video, TranscriptStatus
 from VEDA_OS01.utils import ValTranscriptStatus
 from VEDA.utils import build_url, get_config
 
@@ -333,3 +334,109 @@ class HealTests(TestCase):
         )
 
         self.assertEqual(longterm_corrupt, expected_long_corrupt)
+
+
+@patch('control.veda_heal.EncodeJob')
+@patch('control.veda_heal.VALAPICall', Mock())
+class HealWorkSetTests(TestCase):
+    """
+    Tests for the incremental heal of the work set.
+    """
+    def setUp(self):
+        self.course = Course.objects.create(institution='XXX', edx_classid='XXXXX', local_storedir='course-v1:XXX')
+        self.video = Video.objects.create(inst_class=self.course, studio_id='12345', edx_id='XXXXXXXX2014-V00TES1')
+        self.now = datetime.datetime.utcnow().replace(tzinfo=utc)
+
+    def heal(self, encodes):
+        heal = VedaHeal()
+        heal.auth_dict = dict(heal.auth_dict, redis_broker=True)
+        heal.determine_fault = Mock(return_value=set(encodes))
+        heal.discovery()
+        return heal
+
+    def add_item(self, encode_profile, next_check, attempts=1):
+        return HealWorkItem.objects.create(
+            video=self.video, encode_profile=encode_profile, next_check=next_check, attempts=attempts
+        )
+
+    def items(self):
+        return {
+            item.encode_profile: (item.attempts, item.next_check)
+            for item in HealWorkItem.objects.filter(video=self.video)
+        }
+
+    def test_only_due_encodes(self, mock_encode_job):
+        """
+        Verify that only the due encodes of the work set are enqueued, with an exponential backoff.
+        """
+        self.add_item('mobile_low', self.now - timedelta(minutes=1), attempts=2)
+        self.add_item('desktop_mp4', self.now + timedelta(hours=1))
+        other_video = Video.objects.create(inst_class=self.course, studio_id='other', edx_id='XXXXXXXX2014-V00TES2')
+
+        heal = self.heal(['mobile_low', 'desktop_mp4'])
+
+        heal.determine_fault.assert_called_once_with(video_object=self.video)
+        self.assertNotIn(other_video, heal.video_query)
+        mock_encode_job.assert_called_once_with(self.video.edx_id, 'mobile_low', priority=heal.priority)
+        items = self.items()
+        self.assertEqual(items['mobile_low'], (3, heal.current_time + timedelta(hours=24)))
+        self.assertEqual(items['desktop_mp4'][0], 1)
+
+    def test_settled_encodes(self, mock_encode_job):
+        """
+        Verify that encodes the video no longer needs leave the work set.
+        """
+        self.add_item('mobile_low', self.now - timedelta(minutes=1))
+        self.add_item('desktop_mp4', self.now + timedelta(hours=1))
+
+        self.heal([])
+
+        self.assertFalse(mock_encode_job.called)
+        self.assertEqual(self.items(), {})
+
+    def test_give_up(self, mock_encode_job):
+        """
+        Verify that heal stops checking an encode after the maximum attempts.
+        """
+        self.add_item('mobile_low', self.now - timedelta(minutes=1), attempts=4)
+
+        self.heal(['mobile_low'])
+        self.assertEqual(self.items(), {'mobile_low': (5, None)})
+
+        self.heal(['mobile_low'])
+        self.assertEqual(mock_encode_job.call_count, 1)
+
+    def test_changes(self, mock_encode_job):
+        """
+        Verify that deliveries and skips settle work items, and video status changes make waiting items due.
+        """
+        encode = Encode.objects.create(
+            product_spec='mobile_low', encode_destination=Destination.objects.create(destination_name='destination')
+        )
+        self.add_item('mobile_low', self.now + timedelta(hours=1))
+        self.add_item('desktop_mp4', None, attempts=5)
+        self.add_item('audio_mp3', self.now + timedelta(hours=1))
+
+        self.video.video_trans_status = 'Review Hold'
+        self.video.save()
+        items = self.items()
+        self.assertEqual(items.pop('desktop_mp4'), (5, None))
+        self.assertTrue(all(next_check <= timezone.now() for __, next_check in items.values()))
+
+        URL.objects.create(videoID=self.video, encode_profile=encode, encode_url='http://veda.edx.org/encode')
+        SkippedEncode.objects.create(video=self.video, encode_profile='audio_mp3', reason='no audio')
+        self.assertEqual(list(self.items()), ['desktop_mp4'])
+
+    def test_unrelated_changes(self, mock_encode_job):
+        """
+        Verify that saving a video without changing its status keeps the backoff of its work items.
+        """
+        next_check = self.now + timedelta(hours=1)
+        self.add_item('mobile_low', next_check, attempts=2)
+
+        video = Video.objects.get(pk=self.video.pk)
+        video.client_title = 'Renamed'
+        video.save()
+        Video.objects.get(pk=self.video.pk).save()
+
+        self.assertEqual(self.items(), {'mobile_low': (2, next_check)})
@@ -0,0 +1,66 @@
+"""
+Test review approval status lookups
+"""
+
+from xmlrpc.client import ProtocolError
+
+from django.core.cache import cache
+from django.test import TestCase
+from mock import patch
+
+from control.veda_review_status import ReviewStatusService
+
+
+def review_task(name, status):
+    return {'type': 'Task', 'entity': {'type': 'Shot', 'name': name}, 'sg_status_list': status}
+
+
+class ReviewStatusServiceTests(TestCase):
+    """
+    Tests for `ReviewStatusService`
+    """
+    def setUp(self):
+        cache.clear()
+        shotgun_patcher = patch('control.veda_review_status.Shotgun')
+        self.mock_shotgun = shotgun_patcher.start()
+        self.addCleanup(shotgun_patcher.stop)
+        self.session = self.mock_shotgun.return_value
+        self.service = ReviewStatusService('https://shotgun.example.com', 'script', 'key')
+
+    def test_approval_cached(self):
+        """
+        Verify that a video is looked up with one filtered query over a reused session, and its approval cached.
+        """
+        self.session.find.return_value = [review_task('V001', 'apr')]
+
+        self.assertTrue(self.service.is_approved(123, 'V001'))
+        self.assertTrue(self.service.is_approved(123, 'V001'))
+
+        self.session.find.return_value = [review_task('V002', 'wtg')]
+        self.assertFalse(self.service.is_approved(123, 'V002'))
+
+        self.assertEqual(self.mock_shotgun.call_count, 1)
+        self.assertEqual(self.session.find.call_count, 2)
+        self.assertIn(['entity', 'name_is', 'V002'], self.session.find.call_args[0][1])
+
+    def test_refresh(self):
+        """
+        Verify that refreshing a project looks its videos up again.
+        """
+        self.session.find.return_value = [review_task('V001', 'wtg')]
+        self.assertFalse(self.service.is_approved(123, 'V001'))
+
+        self.session.find.return_value = [review_task('V001', 'apr')]
+        self.assertFalse(self.service.is_approved(123, 'V001'))
+        self.service.refresh(123)
+        self.assertTrue(self.service.is_approved(123, 'V001'))
+
+    def test_api_error(self):
+        """
+        Verify that API errors are not cached, and the broken session is replaced.
+        """
+        self.session.find.side_effect = [ProtocolError('url', 502, 'Bad Gateway', {}), [review_task('V001', 'apr')]]
+
+        self.assertFalse(self.service.is_approved(123, 'V001'))
+        self.assertTrue(self.service.is_approved(123, 'V001'))
+        self.assertEqual(self.mock_shotgun.call_count, 2)
@@ -0,0 +1,122 @@
+"""
+Tests for the scheduler service
+"""
+
+import datetime
+import threading
+
+import pytz
+from django.test import TestCase
+from django.utils import timezone
+from mock import Mock, patch
+
+from control.veda_scheduler import PeriodicJob, Scheduler, get_jobs, run_job
+from VEDA_OS01.models import ScheduledJob
+
+
+class PeriodicJobTests(TestCase):
+    """
+    Tests for the schedule of `PeriodicJob`
+    """
+    def test_backoff(self):
+        """
+        Verify that a polling job backs off while it finds nothing and returns to its interval when it finds work.
+        """
+        job = PeriodicJob('poll', Mock(), interval=10, max_interval=35, jitter=0)
+
+        intervals = []
+        for found_work in (0, 0, 0, 0, 3, None):
+            job.schedule(1000, found_work)
+            intervals.append(job.next_run - 1000)
+
+        self.assertEqual(intervals, [20, 35, 35, 35, 10, 10])
+
+    def test_jitter(self):
+        """
+        Verify that run times are jittered within the jitter fraction of the interval.
+        """
+        job = PeriodicJob('poll', Mock(), interval=100, jitter=0.1)
+        for __ in range(20):
+            job.schedule(0, True)
+            self.assertTrue(90 <= job.next_run <= 110)
+
+    def test_daily(self):
+        """
+        Verify that daily jobs run at their time of day in their timezone.
+        """
+        new_york = pytz.timezone('America/New_York')
+        job = PeriodicJob('heal', Mock(), daily_at='00:00', timezone='America/New_York')
+
+        now = new_york.localize(datetime.datetime(2020, 3, 7, 23, 0)).timestamp()
+        job.start(now)
+        self.assertEqual(datetime.datetime.fromtimestamp(job.next_run, new_york).isoformat(), '2020-03-08T00:00:00-05:00')
+
+        job.schedule(job.next_run)
+        self.assertEqual(datetime.datetime.fromtimestamp(job.next_run, new_york).isoformat(), '2020-03-09T00:00:00-04:00')
+
+    def test_config_overrides(self):
+        """
+        Verify that the schedule of the declared jobs can be overridden.
+        """
+        job, = get_jobs(['about_video_ingest'], config={'scheduler_jobs': {'about_video_ingest': {'interval': 5}}})
+
+        self.assertEqual((job.interval, job.max_interval), (5, 300))
+        with self.assertRaises(ValueError):
+            get_jobs(['unknown'], config={})
+
+
+class RunJobTests(TestCase):
+    """
+    Tests for `run_job`
+    """
+    def test_metrics(self):
+        """
+        Verify that runs and failures are recorded.
+        """
+        job = PeriodicJob('poll', Mock(side_effect=[2, Exception]))
+
+        self.assertEqual(run_job(job), 2)
+        self.assertIsNone(run_job(job))
+
+        scheduled_job = ScheduledJob.objects.get(name='poll')
+        self.assertEqual((scheduled_job.runs, scheduled_job.failures), (2, 1))
+        self.assertIsNone(scheduled_job.running_since)
+        self.assertIsNotNone(scheduled_job.last_duration)
+
+    def test_no_overlap(self):
+        """
+        Verify that a job running elsewhere is skipped, unless its run is older than the lock timeout.
+        """
+        job = PeriodicJob('heal', Mock(return_value=None), lock_timeout=60)
+        ScheduledJob.objects.create(name='heal', running_since=timezone.now())
+
+        run_job(job)
+        self.assertFalse(job.func.called)
+
+        ScheduledJob.objects.filter(name='heal').update(running_since=timezone.now() - datetime.timedelta(minutes=2))
+        run_job(job)
+        self.assertTrue(job.func.called)
+
+
+class SchedulerTests(TestCase):
+    """
+    Tests for `Scheduler`
+    """
+    def test_run_pending(self):
+        """
+        Verify that due jobs are started once, and not again while they are running.
+        """
+        release = threading.Event()
+        job = PeriodicJob('poll', Mock(), interval=10, jitter=0)
+        scheduler = Scheduler([job])
+        self.addCleanup(scheduler.executor.shutdown)
+
+        with patch('control.veda_scheduler.run_job', side_effect=lambda job: release.wait()) as mock_run_job:
+            self.assertEqual(scheduler.run_pending(now=1000), 60)
+            scheduler.run_pending(now=1001)
+            release.set()
+            scheduler.executor.shutdown(wait=True)
+
+        self.assertEqual(mock_run_job.call_count, 1)
+        self.assertNotIn('poll', scheduler.running)
+        self.assertGreater(job.next_run, 1000)
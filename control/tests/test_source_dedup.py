@@ -0,0 +1,95 @@
+"""
+Tests for reusing the encodes of identical sources
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.test import TestCase
+from mock import patch
+
+from control.veda_source_dedup import fingerprint, reuse_duplicate_encodes
+from VEDA.utils import get_config
+from VEDA_OS01.models import URL, Video
+from VEDA_OS01.tests.factories import CourseFactory, DestinationFactory, EncodeFactory, UrlFactory, VideoFactory
+
+SOURCE_HASH = 'a' * 64
+
+
+@patch('control.veda_source_dedup.VALAPICall')
+class SourceDedupTests(TestCase):
+    """
+    Tests for `reuse_duplicate_encodes`
+    """
+    def setUp(self):
+        self.config = get_config()
+        self.course = CourseFactory(s3_proc=True, yt_proc=False, review_proc=False)
+        destination = DestinationFactory(destination_active=True)
+        self.encodes = {
+            product_spec: EncodeFactory(encode_destination=destination, product_spec=product_spec, profile_active=True)
+            for product_spec in ('mobile_low', 'desktop_mp4')
+        }
+        self.original = VideoFactory(inst_class=self.course, source_hash=SOURCE_HASH, video_active=True)
+        self.video = VideoFactory(inst_class=self.course, source_hash=SOURCE_HASH, video_active=True)
+
+    def add_url(self, product_spec, video=None):
+        return UrlFactory(
+            videoID=video or self.original,
+            encode_profile=self.encodes[product_spec],
+            encode_bitdepth='1200 kb/s',
+            encode_size=100,
+        )
+
+    def test_fingerprint(self, mock_val):
+        """
+        Verify that files are fingerprinted with their SHA-256.
+        """
+        with tempfile.NamedTemporaryFile(delete=False) as source_file:
+            source_file.write(b'source' * 1000)
+        self.addCleanup(os.remove, source_file.name)
+
+        self.assertEqual(
+            fingerprint(source_file.name, chunk_size=100),
+            hashlib.sha256(b'source' * 1000).hexdigest()
+        )
+
+    def test_reuse_encodes(self, mock_val):
+        """
+        Verify that the URLs of an identical source with every needed encode are cloned and sent to VAL.
+        """
+        urls = {product_spec: self.add_url(product_spec) for product_spec in ('mobile_low', 'desktop_mp4')}
+
+        self.assertTrue(reuse_duplicate_encodes(self.course, self.video.edx_id, self.config))
+
+        cloned = {url.encode_profile.product_spec: url.encode_url for url in URL.objects.filter(videoID=self.video)}
+        self.assertEqual(cloned, {product_spec: url.encode_url for product_spec, url in urls.items()})
+        self.assertEqual(Video.objects.get(pk=self.video.pk).video_trans_status, 'Complete')
+        __, kwargs = mock_val.call_args
+        self.assertEqual(kwargs['val_status'], 'file_complete')
+        self.assertEqual(
+            sorted(encoded_video['profile'] for encoded_video in kwargs['encode_data']),
+            ['desktop_mp4', 'mobile_low']
+        )
+        mock_val.return_value.call.assert_called_once_with()
+
+    def test_incomplete_duplicate(self, mock_val):
+        """
+        Verify that a source is encoded if its duplicate lacks a needed encode.
+        """
+        self.add_url('mobile_low')
+
+        self.assertFalse(reuse_duplicate_encodes(self.course, self.video.edx_id, self.config))
+        self.assertFalse(URL.objects.filter(videoID=self.video).exists())
+        self.assertFalse(mock_val.called)
+
+    def test_different_source(self, mock_val):
+        """
+        Verify that sources with a different fingerprint are encoded.
+        """
+        self.add_url('mobile_low')
+        self.add_url('desktop_mp4')
+        Video.objects.filter(pk=self.video.pk).update(source_hash='b' * 64)
+
+        self.assertFalse(reuse_duplicate_encodes(self.course, self.video.edx_id, self.config))
+        self.assertFalse(mock_val.called)
@@ -0,0 +1,138 @@
+"""
+Test SQS ingest consumer
+"""
+
+import json
+
+import boto
+import boto.sqs
+from boto.sqs.message import RawMessage
+from django.test import TestCase
+from mock import Mock, patch
+from moto import mock_s3_deprecated, mock_sqs_deprecated
+
+from control.veda_sqs_ingest import SqsIngestConsumer, get_message_s3_keys
+from control.veda_work_directory import WorkDirectoryFull
+from VEDA.utils import get_config
+
+CONFIG_DATA = get_config('test_config.yaml')
+
+
+def s3_event(*keys):
+    return json.dumps({'Records': [{'s3': {'object': {'key': key}}} for key in keys]})
+
+
+@mock_s3_deprecated
+@mock_sqs_deprecated
+class SqsIngestConsumerTests(TestCase):
+    """
+    Tests for `SqsIngestConsumer` against a local SQS stand-in.
+    """
+    def setUp(self):
+        self.bucket_name = CONFIG_DATA['edx_s3_ingest_bucket']
+        bucket = boto.connect_s3().create_bucket(self.bucket_name)
+        for key_name in ('ingest/video1', 'ingest/video2', 'ingest/video3'):
+            bucket.new_key(key_name).set_contents_from_string('video')
+
+        self.queue = boto.sqs.connect_to_region('us-east-1').create_queue('ingest-queue')
+        self.consumer = SqsIngestConsumer(self.queue, self.bucket_name, max_workers=2, wait_time_seconds=0)
+
+        discovery_patcher = patch('control.veda_sqs_ingest.FileDiscovery')
+        self.mock_ingest = discovery_patcher.start().return_value.validate_metadata_and_feed_to_ingest
+        self.mock_ingest.return_value = True
+        self.addCleanup(discovery_patcher.stop)
+
+    def send(self, body):
+        self.queue.write(RawMessage(body=body))
+
+    def ingested_keys(self):
+        return sorted(call[1]['video_s3_key'].name for call in self.mock_ingest.call_args_list)
+
+    def test_consume(self):
+        """
+        Verify that S3 and SNS wrapped events are ingested and their messages deleted.
+        """
+        self.send(s3_event('ingest/video1', 'ingest/video2'))
+        self.send(json.dumps({'Type': 'Notification', 'Message': s3_event('ingest/video3')}))
+
+        self.consumer.run(max_polls=2)
+
+        self.assertEqual(self.ingested_keys(), ['ingest/video1', 'ingest/video2', 'ingest/video3'])
+        self.assertEqual(self.queue.count(), 0)
+
+    def test_failed_ingest(self):
+        """
+        Verify that the message of a failed ingest is kept for a retry.
+        """
+        self.mock_ingest.return_value = False
+        self.send(s3_event('ingest/video1'))
+
+        with patch.object(self.queue, 'delete_message', wraps=self.queue.delete_message) as mock_delete:
+            self.consumer.run(max_polls=1)
+            self.assertFalse(mock_delete.called)
+
+        self.assertEqual(self.ingested_keys(), ['ingest/video1'])
+
+    def test_full_work_directory(self):
+        """
+        Verify that the message of an ingest finding no room in the working storage is kept for a retry.
+        """
+        self.mock_ingest.side_effect = WorkDirectoryFull
+        self.send(s3_event('ingest/video1'))
+
+        with patch.object(self.queue, 'delete_message', wraps=self.queue.delete_message) as mock_delete:
+            self.assertFalse(self.consumer.ingest('ingest/video1'))
+            self.consumer.run(max_polls=1)
+            self.assertFalse(mock_delete.called)
+
+    def test_processed_and_malformed_messages(self):
+        """
+        Verify that messages for keys that are gone and malformed messages are deleted without ingest.
+        """
+        self.send(s3_event('ingest/already-processed'))
+        self.send('not json')
+
+        self.consumer.run(max_polls=2)
+
+        self.assertFalse(self.mock_ingest.called)
+        self.assertEqual(self.queue.count(), 0)
+
+    def test_receive_backpressure(self):
+        """
+        Verify that no more messages are received than there are free workers.
+        """
+        for __ in range(5):
+            self.send(s3_event('ingest/video1'))
+
+        pool = Mock()
+        self.assertEqual(self.consumer.receive(pool), 2)
+        self.assertEqual(pool.submit.call_count, 2)
+
+    def test_extend_visibility(self):
+        """
+        Verify that the visibility of in-flight messages is extended.
+        """
+        message = Mock()
+        self.consumer._in_flight.add(message)  # pylint: disable=protected-access
+
+        self.consumer.extend_visibility()
+
+        message.change_visibility.assert_called_once_with(self.consumer.visibility_timeout)
+
+
+class MessageKeysTests(TestCase):
+    """
+    Tests for `get_message_s3_keys`
+    """
+    def test_get_message_s3_keys(self):
+        """
+        Verify that the keys of a message are de-duplicated.
+        """
+        self.assertEqual(get_message_s3_keys(s3_event('a', 'b', 'a')), ['a', 'b'])
+
+    def test_no_records(self):
+        """
+        Verify that a message without records is reported.
+        """
+        with self.assertRaises(ValueError):
+            get_message_s3_keys(json.dumps({'Event': 's3:TestEvent'}))
@@ -0,0 +1,82 @@
+"""
+Test VEDA video number allocation
+"""
+
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from control.veda_id_allocator import VIDEO_NUMBER_STEP, VedaIdAllocator
+from VEDA_OS01.models import Course, VedaIdBlock
+from VEDA_OS01.tests.factories import CourseFactory
+
+
+class VedaIdAllocatorTests(TestCase):
+    """
+    Tests for `VedaIdAllocator`
+    """
+    def setUp(self):
+        self.course = CourseFactory(last_vid_number=500)
+        self.allocator = VedaIdAllocator(block_size=3)
+
+    def last_vid_number(self):
+        return Course.objects.get(pk=self.course.pk).last_vid_number
+
+    def test_numbers_from_block(self):
+        """
+        Verify that numbers are handed out from a reserved block and the course is only locked per block.
+        """
+        self.assertEqual(self.allocator.next_number(self.course.course_name), 600)
+        self.assertEqual(self.last_vid_number(), 800)
+
+        # Numbers left in the block are handed out without touching the course.
+        Course.objects.filter(pk=self.course.pk).update(last_vid_number=0)
+        numbers = [self.allocator.next_number(self.course.course_name) for __ in range(2)]
+        self.assertEqual(numbers, [700, 800])
+        self.assertEqual(self.last_vid_number(), 0)
+        Course.objects.filter(pk=self.course.pk).update(last_vid_number=800)
+
+        # The exhausted block is removed and the next number comes from a new block.
+        self.assertFalse(VedaIdBlock.objects.exists())
+        self.assertEqual(self.allocator.next_number(self.course.course_name), 900)
+        self.assertEqual(self.last_vid_number(), 1100)
+
+    def test_workers_do_not_overlap(self):
+        """
+        Verify that every worker gets its own block.
+        """
+        other_allocator = VedaIdAllocator(block_size=3)
+        numbers = [
+            allocator.next_number(self.course.course_name)
+            for allocator in (self.allocator, other_allocator, self.allocator, other_allocator)
+        ]
+
+        self.assertEqual(numbers, [600, 900, 700, 1000])
+        self.assertEqual(len(set(numbers)), 4)
+
+    def test_stale_block_adopted(self):
+        """
+        Verify that the unused numbers of a worker that went away are recovered by another worker.
+        """
+        self.assertEqual(self.allocator.next_number(self.course.course_name), 600)
+        VedaIdBlock.objects.update(modified=timezone.now() - timedelta(days=1))
+
+        other_allocator = VedaIdAllocator(block_size=3)
+        self.assertEqual(other_allocator.next_number(self.course.course_name), 700)
+        self.assertEqual(self.last_vid_number(), 800)
+
+        # The former owner no longer hands out numbers from the adopted block.
+        self.assertEqual(self.allocator.next_number(self.course.course_name), 900)
+        self.assertEqual(other_allocator.next_number(self.course.course_name), 800)
+
+    def test_block_of_one(self):
+        """
+        Verify that a block size of one keeps numbering identical to a per ingest reservation.
+        """
+        allocator = VedaIdAllocator(block_size=1)
+        numbers = [allocator.next_number(self.course.course_name) for __ in range(2)]
+
+        self.assertEqual(numbers, [600, 700])
+        self.assertEqual(self.last_vid_number(), 700)
+        self.assertEqual(VIDEO_NUMBER_STEP, 100)
@@ -0,0 +1,224 @@
+"""
+Test working storage manager
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+from celery.exceptions import Retry
+from django.test import TestCase
+from mock import Mock, patch
+
+from control.http_ingest_celeryapp import WORK_DIRECTORY_FULL_RETRY_SECONDS, ingest_video_and_upload_to_hotstore
+from control.veda_file_discovery import FileDiscovery
+from control.veda_work_directory import WorkDirectory, WorkDirectoryFull
+from VEDA.utils import get_config
+
+CONFIG_DATA = get_config('test_config.yaml')
+DiskUsage = namedtuple('DiskUsage', 'total used free')
+
+
+class WorkDirectoryTests(TestCase):
+    """
+    Tests for `WorkDirectory` on volumes of 1000 bytes.
+    """
+    def setUp(self):
+        self.volumes = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        for volume in self.volumes:
+            self.addCleanup(shutil.rmtree, volume)
+
+        disk_usage_patcher = patch('control.veda_work_directory.shutil.disk_usage', side_effect=self.disk_usage)
+        disk_usage_patcher.start()
+        self.addCleanup(disk_usage_patcher.stop)
+
+        self.work_directory = WorkDirectory(self.volumes[:1], high_water_mark=0.8, reserve_wait_seconds=0)
+
+    def disk_usage(self, volume):
+        paths = [os.path.join(volume, name) for name in os.listdir(volume)]
+        used = sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+        return DiskUsage(1000, used, 1000 - used)
+
+    def write(self, volume, name, size, age=0):
+        path = os.path.join(volume, name)
+        with open(path, 'w') as file_object:
+            file_object.write('x' * size)
+        last_used = time.time() - age
+        os.utime(path, (last_used, last_used))
+        return path
+
+    def test_reserve(self):
+        """
+        Verify that reserved space is accounted for until the reservation ends.
+        """
+        with self.work_directory.reserve(500, 'video.mp4') as volume:
+            self.assertEqual(volume, self.volumes[0])
+            self.assertEqual(self.work_directory.usage()[0]['reserved'], 500)
+            with self.assertRaises(WorkDirectoryFull):
+                with self.work_directory.reserve(400, 'other.mp4'):
+                    pass
+
+        self.assertEqual(self.work_directory.usage()[0]['reserved'], 0)
+
+    def test_reserve_released(self):
+        """
+        Verify that a reservation held outside of a `with` block lasts until it is released.
+        """
+        reservation = self.work_directory.reserve(500, 'video.mp4')
+        self.assertEqual(reservation.volume, self.volumes[0])
+        self.write(self.volumes[0], 'video.mp4', 200)
+        # Only the part of the file that is not written yet is counted as reserved.
+        self.assertEqual(self.work_directory.usage()[0]['reserved'], 300)
+
+        reservation.release()
+        self.assertEqual(self.work_directory.usage()[0]['reserved'], 0)
+
+    def test_reservations_shared(self):
+        """
+        Verify that reservations are seen by the managers of other processes on the same volume.
+        """
+        other_process = WorkDirectory(self.volumes[:1], high_water_mark=0.8, reserve_wait_seconds=0)
+        in_use = self.write(self.volumes[0], 'in_use.mp4', 300, age=3 * 3600)
+
+        with self.work_directory.reserve(300, 'video.mp4'), self.work_directory.reserve(0, 'in_use.mp4'):
+            self.assertEqual(other_process.usage()[0]['reserved'], 300)
+            with self.assertRaises(WorkDirectoryFull):
+                with other_process.reserve(300, 'other.mp4'):
+                    pass
+            self.assertTrue(os.path.exists(in_use))
+
+        with other_process.reserve(600, 'other.mp4'):
+            self.assertFalse(os.path.exists(in_use))
+
+    def test_reservations_of_stopped_processes_dropped(self):
+        """
+        Verify that the reservations of processes that are no longer running are dropped.
+        """
+        self.work_directory.reserve(500, 'video.mp4')
+
+        with patch('control.veda_work_directory.is_process_alive', return_value=False):
+            self.assertEqual(self.work_directory.usage()[0]['reserved'], 0)
+        self.assertEqual(self.work_directory.usage()[0]['reserved'], 0)
+
+    def test_rename(self):
+        """
+        Verify that a renamed file stays reserved.
+        """
+        reservation = self.work_directory.reserve(0, 'video.mp4')
+        video = self.write(self.volumes[0], 'video.mp4', 700, age=3 * 3600)
+        renamed = os.path.join(self.volumes[0], 'renamed.mp4')
+        os.rename(video, renamed)
+        reservation.rename('renamed.mp4')
+
+        with self.assertRaises(WorkDirectoryFull):
+            with self.work_directory.reserve(200, 'other.mp4'):
+                pass
+        self.assertTrue(os.path.exists(renamed))
+
+        reservation.release()
+        with self.work_directory.reserve(200, 'other.mp4'):
+            self.assertFalse(os.path.exists(renamed))
+
+    def test_lru_eviction(self):
+        """
+        Verify that finished files are evicted least recently used first, and recent files are kept.
+        """
+        oldest = self.write(self.volumes[0], 'oldest.mp4', 300, age=3 * 3600)
+        older = self.write(self.volumes[0], 'older.mp4', 300, age=2 * 3600)
+        recent = self.write(self.volumes[0], 'recent.mp4', 100)
+
+        with self.work_directory.reserve(300, 'video.mp4'):
+            pass
+
+        self.assertFalse(os.path.exists(oldest))
+        self.assertTrue(os.path.exists(older))
+        self.assertTrue(os.path.exists(recent))
+
+        with self.assertRaises(WorkDirectoryFull):
+            with self.work_directory.reserve(800, 'video.mp4'):
+                pass
+        self.assertTrue(os.path.exists(recent))
+
+    def test_reserved_files_not_evicted(self):
+        """
+        Verify that a file is not evicted while it is reserved.
+        """
+        in_use = self.write(self.volumes[0], 'in_use.mp4', 700, age=3 * 3600)
+
+        with self.work_directory.reserve(0, 'in_use.mp4'):
+            with self.assertRaises(WorkDirectoryFull):
+                with self.work_directory.reserve(200, 'video.mp4'):
+                    pass
+            self.assertTrue(os.path.exists(in_use))
+
+    def test_spread_across_volumes(self):
+        """
+        Verify that a reservation goes to the volume with the most room.
+        """
+        work_directory = WorkDirectory(self.volumes, high_water_mark=0.8, reserve_wait_seconds=0)
+        self.write(self.volumes[0], 'video.mp4', 600)
+
+        with work_directory.reserve(300, 'other.mp4') as volume:
+            self.assertEqual(volume, self.volumes[1])
+
+    def test_purge(self):
+        """
+        Verify that purging removes old files only.
+        """
+        old = self.write(self.volumes[0], 'old.mp4', 10, age=2 * 86400)
+        recent = self.write(self.volumes[0], 'recent.mp4', 10, age=3600)
+
+        self.work_directory.purge(86400)
+
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
+
+    def test_download_reserved_until_released(self):
+        """
+        Verify that a downloaded video stays reserved until the caller is done with it.
+        """
+        def download(file_path):
+            with open(file_path, 'w') as video:
+                video.write('x' * 700)
+            os.utime(file_path, (time.time() - 3 * 3600,) * 2)
+
+        key = Mock(size=700, get_contents_to_filename=Mock(side_effect=download))
+        with patch('control.veda_file_discovery.get_work_directory', return_value=self.work_directory), \
+                patch('control.veda_file_discovery.get_config', return_value=dict(CONFIG_DATA, environment='prod')):
+            reservation = FileDiscovery(node_work_directory=self.volumes[0]).download_video_to_working_directory(
+                key, 'video.mp4'
+            )
+
+        self.assertEqual(reservation.volume, self.volumes[0])
+        with self.assertRaises(WorkDirectoryFull):
+            with self.work_directory.reserve(200, 'other.mp4'):
+                pass
+
+        reservation.release()
+        with self.work_directory.reserve(200, 'other.mp4'):
+            self.assertFalse(os.path.exists(os.path.join(self.volumes[0], 'video.mp4')))
+
+    @patch.dict('control.http_ingest_celeryapp.auth_dict', CONFIG_DATA)
+    @patch('control.http_ingest_celeryapp.boto')
+    def test_full_http_ingest_retried(self, mock_boto):
+        """
+        Verify that an HTTP ingest finding no room in the working storage is left in place and retried later.
+        """
+        key = Mock(size=900)
+        key.name = 'ingest/video.mp4'
+        mock_boto.connect_s3.return_value.get_bucket.return_value.get_key.return_value = key
+
+        with patch('control.veda_file_discovery.get_work_directory', return_value=self.work_directory), \
+                patch('control.veda_file_discovery.get_config', return_value=dict(CONFIG_DATA, environment='prod')), \
+                patch.object(FileDiscovery, 'get_or_create_course'), \
+                patch.object(FileDiscovery, 'move_video') as mock_move_video, \
+                patch.object(ingest_video_and_upload_to_hotstore, 'retry', side_effect=Retry) as mock_retry:
+            with self.assertRaises(Retry):
+                ingest_video_and_upload_to_hotstore('ingest/video.mp4')
+
+        self.assertFalse(key.get_contents_to_filename.called)
+        self.assertFalse(mock_move_video.called)
+        self.assertIsInstance(mock_retry.call_args[1]['exc'], WorkDirectoryFull)
+        self.assertEqual(mock_retry.call_args[1]['countdown'], WORK_DIRECTORY_FULL_RETRY_SECONDS)
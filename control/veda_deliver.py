@@ -25,10 +25,11 @@ from .veda_deliver_youtube import DeliverYoutube
 from VEDA_OS01 import utils
 from VEDA_OS01.models import (TranscriptCredentials, TranscriptProvider,
                               TranscriptStatus)
-from VEDA.utils import build_url, extract_course_org, get_config, delete_directory_contents
+from VEDA.utils import build_url, extract_course_org, get_config
 from .veda_utils import Metadata, Output, VideoProto
 from .veda_val import VALAPICall
 from .veda_video_validation import Validation
+from .veda_work_directory import get_work_directory
 
 try:
     from control.veda_deliver_3play import ThreePlayMediaClient
@@ -64,21 +65,29 @@ class VedaDelivery(object):
         self.endpoint_url = None
         self.video_proto = None
         self.val_status = None
+        # Working storage reservation of the encoded file
+        self.reservation = None
 
     def run(self):
         """
         Check the destination, route via available methods,
         throw error if method is not extant
         """
+        try:
+            self._deliver()
+        finally:
+            # The encoded file is kept in the working storage until the delivery ends.
+            if self.reservation is not None:
+                self.reservation.release()
+                self.reservation = None
+
+    def _deliver(self):
         LOGGER.info('[DELIVERY] {video_id} : {encode}'.format(video_id=self.veda_id, encode=self.encode_profile))
         if self.encode_profile == 'hls':
             # HLS encodes are a pass through
             self.hls_run()
 
         else:
-            if os.path.exists(WORK_DIRECTORY):
-                delete_directory_contents(WORK_DIRECTORY)
-
             self._INFORM_INTAKE()
 
             if self._VALIDATE() is False and \
@@ -222,6 +231,10 @@ class VedaDelivery(object):
             LOGGER.error('[DELIVERY] {url} : S3 Intake Object not found'.format(url=self.hotstore_url))
             return
 
+        # Finished files of earlier deliveries are evicted only if the space is needed.
+        self.reservation = get_work_directory(self.node_work_directory).reserve(
+            source_key.size, self.encoded_file, volume=self.node_work_directory
+        )
         source_key.get_contents_to_filename(
             os.path.join(self.node_work_directory, self.encoded_file)
         )
@@ -302,11 +315,7 @@ class VedaDelivery(object):
         if self.status is None:
             return None
 
-        Video.objects.filter(
-            pk=self.video_query.pk
-        ).update(
-            video_trans_status=self.status
-        )
+        utils.set_video_trans_status(Video.objects.filter(pk=self.video_query.pk), self.status, 'deliver')
 
         if self.encode_profile == 'review':
             return None
@@ -521,7 +530,7 @@ class VedaDelivery(object):
         org = extract_course_org(self.video_proto.platform_course_url[0])
 
         try:
-            api_key = TranscriptCredentials.objects.get(org=org, provider=self.video_query.provider).api_key
+            api_key = utils.get_transcript_secrets(org, self.video_query.provider).api_key
         except TranscriptCredentials.DoesNotExist:
             LOGGER.warn('[DELIVERY] Unable to find cielo24 api_key for org=%s', org)
             return None
@@ -572,7 +581,7 @@ class VedaDelivery(object):
             # Picks the first course from the list as there may be multiple
             # course runs in that list (i.e. all having the same org).
             org = extract_course_org(self.video_proto.platform_course_url[0])
-            transcript_secrets = TranscriptCredentials.objects.get(org=org, provider=self.video_query.provider)
+            transcript_secrets = utils.get_transcript_secrets(org, self.video_query.provider)
 
             # update transcript status for video.
             val_api_client = VALAPICall(video_proto=None, val_status=None)
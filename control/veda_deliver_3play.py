@@ -9,6 +9,7 @@ import urllib3
 
 from requests.packages.urllib3.exceptions import InsecurePlatformWarning
 from VEDA_OS01.models import TranscriptProcessMetadata, TranscriptProvider, TranscriptStatus
+from VEDA_OS01.utils import get_three_play_catalog
 from VEDA.utils import build_url, scrub_query_params
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -130,18 +131,28 @@ class ThreePlayMediaClient(object):
 
         return available_languages
 
-    def get_source_language_id(self, languages, source_language_code):
+    def get_language_ids(self):
+        """
+        Gets the 3Play Media supported language ids by language code, cached per api key
+        """
+        def build_language_ids():
+            language_ids = {}
+            for language in self.get_available_languages():
+                language_ids.setdefault(language['iso_639_1_code'], language['language_id'])
+            return language_ids
+
+        return get_three_play_catalog('languages', self.api_key, build_language_ids)
+
+    def get_source_language_id(self, language_ids, source_language_code):
         """
         Extracts language id for a language that matches `source_language_code`
         from the given 3Play Media languages.
 
         Arguments:
-            languages(list): 3PlayMedia supported languages.
+            language_ids(dict): 3PlayMedia supported language ids by language code.
             source_language_code(unicode): A video source language code whose 3Play language id is required.
         """
-        for language in languages:
-            if language['iso_639_1_code'] == source_language_code:
-                return language['language_id']
+        return language_ids.get(source_language_code)
 
     def submit_media(self):
         """
@@ -162,8 +173,7 @@ class ThreePlayMediaClient(object):
             batch_name=self.default_dir,
         )
 
-        available_languages = self.get_available_languages()
-        source_language_id = self.get_source_language_id(available_languages, self.video.source_language)
+        source_language_id = self.get_source_language_id(self.get_language_ids(), self.video.source_language)
         if source_language_id:
             payload['language_id'] = source_language_id
 
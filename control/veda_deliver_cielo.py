@@ -1,13 +1,22 @@
 """
 Cielo24 Integration
+
+Requests go through process wide sessions, so connections to cielo24 are reused,
+with timeouts and retries with backoff on connection errors. Only requests that are
+safe to repeat are also retried on unavailable responses. The jobs of the preferred
+languages are submitted concurrently.
 """
 
 import ast
 import logging
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from VEDA_OS01.models import (TranscriptProcessMetadata, TranscriptProvider,
                               TranscriptStatus)
@@ -18,6 +27,40 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 LOGGER = logging.getLogger(__name__)
 
+# (connect, read) timeouts in seconds
+CIELO24_REQUEST_TIMEOUT = (5, 60)
+CIELO24_MAX_RETRIES = 3
+CIELO24_RETRY_BACKOFF_FACTOR = 0.5
+CIELO24_MAX_CONCURRENT_JOBS = 4
+
+_SESSIONS = {}
+_SESSION_LOCK = threading.Lock()
+
+
+def get_cielo24_session(retry_status=True):
+    """
+    Returns the session of this process for cielo24 requests.
+
+    Requests are retried on connection errors, but not once they were read by cielo24.
+    Unavailable (502, 503, 504) responses are only retried with `retry_status`, a gateway
+    error does not tell whether cielo24 already created a job or task for the request.
+    """
+    with _SESSION_LOCK:
+        if retry_status not in _SESSIONS:
+            retries = Retry(
+                total=CIELO24_MAX_RETRIES,
+                read=0,
+                status_forcelist=(502, 503, 504) if retry_status else (),
+                backoff_factor=CIELO24_RETRY_BACKOFF_FACTOR,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_maxsize=CIELO24_MAX_CONCURRENT_JOBS, max_retries=retries)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _SESSIONS[retry_status] = session
+        return _SESSIONS[retry_status]
+
 
 class Cielo24Error(Exception):
     """
@@ -30,20 +73,27 @@ class Cielo24CreateJobError(Cielo24Error):
     """
     An error occurred during new job creation.
     """
-    pass
+    message_prefix = 'CREATE JOB ERROR'
 
 
 class Cielo24AddMediaError(Cielo24Error):
     """
     An error occurred during add media.
     """
-    pass
+    message_prefix = 'ADD MEDIA ERROR'
 
 
 class Cielo24PerformTranscriptError(Cielo24Error):
     """
     An error occurred during perform transcript.
     """
+    message_prefix = 'PERFORM TRANSCRIPT ERROR'
+
+
+class Cielo24RequestError(Cielo24Error):
+    """
+    A request to cielo24 failed to complete.
+    """
     pass
 
 
@@ -83,36 +133,79 @@ class Cielo24Transcript(object):
         Start cielo24 transcription flow.
 
         This will do the following steps:
-        For each preferred language:
+        For each preferred language, concurrently:
             1. create a new job
             2. add media url
             3. perform transcript
         """
-        job_id = None
+        if not self.preferred_languages:
+            return
 
-        for preferred_lang in self.preferred_languages:
-            try:
-                job_id = self.create_job()
-                transcript_process_metadata = TranscriptProcessMetadata.objects.create(
+        max_workers = min(len(self.preferred_languages), CIELO24_MAX_CONCURRENT_JOBS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(self.submit_language_job, self.preferred_languages))
+
+        # Database records are written from this thread only, for every job that was created.
+        for preferred_lang, (job_id, failed) in zip(self.preferred_languages, results):
+            if job_id:
+                TranscriptProcessMetadata.objects.create(
                     video=self.video,
                     process_id=job_id,
                     lang_code=preferred_lang,
                     provider=TranscriptProvider.CIELO24,
-                    status=TranscriptStatus.IN_PROGRESS
+                    status=TranscriptStatus.FAILED if failed else TranscriptStatus.IN_PROGRESS
                 )
-                self.embed_media_url(job_id)
-                self.perform_transcript(job_id, preferred_lang)
-            except Cielo24Error as ex:
-                if job_id:
-                    transcript_process_metadata.status = TranscriptStatus.FAILED
-                    transcript_process_metadata.save()
-
-                LOGGER.exception(
-                    '[CIELO24] Request failed for video=%s -- lang=%s -- job_id=%s',
-                    self.video.studio_id,
-                    preferred_lang,
-                    job_id
+
+    def submit_language_job(self, preferred_lang):
+        """
+        Create a job for a language and request its transcript.
+
+        Returns:
+            (job id or None if the job was not created, whether a step failed)
+        """
+        job_id = None
+        try:
+            job_id = self.create_job()
+            self.embed_media_url(job_id)
+            self.perform_transcript(job_id, preferred_lang)
+        except Exception:  # pylint: disable=broad-except
+            # An error of one language must not lose the jobs already created for the others.
+            LOGGER.exception(
+                '[CIELO24] Request failed for video=%s -- lang=%s -- job_id=%s',
+                self.video.studio_id,
+                preferred_lang,
+                job_id
+            )
+            return job_id, True
+        return job_id, False
+
+    def get(self, url, error_class, retry_status=True):
+        """
+        Send a GET request to cielo24.
+
+        Arguments:
+            retry_status (bool): retry unavailable responses, only for requests that are safe to repeat.
+
+        Raises:
+            `error_class` if the response is not ok, `Cielo24RequestError` if no response was received.
+        """
+        try:
+            response = get_cielo24_session(retry_status).get(url, timeout=CIELO24_REQUEST_TIMEOUT)
+        except requests.RequestException as ex:
+            raise Cielo24RequestError(
+                '[REQUEST ERROR] url={} -- error={}'.format(scrub_query_params(url, ['api_token']), ex)
+            )
+
+        if not response.ok:
+            raise error_class(
+                '[{}] url={} -- status={} -- text={}'.format(
+                    error_class.message_prefix,
+                    scrub_query_params(url, ['api_token']),
+                    response.status_code,
+                    response.text
                 )
+            )
+        return response
 
     def perform_transcript(self, job_id, lang_code):
         """
@@ -139,16 +232,8 @@ class Cielo24Transcript(object):
             transcription_fidelity=self.fidelity,
             options=json.dumps({"return_iwp":["FINAL"]})
         )
-        response = requests.get(perform_transcript_url)
-
-        if not response.ok:
-            raise Cielo24PerformTranscriptError(
-                '[PERFORM TRANSCRIPT ERROR] url={} -- status={} -- text={}'.format(
-                    scrub_query_params(perform_transcript_url, ['api_token']),
-                    response.status_code,
-                    response.text
-                )
-            )
+        # Requesting the transcript again could order it twice.
+        response = self.get(perform_transcript_url, Cielo24PerformTranscriptError, retry_status=False)
 
         task_id = ast.literal_eval(response.text)['TaskId']
         LOGGER.info(
@@ -177,16 +262,7 @@ class Cielo24Transcript(object):
             api_token=self.api_key,
             media_url=self.s3_video_url
         )
-        response = requests.get(media_url)
-
-        if not response.ok:
-            raise Cielo24AddMediaError(
-                '[ADD MEDIA ERROR] url={} -- status={} -- text={}'.format(
-                    scrub_query_params(media_url, ['api_token']),
-                    response.status_code,
-                    response.text
-                )
-            )
+        response = self.get(media_url, Cielo24AddMediaError)
 
         task_id = ast.literal_eval(response.text)['TaskId']
         LOGGER.info(
@@ -212,16 +288,8 @@ class Cielo24Transcript(object):
             api_token=self.api_key,
             job_name=self.video.studio_id
         )
-        response = requests.get(create_job_url)
-
-        if not response.ok:
-            raise Cielo24CreateJobError(
-                '[CREATE JOB ERROR] url={} -- status={} -- text={}'.format(
-                    scrub_query_params(create_job_url, ['api_token']),
-                    response.status_code,
-                    response.text,
-                )
-            )
+        # Creating the job again could leave a second, paid, job.
+        response = self.get(create_job_url, Cielo24CreateJobError, retry_status=False)
 
         job_id = ast.literal_eval(response.text)['JobId']
         LOGGER.info(
@@ -4,14 +4,22 @@ Youtube Dynamic Upload
 Note: This is early VEDA work, but is functional. Ideally deprecated in favor of a no-youtube workflow, this code
 is only maintained, and not prioritized for refactoring
 
+Videos delivered to the same Youtube channel within a short window are uploaded
+together as one drop (one remote directory with a multi-row CSV), over an SFTP
+session that is kept open and reused per `yt_logon`. Only the deliveries of one
+process are grouped, so drops are batched on threaded deliver workers only.
+
 """
 
 
 import logging
 import os.path
-import pysftp
-import paramiko
+import threading
 import time
+import uuid
+from contextlib import contextmanager
+
+import paramiko
 
 from .control_env import *
 
@@ -19,21 +27,326 @@ LOGGER = logging.getLogger(__name__)
 # TODO: Remove this temporary logging to stdout
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 
+YOUTUBE_SFTP_HOST = 'partnerupload.google.com'
+YOUTUBE_SFTP_PORT = 19321
+# Larger than the paramiko defaults, so more writes are in flight before the server acknowledges them.
+SFTP_WINDOW_SIZE = 16 * 1024 * 1024
+SFTP_BUFFER_SIZE = 1024 * 1024
+PROGRESS_LOG_INTERVAL_SECONDS = 30
+
+DEFAULT_DROP_WINDOW_SECONDS = 10
+DEFAULT_DROP_MAX_VIDEOS = 25
+DEFAULT_SFTP_IDLE_SECONDS = 300
+
+STATIC_FILES_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'youtube_callback',
+    'static_files'
+)
+
+YOUTUBE_DEFAULT_CSV_COLUMNNAMES = [
+    'filename',
+    'channel',
+    'custom_id',
+    'add_asset_labels',
+    'title',
+    'description',
+    'keywords',
+    'spoken_language',
+    'caption_file',
+    'caption_language',
+    'category',
+    'privacy',
+    'notify_subscribers',
+    'start_time,end_time',
+    'custom_thumbnail',
+    'ownership',
+    'block_outside_ownership',
+    'usage_policy',
+    'enable_content_id',
+    'reference_exclusions',
+    'match_policy,ad_types',
+    'ad_break_times',
+    'playlist_id',
+    'require_paid_subscription'
+]
+
+
+class UploadProgress(object):
+    """
+    Upload progress callback, logging at most every `interval` seconds
+    """
+    def __init__(self, file_name, interval=PROGRESS_LOG_INTERVAL_SECONDS):
+        self.file_name = file_name
+        self.interval = interval
+        self.last_logged = time.time()
+
+    def __call__(self, transferred, to_be_transferred):
+        now = time.time()
+        if transferred < to_be_transferred and now - self.last_logged < self.interval:
+            return
+        self.last_logged = now
+        LOGGER.info('[YOUTUBE] {file} : Transferred {transferred} out of {total}'.format(
+            file=self.file_name,
+            transferred=transferred,
+            total=to_be_transferred
+        ))
+
+
+class SftpSessionPool(object):
+    """
+    Open SFTP sessions to the Youtube dropbox, kept for reuse per `yt_logon`
+    """
+    def __init__(self, private_key, idle_seconds=DEFAULT_SFTP_IDLE_SECONDS):
+        self.private_key = private_key
+        self.idle_seconds = idle_seconds
+        self._idle_sessions = {}
+        self._lock = threading.Lock()
+
+    def _load_key(self):
+        try:
+            return paramiko.RSAKey.from_private_key_file(self.private_key)
+        except paramiko.SSHException:
+            return paramiko.DSSKey.from_private_key_file(self.private_key)
+
+    def connect(self, yt_logon):
+        """
+        Open a new SFTP session for a Youtube account.
+        """
+        transport = paramiko.Transport(
+            (YOUTUBE_SFTP_HOST, YOUTUBE_SFTP_PORT),
+            default_window_size=SFTP_WINDOW_SIZE
+        )
+        try:
+            transport.connect(username=yt_logon, pkey=self._load_key())
+            return paramiko.SFTPClient.from_transport(transport, window_size=SFTP_WINDOW_SIZE)
+        except Exception:
+            transport.close()
+            raise
+
+    @staticmethod
+    def close(sftp):
+        sftp.close()
+        sftp.get_channel().get_transport().close()
+
+    def _checkout(self, yt_logon):
+        now = time.time()
+        with self._lock:
+            sessions = self._idle_sessions.get(yt_logon, [])
+            while sessions:
+                sftp, last_used = sessions.pop()
+                if now - last_used < self.idle_seconds and sftp.get_channel().get_transport().is_active():
+                    return sftp
+                self.close(sftp)
+        return self.connect(yt_logon)
+
+    @contextmanager
+    def session(self, yt_logon):
+        """
+        Yields an open SFTP session, returned to the pool unless it failed.
+        """
+        sftp = self._checkout(yt_logon)
+        try:
+            yield sftp
+        except Exception:
+            self.close(sftp)
+            raise
+        with self._lock:
+            self._idle_sessions.setdefault(yt_logon, []).append((sftp, time.time()))
+
+
+def put_file(sftp, local_path, remote_path, callback=None):
+    """
+    Upload a file with pipelined writes, without waiting for each write to be acknowledged.
+    """
+    file_size = os.stat(local_path).st_size
+    with open(local_path, 'rb') as local_file:
+        with sftp.open(remote_path, 'wb', SFTP_BUFFER_SIZE) as remote_file:
+            remote_file.set_pipelined(True)
+            transferred = 0
+            while True:
+                data = local_file.read(SFTP_BUFFER_SIZE)
+                if not data:
+                    break
+                remote_file.write(data)
+                transferred += len(data)
+                if callback is not None:
+                    callback(transferred, file_size)
+
+
+class YoutubeDrop(object):
+    """
+    Videos uploaded to a Youtube account in one remote directory
+
+    To successfully upload files to the CMS,
+    upload the files, upload sidecar metadata (csv, a row per file)
+    THEN upload empty 'delivery.complete' file
+
+    NOTE / TODO:
+    this doesn't feel like the right solution,
+    -BUT-
+    We'll generate a unix timestamp directory,
+    then use the timestamp to find it later for the
+    youtube ID / status xml
+    """
+    def __init__(self, yt_logon, deliveries):
+        self.yt_logon = yt_logon
+        self.deliveries = deliveries
+        self.remote_directory = '{timestamp}-{token}'.format(
+            timestamp=str(time.time()).split('.')[0],
+            token=uuid.uuid4().hex[:6]
+        )
+        self.csv_file = os.path.join(WORK_DIRECTORY, 'drop-{directory}.csv'.format(directory=self.remote_directory))
+
+    def write_csv(self):
+        """
+        Generate the Youtube CMS CSV metadata sidecar file, a row per video
+        """
+        # Header Row
+        output = ','.join(([c for c in YOUTUBE_DEFAULT_CSV_COLUMNNAMES])) + '\n'
+        # Data Rows
+        for delivery in self.deliveries:
+            metadata_dict = delivery.csv_metadata()
+            output += ','.join(([metadata_dict.get(c, '') for c in YOUTUBE_DEFAULT_CSV_COLUMNNAMES])) + '\n'
+
+        with open(self.csv_file, 'w') as c1:
+            c1.write(output)
+
+    def upload(self, sftp):
+        if not os.path.exists(os.path.join(STATIC_FILES_DIRECTORY, 'delivery.complete')):
+            with open(os.path.join(STATIC_FILES_DIRECTORY, 'delivery.complete'), 'w') as d1:
+                d1.write('')
+
+        self.write_csv()
+        try:
+            LOGGER.info('[YOUTUBE] {logon} : Uploading {count} videos to {directory}'.format(
+                logon=self.yt_logon,
+                count=len(self.deliveries),
+                directory=self.remote_directory
+            ))
+            sftp.mkdir(self.remote_directory, mode=660)
+            for delivery in self.deliveries:
+                put_file(
+                    sftp,
+                    os.path.join(WORK_DIRECTORY, delivery.file),
+                    '/'.join((self.remote_directory, delivery.file)),
+                    callback=UploadProgress(delivery.file)
+                )
+            put_file(sftp, self.csv_file, '/'.join((self.remote_directory, os.path.basename(self.csv_file))))
+            # (google required) empty delivery.complete file, last
+            put_file(
+                sftp,
+                os.path.join(STATIC_FILES_DIRECTORY, 'delivery.complete'),
+                '/'.join((self.remote_directory, 'delivery.complete'))
+            )
+        finally:
+            os.remove(self.csv_file)
+
 
-def printTotals(transferred, toBeTransferred):
+class _PendingDrop(object):
+    def __init__(self):
+        self.deliveries = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.uploaded = False
+        self.error = None
+
+
+class YoutubeDeliveryStage(object):
     """
-    Optional upload logging method
+    Groups the deliveries to a Youtube channel into drops
+
+    The first delivery to a channel waits up to `drop_window_seconds` for others (or until
+    `drop_max_videos` are pending), then uploads all of them as one drop while the others
+    wait for it.
+    """
+    def __init__(self, session_pool, drop_window_seconds=DEFAULT_DROP_WINDOW_SECONDS,
+                 drop_max_videos=DEFAULT_DROP_MAX_VIDEOS):
+        self.session_pool = session_pool
+        self.drop_window_seconds = drop_window_seconds
+        self.drop_max_videos = drop_max_videos
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _close(self, channel_key, pending):
+        with self._lock:
+            if self._pending.get(channel_key) is pending:
+                del self._pending[channel_key]
+
+    def submit(self, delivery):
+        """
+        Deliver a video, returns True once its drop is uploaded.
+
+        A failed upload raises its error in every delivery of the drop.
+        """
+        channel_key = (delivery.course.yt_logon, delivery.course.yt_channel)
+        with self._lock:
+            pending = self._pending.get(channel_key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[channel_key] = _PendingDrop()
+            pending.deliveries.append(delivery)
+            if len(pending.deliveries) >= self.drop_max_videos:
+                del self._pending[channel_key]
+                pending.full.set()
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.uploaded
+
+        pending.full.wait(self.drop_window_seconds)
+        self._close(channel_key, pending)
+        try:
+            self.upload(delivery.course.yt_logon, pending.deliveries)
+            pending.uploaded = True
+        except Exception as error:
+            pending.error = error
+            raise
+        finally:
+            pending.done.set()
+        return pending.uploaded
+
+    def upload(self, yt_logon, deliveries):
+        drop = YoutubeDrop(yt_logon, deliveries)
+        with self.session_pool.session(yt_logon) as sftp:
+            drop.upload(sftp)
+
+
+_STAGE = None
+_STAGE_LOCK = threading.Lock()
+
+
+def get_drop_window_seconds(config):
+    """
+    Returns how long the first delivery to a channel waits for others.
+
+    A prefork deliver worker (or one with a single thread) runs one delivery per process
+    at a time, its deliveries can never share a drop and are uploaded right away.
+    """
+    if config.get('celery_deliver_pool') != 'threads' or int(config.get('celery_threads') or 1) <= 1:
+        return 0
+    drop_window_seconds = config.get('youtube_drop_window_seconds')
+    return DEFAULT_DROP_WINDOW_SECONDS if drop_window_seconds is None else drop_window_seconds
+
 
+def get_youtube_delivery_stage():
     """
-    '''
-    try:
-        sys.stdout.write('\r')
-        sys.stdout.write("Transferred: {0}\tOut of: {1}\r".format(transferred, toBeTransferred))
-        sys.stdout.flush()
-    except:
-        LOGGER.error('Callback Failing')
-    '''
-    return
+    Returns the Youtube delivery stage of this process.
+    """
+    global _STAGE  # pylint: disable=global-statement
+    with _STAGE_LOCK:
+        if _STAGE is None:
+            _STAGE = YoutubeDeliveryStage(
+                SftpSessionPool(
+                    os.path.join(STATIC_FILES_DIRECTORY, 'youtubekey'),
+                    idle_seconds=CONFIG.get('youtube_sftp_idle_seconds') or DEFAULT_SFTP_IDLE_SECONDS
+                ),
+                drop_window_seconds=get_drop_window_seconds(CONFIG),
+                drop_max_videos=CONFIG.get('youtube_drop_max_videos') or DEFAULT_DROP_MAX_VIDEOS,
+            )
+        return _STAGE
 
 
 class DeliverYoutube(object):
@@ -46,13 +359,6 @@ class DeliverYoutube(object):
         self.course = None
         self.file = None
 
-        self.youtubekey = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            'youtube_callback',
-            'static_files',
-            'youtubekey'
-        )
-
     def upload(self):
         self.video = Video.objects.filter(
             edx_id=self.veda_id
@@ -67,12 +373,16 @@ class DeliverYoutube(object):
         else:
             self.course = self.video.inst_class
             self.file = self.veda_id + '_100.mp4'
-        self.csv_metadata()
-        self.batch_uploader()
+
+        LOGGER.info('[YOUTUBE] {id} : Ready for youtube SFTP upload'.format(id=str(self.video.edx_id)))
+        try:
+            get_youtube_delivery_stage().submit(self)
+        except paramiko.ssh_exception.AuthenticationException:
+            LOGGER.info('[YOUTUBE] {file} : Paramiko Authentication Exception'.format(file=str(self.file)))
 
     def csv_metadata(self):
         """
-        Generate Youtube CMS CSV metadata sidecar file
+        Youtube CMS CSV metadata sidecar row of the video
 
         Info: https://support.google.com/youtube/answer/6066171?hl=en (As of 05.2017)
         Supported in favor of deprecated YT-XML
@@ -104,33 +414,7 @@ class DeliverYoutube(object):
             require_paid_subscription
 
         """
-        YOUTUBE_DEFAULT_CSV_COLUMNNAMES = [
-            'filename',
-            'channel',
-            'custom_id',
-            'add_asset_labels',
-            'title',
-            'description',
-            'keywords',
-            'spoken_language',
-            'caption_file',
-            'caption_language',
-            'category',
-            'privacy',
-            'notify_subscribers',
-            'start_time,end_time',
-            'custom_thumbnail',
-            'ownership',
-            'block_outside_ownership',
-            'usage_policy',
-            'enable_content_id',
-            'reference_exclusions',
-            'match_policy,ad_types',
-            'ad_break_times',
-            'playlist_id',
-            'require_paid_subscription'
-        ]
-        LOGGER.info('[YOUTUBE] {id} : Generating sidecar metadata CSV'.format(id=str(self.video.edx_id)))
+        LOGGER.info('[YOUTUBE] {id} : Generating sidecar metadata CSV row'.format(id=str(self.video.edx_id)))
         '''
         # TODO: Refactor this into centrally located util for escaping bad chars
         if self.video.client_title is not None:
@@ -160,81 +444,4 @@ class DeliverYoutube(object):
             'privacy': 'unlisted',
 
         }
-        # Header Row
-        output = ','.join(([c for c in YOUTUBE_DEFAULT_CSV_COLUMNNAMES])) + '\n'
-        # Data Row
-        output += ','.join(([metadata_dict.get(c, '') for c in YOUTUBE_DEFAULT_CSV_COLUMNNAMES]))
-
-        with open(os.path.join(WORK_DIRECTORY, self.video.edx_id + '_100.csv'), 'w') as c1:
-            c1.write('%s %s' % (output, '\n'))
-
-    def batch_uploader(self):
-        """
-        To successfully upload files to the CMS,
-        upload file, upload sidecar metadata (xml)
-        THEN upload empty 'delivery.complete' file
-
-        NOTE / TODO:
-        this doesn't feel like the right solution,
-        -BUT-
-        We'll generate a unix timestamp directory,
-        then use the timestamp to find it later for the
-        youtube ID / status xml
-
-        """
-        remote_directory = str(time.time()).split('.')[0]
-
-        if not os.path.exists(os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            'youtube_callback',
-            'static_files',
-            'delivery.complete'
-        )):
-            with open(os.path.join(
-                os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                'youtube_callback',
-                'static_files',
-                'delivery.complete'
-            ), 'w') as d1:
-                d1.write('')
-        cnopts = pysftp.CnOpts()
-        cnopts.hostkeys = None
-        try:
-            with pysftp.Connection(
-                'partnerupload.google.com',
-                username=self.course.yt_logon,
-                private_key=self.youtubekey,
-                port=19321,
-                cnopts=cnopts
-            ) as s1:
-                LOGGER.info('[YOUTUBE] {id} : Ready for youtube SFTP upload'.format(id=str(self.video.edx_id)))
-                # Upload file, sidecar metadata,
-                # and (google required) empty delivery.complete file
-                s1.mkdir(remote_directory, mode=660)
-                s1.cwd(remote_directory)
-                s1.put(
-                    os.path.join(WORK_DIRECTORY, self.file),
-                    callback=printTotals
-                )
-                s1.put(
-                    os.path.join(WORK_DIRECTORY, self.video.edx_id + '_100.csv'),
-                    callback=printTotals
-                )
-                s1.put(
-                    os.path.join(
-                        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                        'youtube_callback',
-                        'static_files',
-                        'delivery.complete'
-                    ),
-                    callback=printTotals,
-                    confirm=False,
-                    preserve_mtime=False
-                )
-        except paramiko.ssh_exception.AuthenticationException:
-            LOGGER.info('[YOUTUBE] {file} : Paramiko Authentication Exception'.format(file=str(self.file)))
-
-        os.remove(os.path.join(
-            WORK_DIRECTORY,
-            self.video.edx_id + '_100.csv'
-        ))
+        return metadata_dict
@@ -7,15 +7,11 @@ Get a list of needed encodes from VEDA
 
 
 from .control_env import *
-from dependencies.shotgun_api3 import Shotgun
+from .encode_eligibility import skip_ineligible_encodes
+from .veda_review_status import get_review_status_service
 from VEDA.utils import get_config
 import six
 
-if six.PY3:
-    from xmlrpc.client import ProtocolError
-else:
-    from xmlrpclib import ProtocolError
-
 
 class VedaEncode(object):
 
@@ -32,6 +28,7 @@ class VedaEncode(object):
 
         config_data = get_config()
         self.encode_dict = config_data['encode_dict']
+        self.eligibility_rules = config_data.get('encode_eligibility_rules') or {}
         self.sg_server_path = config_data['sg_server_path']
         self.sg_script_name = config_data['sg_script_name']
         self.sg_script_key = config_data['sg_script_key']
@@ -89,6 +86,10 @@ class VedaEncode(object):
         if self.veda_id is None:
             return None
 
+        video = Video.objects.filter(edx_id=self.veda_id).latest()
+        self.encode_list -= set(video.skipped_encodes.values_list('encode_profile', flat=True))
+        self.encode_list -= skip_ineligible_encodes(video, self.encode_list, self.eligibility_rules)
+
         for l in self.encode_list.copy():
             try:
                 url_query = URL.objects.filter(
@@ -107,7 +108,6 @@ class VedaEncode(object):
         is authorized to go to final publishing
 
         """
-        # TODO: Move to independent API Method
         if self.sg_script_key is None:
             return True
 
@@ -117,30 +117,8 @@ class VedaEncode(object):
 
         if video_object.inst_class.sg_projID is None:
             return False
-        try:
-            sg = Shotgun(
-                self.sg_server_path,
-                self.sg_script_name,
-                self.sg_script_key
-            )
-        except ProtocolError:
-            # Periodic API Error
-            return False
 
-        fields = ['project', 'entity', 'sg_status_list']
-        filters = [
-            ['step', 'is', {'type': 'Step', 'id': 7}],
-            ['project', 'is', {
-                "type": "Project",
-                "id": video_object.inst_class.sg_projID
-            }],
-        ]
-
-        # TODO: Improve API query
-        tasks = sg.find("Task", filters, fields)
-        for t in tasks:
-            if t['entity']['name'] == self.veda_id.split('-')[-1]:
-                if t['sg_status_list'] != 'wtg':
-                    return True
-
-        return False
+        return get_review_status_service().is_approved(
+            video_object.inst_class.sg_projID,
+            self.veda_id.split('-')[-1]
+        )
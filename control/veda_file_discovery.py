@@ -22,8 +22,9 @@ from opaque_keys.edx.keys import CourseKey
 from .control_env import *
 from VEDA.utils import extract_course_org, get_config
 from .veda_file_ingest import VedaIngest, VideoProto
-from VEDA_OS01.models import TranscriptCredentials
+from VEDA_OS01.utils import has_transcript_credentials
 from .veda_val import VALAPICall
+from .veda_work_directory import WorkDirectoryFull, get_work_directory, is_disk_full_error
 
 try:
     boto.config.add_section('Boto')
@@ -55,6 +56,8 @@ class FileDiscovery(object):
     def about_video_ingest(self):
         """
         Crawl VEDA Upload bucket
+
+        Returns the number of uploads found.
         """
         if self.node_work_directory is None:
             LOGGER.error('[DISCOVERY] No Workdir')
@@ -68,6 +71,7 @@ class FileDiscovery(object):
             self.bucket = conn.get_bucket(self.auth_dict['veda_s3_upload_bucket'])
         except S3ResponseError:
             return None
+        uploads = 0
         for key in self.bucket.list('upload/', '/'):
             meta = self.bucket.get_key(key.name)
             if meta.name != 'upload/':
@@ -75,6 +79,8 @@ class FileDiscovery(object):
                     meta=meta,
                     key=key
                 )
+                uploads += 1
+        return uploads
 
     def about_video_validate(self, meta, key):
         abvid_serial = meta.name.split('/')[1]
@@ -237,20 +243,39 @@ class FileDiscovery(object):
 
     def download_video_to_working_directory(self, key, file_name):
         """
-        Downloads the video to working directory from S3 and
-        returns whether its successfully downloaded or not.
+        Downloads the video to working directory from S3.
+
+        Space for the video is reserved in the working storage before the download, so a
+        full disk never leaves a truncated video behind.
 
         Arguments:
             key: An S3 key whose content is going to be downloaded
             file_name: Name of the file when its in working directory
+
+        Returns:
+            the `Reservation` of the video in the working storage, whose volume is the directory
+            the video was downloaded to, or None if the download failed. The reservation is to be
+            released once the video is ingested.
+
+        Raises:
+            WorkDirectoryFull: if there is no room for the video in the working storage.
         """
-        file_ingested = False
+        reservation = get_work_directory(self.node_work_directory).reserve(key.size, file_name)
         try:
-            key.get_contents_to_filename(os.path.join(self.node_work_directory, file_name))
-            file_ingested = True
+            key.get_contents_to_filename(os.path.join(reservation.volume, file_name))
+        except EnvironmentError as error:
+            reservation.release()
+            if not is_disk_full_error(error):
+                raise
+            raise WorkDirectoryFull('Disk full while downloading {file_name}'.format(file_name=file_name))
         except S3DataError:
+            reservation.release()
             LOGGER.error('[DISCOVERY] Error downloading the file into node working directory.')
-        return file_ingested
+            return None
+        except Exception:
+            reservation.release()
+            raise
+        return reservation
 
     def parse_transcript_preferences(self, course_id, transcript_preferences):
         """
@@ -262,13 +287,11 @@ class FileDiscovery(object):
         """
         try:
             transcript_preferences = json.loads(transcript_preferences)
-            TranscriptCredentials.objects.get(
-                org=extract_course_org(course_id),
-                provider=transcript_preferences.get('provider')
-            )
-        except (TypeError, TranscriptCredentials.DoesNotExist):
-            # when the preferences are not set OR these are set to some data in invalid format OR these don't
-            # have associated 3rd party transcription provider API keys.
+            if not has_transcript_credentials(extract_course_org(course_id), transcript_preferences.get('provider')):
+                # when the preferences don't have associated 3rd party transcription provider API keys.
+                transcript_preferences = None
+        except TypeError:
+            # when the preferences are not set OR these are set to some data in invalid format.
             transcript_preferences = None
         except ValueError:
             LOGGER.error('[DISCOVERY] Invalid transcripts preferences=%s', transcript_preferences)
@@ -276,12 +299,21 @@ class FileDiscovery(object):
 
         return transcript_preferences
 
-    def validate_metadata_and_feed_to_ingest(self, video_s3_key):
+    def validate_metadata_and_feed_to_ingest(self, video_s3_key, file_downloaded=False, work_directory=None,
+                                             reservation=None):
         """
         Validates the video key and feed it to ingestion phase.
 
         Arguments:
             video_s3_key: An S3 Key associated with a (to be ingested)video file.
+            file_downloaded: True if the video is already in the node working directory, in which case
+                the metadata is expected to have been populated by the download.
+            work_directory: working directory the video was downloaded to, defaults to the node working directory.
+            reservation: working storage reservation of a downloaded video, held until the video is ingested.
+
+        Raises:
+            WorkDirectoryFull: if there is no room for the video in the working storage, the video
+                is left in place for the caller to retry.
 
         Process/Steps:
             1 - Get or create an associated course for a video.
@@ -291,59 +323,88 @@ class FileDiscovery(object):
             5 - On completing ingestion, mark the video file as processed.
 
             Note:
-                Failure at any discovery point will cause video file to be marked as rejected.
+                Failure at any discovery point will cause video file to be marked as rejected, except
+                for a full working storage.
         """
         client_title = video_s3_key.get_metadata('client_video_id')
         course_hex = video_s3_key.get_metadata('course_video_upload_token')
         course_id = video_s3_key.get_metadata('course_key')
-        transcript_preferences = video_s3_key.get_metadata('transcript_preferences')
         filename = os.path.basename(video_s3_key.name)
 
         # Try getting course based on the S3 metadata set on the video file.
         course = self.get_or_create_course(course_id, course_hex=course_hex)
         if course:
             # Download video file from S3 into node working directory.
-            file_extension = os.path.splitext(client_title)[1][1:]
-            file_downloaded = self.download_video_to_working_directory(video_s3_key, filename)
-            if not file_downloaded:
+            if file_downloaded:
+                work_directory = work_directory or self.node_work_directory
+            else:
+                reservation = self.download_video_to_working_directory(video_s3_key, filename)
+                work_directory = reservation and reservation.volume
+            if not work_directory:
                 # S3 Bucket ingest failed, move the file rejected directory.
                 self.move_video(video_s3_key, destination_dir=self.auth_dict['edx_s3_rejected_prefix'])
                 return False
 
-            # Prepare to ingest.
-            video_metadata = dict(
-                s3_filename=filename,
-                client_title=client_title,
-                file_extension=file_extension,
-                platform_course_url=course_id,
-            )
-            # Check if this video also having valid 3rd party transcription preferences.
-            transcript_preferences = self.parse_transcript_preferences(course_id, transcript_preferences)
-            if transcript_preferences is not None:
-                video_metadata.update({
-                    'process_transcription': True,
-                    'provider': transcript_preferences.get('provider'),
-                    'three_play_turnaround': transcript_preferences.get('three_play_turnaround'),
-                    'cielo24_turnaround': transcript_preferences.get('cielo24_turnaround'),
-                    'cielo24_fidelity': transcript_preferences.get('cielo24_fidelity'),
-                    'preferred_languages': transcript_preferences.get('preferred_languages'),
-                    'source_language': transcript_preferences.get('video_source_language'),
-                })
-
-            ingest = VedaIngest(
-                course_object=course,
-                video_proto=VideoProto(**video_metadata),
-                node_work_directory=self.node_work_directory
-            )
-            ingest.insert()
-
-            if ingest.complete:
-                # Move the video file into 'prod-edx/processed' or 'stage-edx/processed
-                # directory, if ingestion is complete.
-                self.move_video(video_s3_key, destination_dir=self.auth_dict['edx_s3_processed_prefix'])
-
-            return ingest.complete
+            try:
+                return self.ingest_video(video_s3_key, course, work_directory, reservation)
+            finally:
+                if reservation is not None:
+                    reservation.release()
         else:
             # Reject the video file and update val status to 'invalid_token'
             self.reject_file_and_update_val(video_s3_key, filename, client_title, course_id)
             return False
+
+    def ingest_video(self, video_s3_key, course, work_directory, reservation=None):
+        """
+        Ingests a video downloaded to the working directory.
+
+        Arguments:
+            video_s3_key: An S3 Key associated with a (to be ingested)video file.
+            course: course of the video.
+            work_directory: working directory the video was downloaded to.
+            reservation: working storage reservation of the video, which follows its renames.
+
+        Returns:
+            True if the ingestion is complete.
+        """
+        client_title = video_s3_key.get_metadata('client_video_id')
+        course_id = video_s3_key.get_metadata('course_key')
+        transcript_preferences = video_s3_key.get_metadata('transcript_preferences')
+        filename = os.path.basename(video_s3_key.name)
+        file_extension = os.path.splitext(client_title)[1][1:]
+
+        # Prepare to ingest.
+        video_metadata = dict(
+            s3_filename=filename,
+            client_title=client_title,
+            file_extension=file_extension,
+            platform_course_url=course_id,
+        )
+        # Check if this video also having valid 3rd party transcription preferences.
+        transcript_preferences = self.parse_transcript_preferences(course_id, transcript_preferences)
+        if transcript_preferences is not None:
+            video_metadata.update({
+                'process_transcription': True,
+                'provider': transcript_preferences.get('provider'),
+                'three_play_turnaround': transcript_preferences.get('three_play_turnaround'),
+                'cielo24_turnaround': transcript_preferences.get('cielo24_turnaround'),
+                'cielo24_fidelity': transcript_preferences.get('cielo24_fidelity'),
+                'preferred_languages': transcript_preferences.get('preferred_languages'),
+                'source_language': transcript_preferences.get('video_source_language'),
+            })
+
+        ingest = VedaIngest(
+            course_object=course,
+            video_proto=VideoProto(**video_metadata),
+            node_work_directory=work_directory,
+            reservation=reservation,
+        )
+        ingest.insert()
+
+        if ingest.complete:
+            # Move the video file into 'prod-edx/processed' or 'stage-edx/processed
+            # directory, if ingestion is complete.
+            self.move_video(video_s3_key, destination_dir=self.auth_dict['edx_s3_processed_prefix'])
+
+        return ingest.complete
@@ -7,14 +7,17 @@ import datetime
 import logging
 import subprocess
 
-from django.db import transaction
 from django.db.utils import DatabaseError
 
 from .control_env import *
+from .encode_worker_tasks import EncodePriority
 from VEDA.utils import get_config
 from .veda_heal import VedaHeal
 from .veda_hotstore import Hotstore
+from .veda_id_allocator import get_veda_id_allocator
+from .veda_source_dedup import fingerprint, reuse_duplicate_encodes
 from VEDA_OS01.models import TranscriptStatus
+from VEDA_OS01.utils import record_video_trans_status
 from .veda_utils import Report
 from .veda_val import VALAPICall
 from .veda_video_validation import Validation
@@ -64,6 +67,7 @@ class VideoProto(object):
         self.duration = 0
         self.bitrate = None
         self.resolution = None
+        self.source_hash = None
         self.veda_id = None
 
 
@@ -75,6 +79,8 @@ class VedaIngest(object):
         self.auth_dict = get_config()
         self.node_work_directory = kwargs.get('node_work_directory', WORK_DIRECTORY)
         self.full_filename = kwargs.get('full_filename', None)
+        # Working storage reservation of the video file, if any
+        self.reservation = kwargs.get('reservation', None)
         self.complete = False
         self.archived = False
 
@@ -100,7 +106,8 @@ class VedaIngest(object):
             datetime=str(datetime.datetime.utcnow()))
         )
 
-        self.queue_job()
+        if not reuse_duplicate_encodes(self.course_object, self.video_proto.veda_id, self.auth_dict):
+            self.queue_job()
         Course.objects.filter(
             pk=self.course_object.pk
         ).update(
@@ -116,7 +123,8 @@ class VedaIngest(object):
             video_query=Video.objects.filter(
                 edx_id=self.video_proto.veda_id.strip()
             ),
-            val_status='transcode_queue'
+            val_status='transcode_queue',
+            priority=EncodePriority.NEW_UPLOAD
         )
         encode_instance.send_encodes()
 
@@ -213,6 +221,7 @@ class VedaIngest(object):
 
         if self.video_proto.valid is True:
             self._gather_metadata()
+            self.video_proto.source_hash = fingerprint(self.full_filename)
 
         # DB Inserts
         if self.video_proto.s3_filename:
@@ -264,6 +273,7 @@ class VedaIngest(object):
                     s1 += 1
                 v1.client_title = final_string
                 v1.save()
+            record_video_trans_status(v1, '', 'ingest')
             self.complete = True
             LOGGER.info('[INGEST] {video_id} : Corrupt file, database record complete'.format(
                     video_id=self.video_proto.veda_id
@@ -289,6 +299,7 @@ class VedaIngest(object):
         v1.video_orig_duration = self.video_proto.duration
         v1.video_orig_bitrate = self.video_proto.bitrate
         v1.video_orig_resolution = self.video_proto.resolution
+        v1.source_hash = self.video_proto.source_hash
 
         """
         Ready for Task Fire
@@ -324,6 +335,7 @@ class VedaIngest(object):
                 video_id=self.video_proto.veda_id
             ))
             raise
+        record_video_trans_status(v1, '', 'ingest')
         LOGGER.info('[INGEST] {studio_id} | {video_id} : Video record cataloged'.format(
             studio_id=self.video_proto.s3_filename,
             video_id=self.video_proto.veda_id
@@ -379,6 +391,8 @@ class VedaIngest(object):
             )
         )
         self.full_filename = os.path.join(self.node_work_directory, veda_filename)
+        if self.reservation is not None:
+            self.reservation.rename(veda_filename)
         os.system('chmod ugo+rwx ' + self.full_filename)
         return
 
@@ -401,13 +415,4 @@ class VedaIngest(object):
 
     @classmethod
     def _select_and_update_last_vid_number(cls, course_name):
-        with transaction.atomic():
-            target_course_query = Course.objects.select_for_update().filter(course_name=course_name)
-            if(len(target_course_query) > 1):
-                LOGGER.error('[INGEST] Got multiple course with the same course name ' + course_name)
-            
-            target_course = target_course_query.first()
-            current_vid_id = target_course.last_vid_number + 100
-            target_course.last_vid_number = current_vid_id
-            target_course.save()
-            return current_vid_id
+        return get_veda_id_allocator().next_number(course_name)
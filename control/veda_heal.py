@@ -6,6 +6,10 @@ Roll through videos, check for completion
     - fix data (if wrong), including on VAL
     - reschedule self
 
+Heal only checks the videos of its work set (`HealWorkItem`): the encodes it enqueued
+that are not delivered yet, each re-checked after an exponentially growing delay or as
+soon as its video changes. `rescan` checks every recent video, e.g. to seed the work set.
+
 """
 
 import datetime
@@ -13,20 +17,23 @@ from datetime import timedelta
 import logging
 import os
 import sys
-import uuid
 
 from django.utils.timezone import utc
 
-from VEDA_OS01.models import Encode, URL, Video
-from VEDA_OS01.utils import VAL_TRANSCRIPT_STATUS_MAP
+from VEDA_OS01.models import Encode, HealWorkItem, URL, Video
+from VEDA_OS01.utils import VAL_TRANSCRIPT_STATUS_MAP, set_video_trans_status
 
-from .encode_worker_tasks import enqueue_encode
+from .encode_worker_tasks import EncodeJob, EncodePriority
 from .control_env import WORK_DIRECTORY, HEAL_START, HEAL_END
 from .veda_encode import VedaEncode
 from .veda_val import VALAPICall
+from .veda_work_directory import get_work_directory
 from VEDA.utils import get_config
 
-time_safetygap = datetime.datetime.utcnow().replace(tzinfo=utc) - timedelta(days=1)
+PURGE_AFTER = timedelta(days=1)
+# Delay before the first re-check of an enqueued encode, doubled on every attempt.
+DEFAULT_RETRY_BASE_HOURS = HEAL_START
+DEFAULT_MAX_ATTEMPTS = 5
 
 LOGGER = logging.getLogger(__name__)
 # TODO: Remove this temporary logging to stdout
@@ -47,9 +54,32 @@ class VedaHeal(object):
         self.val_status = None
         self.retry_barrier_hours = 24
         self.no_audio = kwargs.get('no_audio', False)
-        self.encode_worker_queue = self.auth_dict['celery_worker_medium_queue'].strip()
+        # New uploads, heals and backfills are routed to separate worker queues
+        self.priority = kwargs.get('priority', EncodePriority.HEAL)
+        # Only enqueue the encodes of the work set that are due
+        self.due_only = False
+        self.retry_base = timedelta(hours=self.auth_dict.get('heal_retry_base_hours') or DEFAULT_RETRY_BASE_HOURS)
+        self.max_attempts = self.auth_dict.get('heal_max_attempts') or DEFAULT_MAX_ATTEMPTS
 
     def discovery(self):
+        """
+        Heal the videos of the work set with encodes due for a check.
+        """
+        self.due_only = True
+        self.video_query = Video.objects.filter(
+            heal_work_items__next_check__lte=self.current_time
+        ).distinct()
+        for v in self.video_query:
+            LOGGER.info('[HEAL] {studio_id} | {video_id}: Determining Missing Encodes'.format(
+                studio_id=v.studio_id,
+                video_id=v.edx_id,
+            ))
+        self.send_encodes()
+
+    def rescan(self):
+        """
+        Heal every video started between HEAL_END and HEAL_START hours ago.
+        """
         self.video_query = Video.objects.filter(
             video_trans_start__lt=self.current_time - timedelta(
                 hours=HEAL_START
@@ -74,6 +104,10 @@ class VedaHeal(object):
         # TODO: Refactor to common location
         for v in self.video_query:
             encode_list = self.determine_fault(video_object=v)
+            encode_list = self.update_work_set(v, encode_list)
+            if encode_list is None:
+                # Incomplete, but none of the encodes is due yet
+                continue
             # Using the 'Video Proto' Model
             # Update to VAL is also happening for those videos which are already marked complete,
             # All these retries are for the data-parity between VAL and VEDA, as calls to VAL api are
@@ -105,19 +139,50 @@ class VedaHeal(object):
             if not self.auth_dict['redis_broker']:
                 return
             for encode in encode_list:
-                veda_id = v.edx_id
-                encode_profile = encode
-                job_id = uuid.uuid1().hex[0:10]
-                enqueue_encode(veda_id, encode_profile, job_id, self.encode_worker_queue)
+                EncodeJob(v.edx_id, encode, priority=self.priority).enqueue()
+            self.record_attempts(v, encode_list)
 
             # Update Status
             LOGGER.info('[ENQUEUE] {studio_id} | {video_id}: file enqueued for encoding'.format(
                 studio_id=v.studio_id,
                 video_id=v.edx_id
             ))
-            Video.objects.filter(edx_id=v.edx_id).update(
-                video_trans_status='Queue'
-            )
+            set_video_trans_status(Video.objects.filter(edx_id=v.edx_id), 'Queue', 'heal')
+
+    def update_work_set(self, video_object, encode_list):
+        """
+        Drop the encodes a video no longer needs from the work set.
+
+        Returns:
+            The encodes to enqueue, or None if they are all waiting for their retry.
+        """
+        HealWorkItem.objects.filter(video=video_object).exclude(encode_profile__in=encode_list).delete()
+        if not self.due_only or len(encode_list) == 0:
+            return encode_list
+
+        waiting = set(HealWorkItem.objects.filter(video=video_object).exclude(
+            next_check__lte=self.current_time
+        ).values_list('encode_profile', flat=True))
+        due_encodes = [encode for encode in encode_list if encode not in waiting]
+        return due_encodes or None
+
+    def record_attempts(self, video_object, encode_list):
+        """
+        Add enqueued encodes to the work set, to be re-checked after a backoff.
+        """
+        for encode in encode_list:
+            item, __ = HealWorkItem.objects.get_or_create(video=video_object, encode_profile=encode)
+            attempts = item.attempts + 1
+            if attempts >= self.max_attempts:
+                LOGGER.warning('[HEAL] {video_id}: giving up on {encode} after {attempts} attempts'.format(
+                    video_id=video_object.edx_id,
+                    encode=encode,
+                    attempts=attempts,
+                ))
+                next_check = None
+            else:
+                next_check = self.current_time + self.retry_base * 2 ** (attempts - 1)
+            HealWorkItem.objects.filter(pk=item.pk).update(attempts=attempts, next_check=next_check)
 
     def determine_fault(self, video_object):
         """
@@ -191,10 +256,10 @@ class VedaHeal(object):
             # File is complete!
             # Check for data parity, and call done
             if video_object.video_trans_status != 'Complete':
-                Video.objects.filter(
-                    edx_id=video_object.edx_id
-                ).update(
-                    video_trans_status='Complete',
+                set_video_trans_status(
+                    Video.objects.filter(edx_id=video_object.edx_id),
+                    'Complete',
+                    'heal',
                     video_trans_end=datetime.datetime.utcnow().replace(tzinfo=utc)
                 )
         if not uncompleted_encodes or len(uncompleted_encodes) == 0:
@@ -242,10 +307,10 @@ class VedaHeal(object):
             if video_object.video_trans_start < retry_barrier:
                 if len(url_test) < 1:
                     try:
-                        Video.objects.filter(
-                            edx_id=video_object.edx_id
-                        ).update(
-                            video_trans_status='Corrupt File',
+                        set_video_trans_status(
+                            Video.objects.filter(edx_id=video_object.edx_id),
+                            'Corrupt File',
+                            'heal',
                             video_trans_end=datetime.datetime.utcnow().replace(tzinfo=utc)
                         )
                     except AttributeError:
@@ -256,14 +321,9 @@ class VedaHeal(object):
 
     def purge(self):
         """
-        Purge Work Directory
+        Purge Work Directory of files that are not in use and older than a day
         """
-        for file in os.listdir(WORK_DIRECTORY):
-            full_filepath = os.path.join(WORK_DIRECTORY, file)
-            filetime = datetime.datetime.utcfromtimestamp(
-                os.path.getmtime(
-                    full_filepath
-                )
-            ).replace(tzinfo=utc)
-            if filetime < time_safetygap:
-                os.remove(full_filepath)
+        work_directory = get_work_directory(WORK_DIRECTORY)
+        work_directory.purge(PURGE_AFTER.total_seconds())
+        for usage in work_directory.usage():
+            LOGGER.info('[HEAL] Work directory usage: %s', usage)
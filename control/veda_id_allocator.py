@@ -0,0 +1,134 @@
+"""
+VEDA video number allocation
+
+Video numbers of a course are spaced by `VIDEO_NUMBER_STEP`. Instead of locking
+the course row for every ingest, a worker reserves a block of numbers in one
+transaction and hands them out from its own `VedaIdBlock` row:
+
+    - handing out a number is a conditional update of the worker's block row, which
+      no other worker contends on.
+    - the course row is only locked to reserve a new block.
+    - blocks left behind by workers that went away are adopted by other workers once
+      they are stale, so reserved numbers are not lost.
+"""
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from VEDA.utils import get_config
+from VEDA_OS01.models import Course, VedaIdBlock
+
+LOGGER = logging.getLogger(__name__)
+
+VIDEO_NUMBER_STEP = 100
+DEFAULT_BLOCK_SIZE = 10
+DEFAULT_STALE_MINUTES = 60
+
+
+class VedaIdAllocator(object):
+    """
+    Hands out video numbers from blocks reserved per course.
+    """
+    def __init__(self, block_size=None, stale_minutes=None):
+        config = get_config()
+        self.block_size = max(1, int(block_size or config.get('veda_id_block_size') or DEFAULT_BLOCK_SIZE))
+        self.stale_after = timedelta(
+            minutes=stale_minutes or config.get('veda_id_block_stale_minutes') or DEFAULT_STALE_MINUTES
+        )
+        self.pid = os.getpid()
+        self.owner = '{host}:{pid}:{token}'.format(
+            host=socket.gethostname()[:60],
+            pid=self.pid,
+            token=uuid.uuid4().hex[:8],
+        )
+        self._lock = threading.Lock()
+
+    def next_number(self, course_name):
+        """
+        Returns the next video number for a course.
+        """
+        with self._lock:
+            course = Course.objects.filter(course_name=course_name).order_by('pk').first()
+            while True:
+                block = VedaIdBlock.objects.filter(course=course, owner=self.owner).first()
+                if block is None:
+                    block = self._adopt_stale_block(course) or self._reserve_block(course_name)
+
+                number = block.next_number
+                # Fails if the block was exhausted or adopted by another worker in the meantime.
+                claimed = VedaIdBlock.objects.filter(
+                    pk=block.pk,
+                    owner=self.owner,
+                    next_number=number,
+                    last_number__gte=number,
+                ).update(next_number=number + VIDEO_NUMBER_STEP, modified=timezone.now())
+                if number + VIDEO_NUMBER_STEP > block.last_number:
+                    VedaIdBlock.objects.filter(pk=block.pk, owner=self.owner).delete()
+                if claimed:
+                    return number
+
+    def _adopt_stale_block(self, course):
+        """
+        Take over a block of the course whose owner has not used it for a while.
+        """
+        stale_blocks = VedaIdBlock.objects.filter(
+            course=course,
+            modified__lt=timezone.now() - self.stale_after,
+        ).exclude(owner=self.owner).order_by('next_number')
+
+        for block in stale_blocks:
+            adopted = VedaIdBlock.objects.filter(pk=block.pk, owner=block.owner, modified=block.modified).update(
+                owner=self.owner,
+                modified=timezone.now()
+            )
+            if adopted:
+                LOGGER.info('[INGEST] Adopted video numbers %s-%s of %s', block.next_number, block.last_number, course)
+                block.refresh_from_db()
+                return block
+
+        return None
+
+    def _reserve_block(self, course_name):
+        """
+        Reserve a new block of video numbers from the course.
+        """
+        with transaction.atomic():
+            target_course_query = Course.objects.select_for_update().filter(course_name=course_name)
+            if len(target_course_query) > 1:
+                LOGGER.error('[INGEST] Got multiple course with the same course name ' + course_name)
+
+            target_course = target_course_query.order_by('pk').first()
+            first_number = target_course.last_vid_number + VIDEO_NUMBER_STEP
+            target_course.last_vid_number += VIDEO_NUMBER_STEP * self.block_size
+            target_course.save()
+
+            return VedaIdBlock.objects.create(
+                course=target_course,
+                owner=self.owner,
+                next_number=first_number,
+                last_number=target_course.last_vid_number,
+            )
+
+
+_ALLOCATOR = None
+_ALLOCATOR_LOCK = threading.Lock()
+
+
+def get_veda_id_allocator():
+    """
+    Returns the allocator of this process.
+
+    Forked workers get their own allocator, blocks must never be shared between processes.
+    """
+    global _ALLOCATOR  # pylint: disable=global-statement
+    with _ALLOCATOR_LOCK:
+        if _ALLOCATOR is None or _ALLOCATOR.pid != os.getpid():
+            _ALLOCATOR = VedaIdAllocator()
+        return _ALLOCATOR
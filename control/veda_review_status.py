@@ -0,0 +1,118 @@
+"""
+Review approval status from the mediateam Shotgun server
+
+** Mediateam only **
+Videos of `review_proc` courses only get their final encodes once their review task is
+approved in Shotgun. Instead of opening a connection and listing every review task of
+the project for every video:
+
+    - one Shotgun session is kept per process.
+    - the review task of a video is looked up with a query filtered on the video entity.
+    - approvals are cached per project for `shotgun_review_cache_seconds`, and can be
+      refreshed explicitly for a project.
+"""
+
+import logging
+import os
+import threading
+from xmlrpc.client import ProtocolError
+
+from django.core.cache import cache
+
+from dependencies.shotgun_api3 import Shotgun, ShotgunError
+from VEDA.utils import get_config
+
+LOGGER = logging.getLogger(__name__)
+
+REVIEW_STEP_ID = 7
+WAITING_STATUS = 'wtg'
+REVIEW_APPROVALS_CACHE_KEY = 'shotgun_review_approvals.{project_id}'
+DEFAULT_CACHE_TIMEOUT = 60 * 5
+
+
+class ReviewStatusService(object):
+    """
+    Looks up whether videos are review approved in Shotgun.
+    """
+    def __init__(self, server_path, script_name, script_key, cache_timeout=DEFAULT_CACHE_TIMEOUT):
+        self.server_path = server_path
+        self.script_name = script_name
+        self.script_key = script_key
+        self.cache_timeout = cache_timeout
+        self.pid = os.getpid()
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _find_review_tasks(self, project_id, entity_name):
+        """
+        Returns the review tasks of a video entity, over the session of this process.
+        """
+        filters = [
+            ['step', 'is', {'type': 'Step', 'id': REVIEW_STEP_ID}],
+            ['project', 'is', {'type': 'Project', 'id': project_id}],
+            ['entity', 'name_is', entity_name],
+        ]
+        with self._lock:
+            if self._session is None:
+                self._session = Shotgun(self.server_path, self.script_name, self.script_key)
+            try:
+                return self._session.find('Task', filters, ['entity', 'sg_status_list'])
+            except Exception:
+                # The session is likely broken, start a new one next time.
+                self._session = None
+                raise
+
+    def is_approved(self, project_id, entity_name):
+        """
+        Returns True if the review task of a video has moved on from waiting.
+
+        Arguments:
+            project_id (int): Shotgun project id of the course.
+            entity_name (str): name of the video entity, i.e. the last part of the VEDA id.
+        """
+        cache_key = REVIEW_APPROVALS_CACHE_KEY.format(project_id=project_id)
+        approvals = cache.get(cache_key) or {}
+        if entity_name in approvals:
+            return approvals[entity_name]
+
+        try:
+            tasks = self._find_review_tasks(project_id, entity_name)
+        except (ProtocolError, ShotgunError, EnvironmentError):
+            # Periodic API Error
+            LOGGER.warning('[ENCODE] Unable to get the review status of %s in project %s', entity_name, project_id)
+            return False
+
+        approved = any(
+            task['entity']['name'] == entity_name and task['sg_status_list'] != WAITING_STATUS for task in tasks
+        )
+        approvals = cache.get(cache_key) or {}
+        approvals[entity_name] = approved
+        cache.set(cache_key, approvals, self.cache_timeout)
+        return approved
+
+    def refresh(self, project_id):
+        """
+        Forget the cached approvals of a project.
+        """
+        cache.delete(REVIEW_APPROVALS_CACHE_KEY.format(project_id=project_id))
+
+
+_SERVICE = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_review_status_service():
+    """
+    Returns the review status service of this process.
+    """
+    global _SERVICE  # pylint: disable=global-statement
+    with _SERVICE_LOCK:
+        if _SERVICE is None or _SERVICE.pid != os.getpid():
+            config = get_config()
+            _SERVICE = ReviewStatusService(
+                config['sg_server_path'],
+                config['sg_script_name'],
+                config['sg_script_key'],
+                cache_timeout=config.get('shotgun_review_cache_seconds') or DEFAULT_CACHE_TIMEOUT,
+            )
+        return _SERVICE
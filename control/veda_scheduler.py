@@ -0,0 +1,255 @@
+"""
+Scheduler service for the periodic pipeline jobs
+
+Replaces the `bin/loop.py` polling loops, the self-rescheduling `bin/heal -s` and the
+translation retrieval cron with declared jobs run by one process:
+
+    - polling jobs back off (`backoff` times the interval, up to `max_interval`) while a
+      poll finds nothing, and return to `interval` as soon as one finds work.
+    - daily jobs run at `daily_at` in `timezone`.
+    - a job never runs twice at the same time, across scheduler processes, through its
+      `ScheduledJob` row, which also records how long and how often it ran.
+    - run times are jittered so restarted schedulers don't poll in lockstep.
+
+The schedule of every job can be overridden with `scheduler_jobs` in the config.
+"""
+
+import datetime
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytz
+from django.db import close_old_connections, reset_queries
+from django.db.models import F, Q
+from django.utils import timezone
+
+from VEDA.utils import get_config
+from VEDA_OS01.models import ScheduledJob
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_JITTER = 0.1
+DEFAULT_BACKOFF = 2
+# A run older than this is assumed to belong to a dead scheduler.
+DEFAULT_LOCK_TIMEOUT = 60 * 60 * 6
+# Longest sleep between checks for due jobs.
+MAX_SLEEP = 60
+
+
+# The jobs import their modules when they run, `youtube_callback` sets up Django on import.
+
+def about_video_ingest():
+    from control.control_env import WORK_DIRECTORY
+    from control.veda_file_discovery import FileDiscovery
+    return FileDiscovery(node_work_directory=WORK_DIRECTORY).about_video_ingest()
+
+
+def youtube_callback():
+    from youtube_callback.daemon import generate_course_list
+    from youtube_callback.sftp_id_retrieve import callfunction
+    course_list = generate_course_list()
+    for course in course_list:
+        LOGGER.info('%s%s: Callback', course.institution, course.edx_classid)
+        callfunction(course)
+    return len(course_list)
+
+
+def heal():
+    from control.veda_heal import VedaHeal
+    veda_heal = VedaHeal()
+    veda_heal.discovery()
+    veda_heal.purge()
+
+
+def process_translations():
+    from VEDA_OS01.transcripts import retrieve_three_play_translations
+    retrieve_three_play_translations()
+
+
+def dispatch_held_encodes():
+    from control.encode_worker_tasks import dispatch_encodes
+    return dispatch_encodes()
+
+
+def summarize_video_statuses():
+    from VEDA_OS01.utils import summarize_video_trans_statuses
+    summarize_video_trans_statuses()
+
+
+# Default schedule of the jobs, see `scheduler_jobs` in the config.
+JOBS = {
+    'about_video_ingest': dict(func=about_video_ingest, interval=10, max_interval=300),
+    'youtube_callback': dict(func=youtube_callback, interval=10, max_interval=600),
+    'heal': dict(func=heal, interval=30 * 60),
+    'process_translations': dict(func=process_translations, interval=60 * 60),
+    'dispatch_encodes': dict(func=dispatch_held_encodes, interval=30, max_interval=300),
+    'summarize_video_statuses': dict(func=summarize_video_statuses, interval=5 * 60),
+}
+
+
+class PeriodicJob(object):
+    """
+    A job run by the scheduler.
+
+    `func` returns whether the run found work, a job returning None keeps its interval.
+    """
+    def __init__(self, name, func, interval=60, max_interval=None, backoff=DEFAULT_BACKOFF, jitter=DEFAULT_JITTER,
+                 daily_at=None, timezone='America/New_York', lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.max_interval = max_interval or interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.daily_at = daily_at
+        self.timezone = pytz.timezone(timezone)
+        self.lock_timeout = lock_timeout
+        self.current_interval = interval
+        self.next_run = None
+
+    def next_daily_run(self, now):
+        """
+        Returns the next `daily_at` time after `now`.
+        """
+        hour, minute = [int(part) for part in self.daily_at.split(':')]
+        local_now = datetime.datetime.fromtimestamp(now, self.timezone)
+        run_day = local_now.date()
+        if (local_now.hour, local_now.minute) >= (hour, minute):
+            run_day += datetime.timedelta(days=1)
+        local_run = self.timezone.localize(datetime.datetime.combine(run_day, datetime.time(hour, minute)))
+        return local_run.timestamp()
+
+    def schedule(self, now, found_work=None):
+        """
+        Sets the time of the next run after a run at `now`.
+        """
+        if self.daily_at:
+            self.next_run = self.next_daily_run(now)
+            return
+
+        if found_work is None or found_work:
+            self.current_interval = self.interval
+        else:
+            self.current_interval = min(self.current_interval * self.backoff, self.max_interval)
+        self.next_run = now + self.current_interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def start(self, now):
+        """
+        Sets the time of the first run, spreading the polling jobs over their first interval.
+        """
+        if self.daily_at:
+            self.next_run = self.next_daily_run(now)
+        else:
+            self.next_run = now + self.interval * random.uniform(0, self.jitter)
+
+
+def run_job(job):
+    """
+    Run a job unless it is already running, and record the run.
+
+    Returns:
+        Whether the run found work, or None if the job did not run.
+    """
+    ScheduledJob.objects.get_or_create(name=job.name)
+    started = timezone.now()
+    claimed = ScheduledJob.objects.filter(
+        Q(running_since__isnull=True) | Q(running_since__lt=started - datetime.timedelta(seconds=job.lock_timeout)),
+        name=job.name,
+    ).update(running_since=started, last_started=started)
+    if not claimed:
+        LOGGER.info('[SCHEDULER] %s : still running, skipped', job.name)
+        return None
+
+    start_time = time.time()
+    failed = False
+    found_work = None
+    try:
+        found_work = job.func()
+    except Exception:  # pylint: disable=broad-except
+        failed = True
+        LOGGER.exception('[SCHEDULER] %s : run failed', job.name)
+    finally:
+        duration = time.time() - start_time
+        ScheduledJob.objects.filter(name=job.name).update(
+            running_since=None,
+            last_finished=timezone.now(),
+            last_duration=duration,
+            total_duration=F('total_duration') + duration,
+            runs=F('runs') + 1,
+            failures=F('failures') + int(failed),
+        )
+    LOGGER.info('[SCHEDULER] %s : ran in %.2fs, found %s', job.name, duration, found_work)
+    return found_work
+
+
+def get_jobs(names=None, config=None):
+    """
+    Returns the declared jobs, with their schedule overridden by `scheduler_jobs` in the config.
+
+    Arguments:
+        names (list): names of the jobs, all jobs if not given.
+    """
+    overrides = (config or get_config()).get('scheduler_jobs') or {}
+    jobs = []
+    for name in names or sorted(JOBS):
+        if name not in JOBS:
+            raise ValueError('Unknown scheduler job "{}".'.format(name))
+        jobs.append(PeriodicJob(name, **dict(JOBS[name], **(overrides.get(name) or {}))))
+    return jobs
+
+
+class Scheduler(object):
+    """
+    Runs periodic jobs, each due job in its own thread.
+    """
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=len(jobs) or 1)
+
+    def _run(self, job):
+        found_work = None
+        try:
+            found_work = run_job(job)
+        finally:
+            reset_queries()
+            close_old_connections()
+            with self._lock:
+                job.schedule(time.time(), found_work)
+                self.running.discard(job.name)
+
+    def run_pending(self, now=None):
+        """
+        Starts the due jobs that are not running in this scheduler.
+
+        Returns:
+            The seconds until the next job is due.
+        """
+        now = now or time.time()
+        with self._lock:
+            for job in self.jobs:
+                if job.next_run is None:
+                    job.start(now)
+                if job.name in self.running or job.next_run > now:
+                    continue
+                self.running.add(job.name)
+                self.executor.submit(self._run, job)
+            pending = [job.next_run for job in self.jobs if job.name not in self.running]
+        return min([MAX_SLEEP] + [next_run - now for next_run in pending])
+
+    def run(self):
+        """
+        Runs the jobs until stopped.
+        """
+        LOGGER.info('[SCHEDULER] Running %s', ', '.join(job.name for job in self.jobs))
+        while not self._stop.is_set():
+            self._stop.wait(max(self.run_pending(), 1))
+        self.executor.shutdown(wait=True)
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,123 @@
+"""
+Reuse the encodes of identical sources
+
+Uploads are fingerprinted with a SHA-256 of the source file, streamed during ingest and
+stored as `Video.source_hash`. When a course re-run or a repeated upload brings in a
+source that was already encoded for every profile the new video needs, its `URL` records
+are cloned and sent to VAL instead of encoding it again.
+"""
+
+import datetime
+import hashlib
+import logging
+
+from django.utils.timezone import utc
+
+from VEDA_OS01.models import URL, Video
+from VEDA_OS01.utils import set_video_trans_status
+from .veda_encode import VedaEncode
+from .veda_val import VALAPICall
+
+LOGGER = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def fingerprint(filepath, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Returns the SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_encoded_duplicate(video, encode_profiles):
+    """
+    Returns the most recent earlier video with the same source that has a URL for every profile, or None.
+    """
+    if not video.source_hash or not encode_profiles:
+        return None
+
+    candidates = Video.objects.filter(
+        source_hash=video.source_hash,
+        video_active=True,
+    ).exclude(pk=video.pk).order_by('-video_trans_start')
+    for candidate in candidates:
+        encoded_profiles = set(
+            URL.objects.filter(videoID=candidate).values_list('encode_profile__product_spec', flat=True)
+        )
+        if set(encode_profiles) <= encoded_profiles:
+            return candidate
+    return None
+
+
+def encoded_video_data(urls, val_profile_dict):
+    """
+    Returns the VAL encoded videos of URL records.
+    """
+    encode_data = []
+    for url in urls:
+        for profile in val_profile_dict.get(url.encode_profile.product_spec) or []:
+            encode_data.append(dict(
+                url=str(url.encode_url),
+                file_size=url.encode_size,
+                bitrate=int(url.encode_bitdepth.split(' ')[0]),
+                profile=str(profile)
+            ))
+    return encode_data
+
+
+def reuse_encodes(video, original, encode_profiles, config):
+    """
+    Clone the latest URL records of `original` for every profile onto `video` and send them to VAL.
+    """
+    now = datetime.datetime.utcnow().replace(tzinfo=utc)
+    urls = []
+    for encode_profile in encode_profiles:
+        url = URL.objects.filter(
+            videoID=original, encode_profile__product_spec=encode_profile
+        ).select_related('encode_profile').latest()
+        url.pk = None
+        url.videoID = video
+        url.url_date = now
+        url.val_input = False
+        url.save()
+        urls.append(url)
+
+    set_video_trans_status(Video.objects.filter(pk=video.pk), 'Complete', 'ingest', video_trans_end=now)
+
+    val_call = VALAPICall(
+        video_proto=None,
+        video_object=video,
+        val_status='file_complete',
+        encode_data=encoded_video_data(urls, config['val_profile_dict']),
+        CONFIG_DATA=config
+    )
+    val_call.call()
+
+
+def reuse_duplicate_encodes(course_object, veda_id, config):
+    """
+    Reuse the encodes of an earlier identical source for a newly ingested video.
+
+    Returns:
+        True if the video needs no encoding.
+    """
+    video = Video.objects.filter(edx_id=veda_id).latest()
+    if not video.source_hash or course_object.review_proc:
+        # Review encodes depend on the review status of the new video.
+        return False
+
+    encode_profiles = VedaEncode(course_object=course_object, veda_id=veda_id).determine_encodes()
+    original = find_encoded_duplicate(video, encode_profiles)
+    if original is None:
+        return False
+
+    reuse_encodes(video, original, encode_profiles, config)
+    LOGGER.info(
+        '[INGEST] %s : reusing the encodes of %s for %s', veda_id, original.edx_id, ', '.join(sorted(encode_profiles))
+    )
+    return True
@@ -0,0 +1,206 @@
+"""
+SQS ingest consumer
+
+Long-polls an SQS queue subscribed to the S3 ingest bucket events (directly or
+through SNS) and feeds the uploaded videos to ingest, without going through the
+HTTP endpoint and Celery.
+
+    - Up to 10 messages are received per call, never more than there are free workers.
+    - The visibility of in-flight messages is extended while their videos are ingested.
+    - A message is deleted only once all of its videos are ingested (or gone from the bucket);
+      failed messages become visible again and are retried.
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto
+from boto.sqs.message import RawMessage
+from django.db import connection
+
+from VEDA_OS01.utils import get_s3_event_keys
+from .veda_file_discovery import FileDiscovery
+from .veda_work_directory import WorkDirectoryFull
+
+LOGGER = logging.getLogger(__name__)
+
+# SQS does not return more messages per receive call.
+MAX_MESSAGES_PER_RECEIVE = 10
+DEFAULT_WORKERS = 4
+DEFAULT_VISIBILITY_TIMEOUT = 300
+DEFAULT_WAIT_TIME_SECONDS = 20
+
+
+def get_message_s3_keys(body):
+    """
+    Returns the S3 keys of an SQS message body.
+
+    The body is either an S3 event notification or an SNS notification wrapping one.
+    """
+    message_json = json.loads(body)
+    if 'Message' in message_json:
+        message_json = json.loads(message_json['Message'])
+
+    records = message_json.get('Records')
+    if not isinstance(records, list):
+        raise ValueError('Message does not contain S3 event records')
+
+    return get_s3_event_keys(records)
+
+
+class SqsIngestConsumer(object):
+    """
+    Ingests videos announced on an SQS queue with a bounded worker pool.
+    """
+    def __init__(self, queue, bucket_name, max_workers=DEFAULT_WORKERS,
+                 visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, wait_time_seconds=DEFAULT_WAIT_TIME_SECONDS):
+        self.queue = queue
+        self.queue.set_message_class(RawMessage)
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers
+        self.visibility_timeout = visibility_timeout
+        self.wait_time_seconds = wait_time_seconds
+
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._local = threading.local()
+
+    @property
+    def file_discovery(self):
+        """
+        Returns the `FileDiscovery` of the current worker thread, bound to the ingest bucket.
+        """
+        file_discovery = getattr(self._local, 'file_discovery', None)
+        if file_discovery is None:
+            file_discovery = FileDiscovery()
+            file_discovery.bucket = boto.connect_s3().get_bucket(self.bucket_name, validate=False)
+            self._local.file_discovery = file_discovery
+        return file_discovery
+
+    def ingest(self, key_name):
+        """
+        Ingest the video stored under `key_name`.
+
+        Returns:
+            True if the video is ingested or no longer in the bucket.
+        """
+        file_discovery = self.file_discovery
+        video_s3_key = file_discovery.bucket.get_key(key_name)
+        if video_s3_key is None:
+            LOGGER.warning('[SQS INGEST] Key %s not found, it was already processed', key_name)
+            return True
+
+        try:
+            successful_ingest = file_discovery.validate_metadata_and_feed_to_ingest(video_s3_key=video_s3_key)
+        except WorkDirectoryFull:
+            # The message comes back once its visibility timeout expires.
+            LOGGER.error('[SQS INGEST] No room in the working storage for key %s, leaving it for a retry', key_name)
+            return False
+        if not successful_ingest:
+            LOGGER.error('[SQS INGEST] Ingest failed for key %s', key_name)
+        return successful_ingest
+
+    def process_message(self, message):
+        """
+        Ingest the videos of a message and delete it if all of them are done.
+        """
+        try:
+            try:
+                key_names = get_message_s3_keys(message.get_body())
+            except (TypeError, ValueError, AttributeError):
+                # The message can never be ingested, retrying it would only block the queue.
+                LOGGER.error('[SQS INGEST] Dropping malformed message: %s', message.get_body())
+                key_names = []
+
+            completed = True
+            for key_name in key_names:
+                completed = self.ingest(key_name) and completed
+
+            if completed:
+                self.queue.delete_message(message)
+            return completed
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('[SQS INGEST] Processing failed for message %s', message.id)
+            return False
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard(message)
+            self._slots.release()
+            # Worker threads hold their own database connection.
+            connection.close()
+
+    def extend_visibility(self):
+        """
+        Keep the in-flight messages invisible to other consumers while they are processed.
+        """
+        with self._in_flight_lock:
+            messages = list(self._in_flight)
+
+        for message in messages:
+            try:
+                message.change_visibility(self.visibility_timeout)
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.warning('[SQS INGEST] Unable to extend visibility of message %s', message.id)
+
+    def _visibility_heartbeat(self):
+        while not self._stopped.wait(self.visibility_timeout / 2.0):
+            self.extend_visibility()
+
+    def _acquire_slots(self):
+        """
+        Block until a worker is free and return the number of free workers, up to one receive call.
+        """
+        self._slots.acquire()
+        slots = 1
+        while slots < MAX_MESSAGES_PER_RECEIVE and self._slots.acquire(False):
+            slots += 1
+        return slots
+
+    def receive(self, pool):
+        """
+        Receive messages for the free workers and hand them to the pool.
+
+        Returns:
+            number of received messages.
+        """
+        slots = self._acquire_slots()
+        try:
+            messages = self.queue.get_messages(
+                num_messages=slots,
+                visibility_timeout=self.visibility_timeout,
+                wait_time_seconds=self.wait_time_seconds,
+            )
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('[SQS INGEST] Unable to receive messages')
+            messages = []
+
+        for __ in range(slots - len(messages)):
+            self._slots.release()
+
+        for message in messages:
+            with self._in_flight_lock:
+                self._in_flight.add(message)
+            pool.submit(self.process_message, message)
+
+        return len(messages)
+
+    def run(self, max_polls=None):
+        """
+        Consume the queue, forever unless `max_polls` is given.
+        """
+        heartbeat = threading.Thread(target=self._visibility_heartbeat, name='sqs-ingest-visibility')
+        heartbeat.daemon = True
+        heartbeat.start()
+
+        polls = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                while max_polls is None or polls < max_polls:
+                    self.receive(pool)
+                    polls += 1
+        finally:
+            self._stopped.set()
@@ -10,6 +10,7 @@ import subprocess
 from control.control_env import *
 from control.veda_encode import VedaEncode
 from VEDA.utils import get_config
+from VEDA_OS01.utils import set_video_trans_status
 
 
 class EmailAlert(object):
@@ -268,10 +269,10 @@ class Metadata(object):
             Check for data parity, and call done
             """
             if video_object.video_trans_status != 'File Complete':
-                Video.objects.filter(
-                    edx_id=video_object.edx_id
-                ).update(
-                    video_trans_status='File Complete',
+                set_video_trans_status(
+                    Video.objects.filter(edx_id=video_object.edx_id),
+                    'File Complete',
+                    'deliver',
                     video_trans_end=datetime.datetime.utcnow().replace(tzinfo=utc)
                 )
             return []
@@ -297,10 +298,10 @@ class Metadata(object):
             )
 
             if len(url_test) == 0:
-                Video.objects.filter(
-                    edx_id=video_object.edx_id
-                ).update(
-                    video_trans_status='Corrupt File',
+                set_video_trans_status(
+                    Video.objects.filter(edx_id=video_object.edx_id),
+                    'Corrupt File',
+                    'deliver',
                     video_trans_end=datetime.datetime.utcnow().replace(tzinfo=utc)
                 )
                 self.val_status = 'file_corrupt'
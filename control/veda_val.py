@@ -54,7 +54,7 @@ class VALAPICall(object):
 
         """if sending urls"""
         self.endpoint_url = kwargs.get('endpoint_url', None)
-        self.encode_data = []
+        self.encode_data = kwargs.get('encode_data', [])
         self.val_profile = None
 
         """Generated"""
@@ -0,0 +1,376 @@
+"""
+Working storage manager
+
+Videos are downloaded into the node working directory before they are ingested or
+delivered. Instead of writing until the disk is full (which leaves truncated files
+that are then reported as corrupt), space is reserved before a download:
+
+    - the reservation is based on the size of the S3 object and is rejected while it
+      would take a volume above its high-water mark.
+    - finished artifacts are evicted least recently used first to make room, files that
+      are reserved or were used recently are never evicted.
+    - files can be spread across several volumes, a reservation goes to the volume with
+      the most room left.
+    - if no volume has room, the reservation waits for one and eventually raises
+      `WorkDirectoryFull` so the caller can retry later.
+
+Reservations are kept as marker files in the `.reservations` directory of a volume and
+are made under a lock file there, so every worker process on the host accounts for the
+reservations of the others. The markers of processes that died are dropped.
+"""
+
+import errno
+import fcntl
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from VEDA.utils import get_config
+
+from .control_env import WORK_DIRECTORY
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_HIGH_WATER_MARK = 0.9
+DEFAULT_EVICTION_MIN_AGE_MINUTES = 60
+DEFAULT_RESERVE_WAIT_SECONDS = 600
+RESERVE_POLL_SECONDS = 5
+RESERVATIONS_DIRECTORY = '.reservations'
+LOCK_FILE = '.lock'
+
+
+class WorkDirectoryFull(Exception):
+    """
+    Raised when there is no room in the working storage for a file.
+    """
+    pass
+
+
+def is_disk_full_error(error):
+    """
+    Returns True if an `EnvironmentError` was caused by a full disk.
+    """
+    return getattr(error, 'errno', None) in (errno.ENOSPC, errno.EDQUOT)
+
+
+def is_process_alive(pid):
+    """
+    Returns True if a process of this host is running.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Reservation(object):
+    """
+    Space reserved for a file in a working storage volume.
+
+    The file is not evicted until the reservation is released. Used as a context
+    manager, the reservation yields its volume and is released on exit.
+    """
+    def __init__(self, work_directory, volume, file_name, size, marker):
+        self.work_directory = work_directory
+        self.volume = volume
+        self.file_name = file_name
+        self.size = size
+        self.marker = marker
+
+    def rename(self, file_name):
+        """
+        Move the reservation to the new name of its file.
+        """
+        self.work_directory.rename(self, file_name)
+
+    def release(self):
+        self.work_directory.release(self)
+
+    def __enter__(self):
+        return self.volume
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class WorkDirectory(object):
+    """
+    Reserves space in and evicts files from the working storage volumes.
+    """
+    def __init__(self, volumes, high_water_mark=DEFAULT_HIGH_WATER_MARK,
+                 eviction_min_age_minutes=DEFAULT_EVICTION_MIN_AGE_MINUTES,
+                 reserve_wait_seconds=DEFAULT_RESERVE_WAIT_SECONDS):
+        self.volumes = list(volumes)
+        self.high_water_mark = high_water_mark
+        self.eviction_min_age = eviction_min_age_minutes * 60
+        self.reserve_wait_seconds = reserve_wait_seconds
+
+        self._lock = threading.Lock()
+        self._space_released = threading.Condition(self._lock)
+        self.host = socket.gethostname()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Holds the lock of this manager and the lock files of its volumes, shared with the other processes.
+        """
+        with self._lock:
+            lock_files = []
+            try:
+                for volume in sorted(self.volumes):
+                    lock_file = open(os.path.join(self._reservations_directory(volume), LOCK_FILE), 'a')
+                    lock_files.append(lock_file)
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+            finally:
+                # Closing a lock file releases its lock.
+                for lock_file in lock_files:
+                    lock_file.close()
+
+    def _reservations_directory(self, volume):
+        directory = os.path.join(volume, RESERVATIONS_DIRECTORY)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _reservations(self, volume):
+        """
+        Returns the reservations of every process on a volume, as dicts with a `file_name` and a `size`.
+
+        The reservations of processes of this host that are no longer running are removed.
+        """
+        directory = self._reservations_directory(volume)
+        reservations = []
+        for marker_name in os.listdir(directory):
+            if marker_name == LOCK_FILE:
+                continue
+            marker = os.path.join(directory, marker_name)
+            try:
+                with open(marker) as marker_file:
+                    reservation = json.load(marker_file)
+            except (EnvironmentError, ValueError):
+                continue
+            if reservation['host'] == self.host and not is_process_alive(reservation['pid']):
+                LOGGER.info(
+                    '[WORK DIRECTORY] Dropping the reservation of %s by a stopped process', reservation['file_name']
+                )
+                try:
+                    os.remove(marker)
+                except OSError:
+                    pass
+                continue
+            reservations.append(reservation)
+        return reservations
+
+    def _write_marker(self, marker, file_name, size):
+        with open(marker, 'w') as marker_file:
+            json.dump({'file_name': file_name, 'size': size, 'host': self.host, 'pid': os.getpid()}, marker_file)
+
+    @staticmethod
+    def _unwritten(volume, reservation):
+        """
+        Returns the bytes of a reservation that are not written to its file yet.
+        """
+        try:
+            written = os.path.getsize(os.path.join(volume, reservation['file_name']))
+        except OSError:
+            written = 0
+        return max(0, reservation['size'] - written)
+
+    def _reserved(self, volume):
+        return sum(self._unwritten(volume, reservation) for reservation in self._reservations(volume))
+
+    def usage(self):
+        """
+        Returns the usage of every volume.
+        """
+        metrics = []
+        with self._locked():
+            for volume in self.volumes:
+                disk_usage = shutil.disk_usage(volume)
+                reservations = self._reservations(volume)
+                reserved = sum(self._unwritten(volume, reservation) for reservation in reservations)
+                metrics.append({
+                    'volume': volume,
+                    'total': disk_usage.total,
+                    'used': disk_usage.used,
+                    'free': disk_usage.free,
+                    'reserved': reserved,
+                    'in_use': len(set(reservation['file_name'] for reservation in reservations)),
+                    'percent_used': 100.0 * (disk_usage.used + reserved) / disk_usage.total,
+                })
+        return metrics
+
+    def _room(self, volume):
+        """
+        Returns the number of bytes that can still be reserved on a volume.
+        """
+        disk_usage = shutil.disk_usage(volume)
+        limit = min(disk_usage.total * self.high_water_mark, disk_usage.used + disk_usage.free)
+        return int(limit) - disk_usage.used - self._reserved(volume)
+
+    def _candidate_files(self, volume):
+        """
+        Returns the evictable files of a volume, least recently used first.
+        """
+        now = time.time()
+        in_use = set(reservation['file_name'] for reservation in self._reservations(volume))
+        candidates = []
+        for file_name in os.listdir(volume):
+            file_path = os.path.join(volume, file_name)
+            if file_name in in_use or not os.path.isfile(file_path):
+                continue
+            stat = os.stat(file_path)
+            last_used = max(stat.st_atime, stat.st_mtime)
+            if now - last_used >= self.eviction_min_age:
+                candidates.append((last_used, file_path, stat.st_size))
+        return sorted(candidates)
+
+    def _evict(self, volume, size):
+        """
+        Evict finished files from a volume until `size` bytes fit under its high-water mark.
+
+        Returns:
+            True if there is room for `size` bytes.
+        """
+        room = self._room(volume)
+        if room >= size:
+            return True
+
+        for __, file_path, file_size in self._candidate_files(volume):
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            LOGGER.info('[WORK DIRECTORY] Evicted %s (%s bytes)', file_path, file_size)
+            room += file_size
+            if room >= size:
+                return True
+
+        return self._room(volume) >= size
+
+    def _select_volume(self, size, volume=None):
+        """
+        Returns the volume with the most room for `size` bytes, evicting files if needed, or None.
+        """
+        volumes = [volume] if volume else self.volumes
+        volumes = sorted(volumes, key=self._room, reverse=True)
+        for candidate in volumes:
+            if self._room(candidate) >= size:
+                return candidate
+        for candidate in volumes:
+            if self._evict(candidate, size):
+                return candidate
+        return None
+
+    def reserve(self, size, file_name, volume=None):
+        """
+        Reserve `size` bytes for a file while it is written and used.
+
+        Arguments:
+            size (int): expected size of the file, e.g. the S3 Content-Length.
+            file_name (str): name of the file, which is not evicted while reserved.
+            volume (str): restrict the reservation to this volume.
+
+        Returns:
+            a `Reservation` in the volume the file is to be written to, to be released
+            once the file is no longer used.
+
+        Raises:
+            WorkDirectoryFull: if no volume had room within `reserve_wait_seconds`.
+        """
+        size = int(size or 0)
+        deadline = time.time() + self.reserve_wait_seconds
+        while True:
+            with self._locked():
+                selected = self._select_volume(size, volume)
+                if selected is not None:
+                    marker = os.path.join(self._reservations_directory(selected), '{host}-{pid}-{id}'.format(
+                        host=self.host, pid=os.getpid(), id=uuid.uuid4().hex
+                    ))
+                    self._write_marker(marker, file_name, size)
+                    return Reservation(self, selected, file_name, size, marker)
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise WorkDirectoryFull(
+                    'No room for {file_name} ({size} bytes) in {volumes}'.format(
+                        file_name=file_name, size=size, volumes=[volume] if volume else self.volumes
+                    )
+                )
+            LOGGER.warning('[WORK DIRECTORY] Waiting for room for %s (%s bytes)', file_name, size)
+            # Space released by other processes is only noticed on the next poll.
+            with self._lock:
+                self._space_released.wait(min(remaining, RESERVE_POLL_SECONDS))
+
+    def rename(self, reservation, file_name):
+        """
+        Move a reservation to the new name of its file.
+        """
+        with self._locked():
+            self._write_marker(reservation.marker, file_name, reservation.size)
+            reservation.file_name = file_name
+
+    def release(self, reservation):
+        """
+        End a reservation, its file can be evicted again.
+        """
+        with self._locked():
+            try:
+                os.remove(reservation.marker)
+            except OSError:
+                pass
+            self._space_released.notify_all()
+
+    def purge(self, max_age_seconds):
+        """
+        Delete the files that are not in use and have not been used for `max_age_seconds`.
+        """
+        now = time.time()
+        with self._locked():
+            for volume in self.volumes:
+                for last_used, file_path, __ in self._candidate_files(volume):
+                    if now - last_used >= max_age_seconds:
+                        try:
+                            os.remove(file_path)
+                        except OSError:
+                            LOGGER.warning('[WORK DIRECTORY] Unable to purge %s', file_path)
+            self._space_released.notify_all()
+
+
+_WORK_DIRECTORIES = {}
+_WORK_DIRECTORIES_LOCK = threading.Lock()
+
+
+def get_work_directory(primary_volume=WORK_DIRECTORY):
+    """
+    Returns the working storage manager of this process for a node working directory.
+
+    The manager spreads files across the node working directory and the configured
+    `work_directory_extra_volumes`.
+    """
+    with _WORK_DIRECTORIES_LOCK:
+        if primary_volume not in _WORK_DIRECTORIES:
+            config = get_config()
+            volumes = [primary_volume]
+            for volume in config.get('work_directory_extra_volumes') or []:
+                if volume not in volumes and os.path.isdir(volume):
+                    volumes.append(volume)
+            _WORK_DIRECTORIES[primary_volume] = WorkDirectory(
+                volumes,
+                high_water_mark=config.get('work_directory_high_water_mark') or DEFAULT_HIGH_WATER_MARK,
+                eviction_min_age_minutes=(
+                    config.get('work_directory_eviction_min_age_minutes') or DEFAULT_EVICTION_MIN_AGE_MINUTES
+                ),
+                reserve_wait_seconds=config.get('work_directory_reserve_wait_seconds') or DEFAULT_RESERVE_WAIT_SECONDS,
+            )
+        return _WORK_DIRECTORIES[primary_volume]
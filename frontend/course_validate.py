@@ -7,9 +7,19 @@ import json
 import yaml
 import datetime
 
+from django.core.cache import cache
+from django.db.models import Count, Max
+
 from frontend.frontend_env import *
 import six
 
+# Parsed heuristics, by path of the sidecar yaml
+HEURISTICS = {}
+# Majority course settings of an institution, keyed by the count and last change of its
+# courses so that every process sees a change, whatever its cache backend.
+INSTITUTION_DEFAULTS_CACHE_KEY = 'frontend.institution_defaults.{inst_code}.{course_count}.{modified}'
+INSTITUTION_DEFAULTS_CACHE_TIMEOUT = 60 * 60
+
 
 class VEDACat(object):
 
@@ -30,14 +40,15 @@ class VEDACat(object):
 
     def _READ_HEURISTICS(self):
         """
-        Load in the heuristics from the sidecar yaml
+        Load in the heuristics from the sidecar yaml, once per process
         """
-        with open(self.model_yaml, 'r') as stream:
-            try:
-                set_dict = yaml.safe_load(stream)
-                return set_dict
-            except yaml.YAMLError as exc:
-                return None
+        if self.model_yaml not in HEURISTICS:
+            with open(self.model_yaml, 'r') as stream:
+                try:
+                    HEURISTICS[self.model_yaml] = yaml.safe_load(stream)
+                except yaml.YAMLError as exc:
+                    return None
+        return HEURISTICS[self.model_yaml]
 
     def institution_name(self):
         """
@@ -94,16 +105,17 @@ class VEDACat(object):
                 course_hold=True,
             )
 
-        if len(course_query) > 0:
-            mod_q = course_query[0]._meta.get_fields()
-        else:
+        if not course_query.exists():
             """
             TODO: Build out error here
             """
             return None
+        # Reverse relations (videos, id blocks...) are not course settings
+        mod_q = [field for field in Course._meta.get_fields() if field.concrete]
         """
         Generate return fields
         """
+        majority_fields = []
         for m in mod_q:
 
             if m.name not in self.veda_model['models_nottoget']:
@@ -119,17 +131,10 @@ class VEDACat(object):
                     must_haves[m.name] = m.verbose_name
 
                 if m.name not in self.veda_model['must_haves']:
-                    if self.inst_code != 'NEWINST':
-                        correlation = []
-                        for c in course_query:
-                            correlation.append(getattr(c, m.name))
-
-                        majority = self.simple_majority(
-                            attribute_list=correlation
-                        )
+                    majority_fields.append(m.name)
 
-                        if majority['majority'] is not False:
-                            inst_data[m.name] = majority['field']
+        if self.inst_code != 'NEWINST':
+            inst_data = self.institution_defaults(course_query, majority_fields)
 
         self.return_fields['field_data'] = field_data
         self.return_fields['inst_data'] = inst_data
@@ -138,6 +143,34 @@ class VEDACat(object):
         self.return_fields['must_haves'] = must_haves
         self.return_fields['organizational'] = self.veda_model['organizational']
 
+    def institution_defaults(self, course_query, field_names):
+        """
+        Field values held by the majority (>50.0%) of the institution courses,
+        cached per institution until one of its courses is added, changed or removed
+        """
+        version = course_query.aggregate(course_count=Count('pk'), modified=Max('modified'))
+        cache_key = INSTITUTION_DEFAULTS_CACHE_KEY.format(
+            inst_code=self.inst_code,
+            course_count=version['course_count'],
+            modified=version['modified'].isoformat() if version['modified'] else '',
+        )
+        inst_data = cache.get(cache_key)
+        if inst_data is not None:
+            return inst_data
+
+        inst_data = {}
+        course_count = version['course_count']
+        for field_name in field_names:
+            majority = course_query.values(field_name).annotate(
+                field_count=Count('pk')
+            ).order_by('-field_count').first()
+
+            if majority['field_count'] > course_count * 0.5 and majority[field_name] is not None:
+                inst_data[field_name] = majority[field_name]
+
+        cache.set(cache_key, inst_data, INSTITUTION_DEFAULTS_CACHE_TIMEOUT)
+        return inst_data
+
     def validate_code(self, course_code):
         """
         check 5 digit course code
@@ -283,34 +316,3 @@ class VEDACat(object):
         return_dict['studio_hex'] = c1.studio_hex
 
         return return_dict
-
-    def simple_majority(self, attribute_list):
-        """
-        Simple Majority Finder
-        Field attribute for 'most' of them (>50.0%) per attrib
-        """
-        comparitor = {'None': 0}
-        for a in attribute_list:
-            in_it = False
-            for b, c in six.iteritems(comparitor):
-                if a is None:
-                    comparitor['None'] += 1
-                if a == b:
-                    comparitor[a] += 1
-                    in_it = True
-                else:
-                    pass
-            if in_it is False:
-                comparitor[a] = 1
-
-        data = {}
-
-        for d, e in six.iteritems(comparitor):
-            if e > len(attribute_list) * 0.5:
-                data['majority'] = True
-                data['field'] = d
-
-        if len(data) == 0:
-            data['majority'] = False
-
-        return data
@@ -3,7 +3,10 @@
 import os
 import sys
 import unittest
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
 from django.test import TestCase
+from mock import patch
 
 """
 A basic unittest for the "Course Addition Tool"
@@ -14,6 +17,8 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 )
 from course_validate import VEDACat
+from VEDA_OS01.models import Course, VedaIdBlock
+from VEDA_OS01.tests.factories import CourseFactory
 
 
 class TestVariables(TestCase):
@@ -28,6 +33,79 @@ class TestVariables(TestCase):
         self.VCT.inst_code = '111'
         self.assertTrue(self.VCT.institution_name() == 'Error')
 
+    def test_config_cached(self):
+        self.assertIs(VEDACat().veda_model, self.VCT.veda_model)
+
+
+class TestInstitutionData(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.courses = [
+            CourseFactory(institution='XYZ', course_hold=True, tp_speed='standard', c24_speed='PRIORITY'),
+            CourseFactory(institution='XYZ', course_hold=True, tp_speed='standard', c24_speed='STANDARD'),
+            CourseFactory(institution='XYZ', course_hold=True, tp_speed='expedited', c24_speed='CRITICAL'),
+            CourseFactory(institution='XYZ', course_hold=False, tp_speed='expedited'),
+        ]
+
+    def institution_data(self):
+        VCT = VEDACat(inst_code='XYZ')
+        VCT.institution_data()
+        return VCT.return_fields
+
+    def test_majority_defaults(self):
+        return_fields = self.institution_data()
+
+        self.assertEqual(return_fields['inst_data']['tp_speed'], 'standard')
+        self.assertFalse(return_fields['inst_data']['proc_loc'])
+        self.assertNotIn('c24_speed', return_fields['inst_data'])
+        self.assertNotIn('course_name', return_fields['inst_data'])
+        self.assertIn('course_name', return_fields['must_haves'])
+        self.assertNotIn('video', return_fields['field_data'])
+
+    def test_veda_id_blocks_not_returned(self):
+        VedaIdBlock.objects.create(course=self.courses[0], owner='worker', next_number=1, last_number=10)
+
+        return_fields = self.institution_data()
+
+        self.assertNotIn('veda_id_blocks', return_fields['field_data'])
+        self.assertEqual(return_fields['inst_data']['tp_speed'], 'standard')
+
+    def test_defaults_cached(self):
+        self.institution_data()
+        with self.assertNumQueries(2):
+            cached_fields = self.institution_data()
+        self.assertEqual(cached_fields['inst_data']['tp_speed'], 'standard')
+
+        self.courses[0].tp_speed = 'expedited'
+        self.courses[0].save()
+
+        self.assertEqual(self.institution_data()['inst_data']['tp_speed'], 'expedited')
+
+    def test_defaults_invalidated_on_institution_move(self):
+        self.assertEqual(self.institution_data()['inst_data']['tp_speed'], 'standard')
+
+        for course in self.courses[:2]:
+            course = Course.objects.get(pk=course.pk)
+            course.institution = 'ABC'
+            course.save()
+
+        self.assertEqual(self.institution_data()['inst_data']['tp_speed'], 'expedited')
+
+    def test_defaults_invalidated_across_processes(self):
+        worker_caches = [LocMemCache('worker-{}'.format(index), {}) for index in range(2)]
+        with patch('course_validate.cache', worker_caches[0]):
+            self.assertEqual(self.institution_data()['inst_data']['tp_speed'], 'standard')
+
+        # Another worker process saves the courses, with its own cache.
+        with patch('course_validate.cache', worker_caches[1]):
+            for course in self.courses[:2]:
+                course.tp_speed = 'expedited'
+                course.save()
+
+        with patch('course_validate.cache', worker_caches[0]):
+            self.assertEqual(self.institution_data()['inst_data']['tp_speed'], 'expedited')
+
 
 def main():
     unittest.main()
@@ -24,6 +24,7 @@ from control.veda_utils import Metadata, VideoProto
 from control.veda_val import VALAPICall
 from frontend.abvid_reporting import report_status
 from VEDA_OS01.models import URL, Encode, Video
+from VEDA_OS01.utils import set_video_trans_status
 
 project_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_path not in sys.path:
@@ -55,9 +56,12 @@ def callfunction(course):
 
     for file in os.listdir(workdir):
         if 'report-' in file:
-            upload_data = domxml_parser(file) if is_xml_file(file) else csv_parser(file)
+            # A CSV report has a row per video of the drop
+            uploads = [domxml_parser(file)] if is_xml_file(file) else csv_parser(file) or []
 
-            if upload_data is not None:
+            for upload_data in uploads:
+                if upload_data is None:
+                    continue
                 LOGGER.info('[YOUTUBE CALLBACK] : {inst}{clss} {upload_data}'.format(
                     inst=course.institution,
                     clss=course.edx_classid,
@@ -233,9 +237,9 @@ def domxml_parser(file):
 def csv_parser(filename):
     """
     :param filename: string
-    :return: upload_data : dict
+    :return: upload_data : list of dict, one per video of the drop
     """
-    upload_data = {
+    drop_data = {
         'datetime': None,
         'status': None,
         'duplicate_url': None,
@@ -270,11 +274,15 @@ def csv_parser(filename):
             elif column == "Video ID":
                 youtube_id_index = headers.index(column)
 
+        uploads = []
         for row in file_reader:
             video_url = row[file_suffix_index]
+            upload_data = dict(drop_data)
+            if video_url:
+                upload_data['edx_id'] = os.path.basename(video_url).split('_')[0]
             upload_data['status'] = row[status_index]
             if upload_data['status'] == "Errors":
-                upload_data = _process_errors(upload_data, filename)
+                upload_data = _process_errors(upload_data, filename, video_url)
 
             upload_data['youtube_id'] = row[youtube_id_index]
 
@@ -282,19 +290,23 @@ def csv_parser(filename):
                 upload_data['file_suffix'] = video_url.split("_")[1].split(".")[0]
             except IndexError:
                 upload_data['file_suffix'] = 100
+            uploads.append(upload_data)
 
-    return upload_data
+    return uploads
 
 
-def _process_errors(upload_data, reports_file):
+def _process_errors(upload_data, reports_file, video_file=None):
     """
     :param upload_data : dict
            reports_file : string
+           video_file : string, the "Video file" of the upload in the report, errors of
+               other videos of the drop are ignored
     :return: upload_data : dict
     """
     errors_file = os.path.join(workdir, reports_file.replace("report-", "errors-"))
 
     error_code_index = error_message_index = 0
+    video_file_index = None
     error_message_pattern = re.compile('Duplicate video ID is \[(?P<thing>[0-9a-zA-Z_-]*)\]')
 
     try:
@@ -306,8 +318,13 @@ def _process_errors(upload_data, reports_file):
                     error_code_index = headers.index(column)
                 elif column == "Error message":
                     error_message_index = headers.index(column)
+                elif column == "Video file":
+                    video_file_index = headers.index(column)
 
             for row in file_reader:
+                if video_file and video_file_index is not None and \
+                        os.path.basename(row[video_file_index]) != os.path.basename(video_file):
+                    continue
                 if row[error_code_index] == "VIDEO_REJECTED_DUPLICATE":
                     upload_data['status'] = "Duplicate"
                     error_message = row[error_message_index]
@@ -384,11 +401,7 @@ def urlpatch(upload_data):
         video_check = Video.objects.filter(edx_id=test_id.edx_id).latest()
 
         if video_check.video_trans_status == 'Youtube Duplicate':
-            Video.objects.filter(
-                edx_id=video_check.edx_id
-            ).update(
-                video_trans_status='Progress'
-            )
+            set_video_trans_status(Video.objects.filter(edx_id=video_check.edx_id), 'Progress', 'youtube')
 
         """
         Update Status & VAL
@@ -416,7 +429,7 @@ def urlpatch(upload_data):
             return None
 
         if len(encode_list) == 0:
-            Video.objects.filter(edx_id=upload_data['edx_id']).update(video_trans_status='Complete')
+            set_video_trans_status(Video.objects.filter(edx_id=upload_data['edx_id']), 'Complete', 'youtube')
             val_status = 'file_complete'
         else:
             val_status = 'transcode_active'
@@ -453,7 +466,7 @@ def urlpatch(upload_data):
                     youtube_id=''
                 )
 
-            Video.objects.filter(edx_id=upload_data['edx_id']).update(video_trans_status='Youtube Duplicate')
+            set_video_trans_status(Video.objects.filter(edx_id=upload_data['edx_id']), 'Youtube Duplicate', 'youtube')
             video_proto = VideoProto(
                 veda_id=test_id.edx_id,
                 val_id=test_id.studio_id,
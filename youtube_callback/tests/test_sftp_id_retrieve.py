@@ -0,0 +1,53 @@
+"""
+Youtube callback report parsing tests
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+from mock import patch
+
+from youtube_callback import sftp_id_retrieve
+
+
+class CsvParserTests(TestCase):
+    """
+    Tests for parsing the CSV reports of a Youtube drop.
+    """
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        workdir_patcher = patch.object(sftp_id_retrieve, 'workdir', self.workdir)
+        workdir_patcher.start()
+        self.addCleanup(workdir_patcher.stop)
+
+    def write(self, file_name, rows):
+        with open(os.path.join(self.workdir, file_name), 'w') as csv_file:
+            csv_file.write('\n'.join(','.join(row) for row in rows) + '\n')
+
+    def test_errors_of_each_video(self):
+        """
+        Verify that the errors of a drop are applied to the video they were reported for only.
+        """
+        self.write('report-1500000000-abcdef.csv', [
+            ['Video file', 'Status', 'Video ID'],
+            ['XXXC93BC2016-V000001_100.mp4', 'Errors', ''],
+            ['XXXC93BC2016-V000002_100.mp4', 'Errors', ''],
+        ])
+        self.write('errors-1500000000-abcdef.csv', [
+            ['Video file', 'Error code', 'Error message'],
+            ['XXXC93BC2016-V000001_100.mp4', 'VIDEO_REJECTED_DUPLICATE', 'Duplicate video ID is [dupe_1]'],
+            ['XXXC93BC2016-V000002_100.mp4', 'VIDEO_REJECTED', 'The video was rejected'],
+        ])
+
+        uploads = sftp_id_retrieve.csv_parser('report-1500000000-abcdef.csv')
+
+        self.assertEqual(
+            [(upload['edx_id'], upload['status'], upload['duplicate_url']) for upload in uploads],
+            [
+                ('XXXC93BC2016-V000001', 'Duplicate', 'dupe_1'),
+                ('XXXC93BC2016-V000002', 'Errors', None),
+            ]
+        )